@@ -0,0 +1,145 @@
+# benchmarks/bench_bulk_generation.py
+"""Benchmark AIContentGenerator.generate_bulk_content against a local fake completion server.
+
+Usage:
+    python benchmarks/bench_bulk_generation.py --fields 200 --latency 0.25 --concurrency 1 8 32
+    python benchmarks/bench_bulk_generation.py --cache --concurrency 8 8   # second run is served from cache
+    python benchmarks/bench_bulk_generation.py --batch-budget 6000          # multi-field JSON requests
+    python benchmarks/bench_bulk_generation.py --backend fake --error-rate 0.05  # in-process FakeBackend
+
+--backend http (the default) measures the real OpenAI client against a local HTTP server;
+--backend fake skips HTTP entirely and measures the pipeline overhead alone.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tender_ai_tool.settings')
+
+
+def make_handler(latency):
+    class FakeCompletionHandler(BaseHTTPRequestHandler):
+        """Answers /chat/completions like the OpenAI API after a fixed delay"""
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            self.server.completions += 1
+            time.sleep(latency)
+            prompt = body['messages'][-1]['content']
+            if body.get('response_format', {}).get('type') == 'json_object':
+                field_ids = re.findall(r'^\s*- "([^"]+)":', prompt, re.MULTILINE)
+                content = json.dumps({field_id: f'Generated response for {field_id}' for field_id in field_ids})
+            else:
+                content = f'Generated response ({len(prompt)} chars)'
+            if body.get('stream'):
+                self._stream(body, content)
+                return
+            payload = json.dumps({
+                'id': 'chatcmpl-bench',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body['model'],
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': 8, 'total_tokens': len(prompt) // 4 + 8},
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _stream(self, body, content):
+            """Send the content word by word as chat.completion.chunk events"""
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for index, word in enumerate(content.split(' ')):
+                chunk = {
+                    'id': 'chatcmpl-bench',
+                    'object': 'chat.completion.chunk',
+                    'created': int(time.time()),
+                    'model': body['model'],
+                    'choices': [{'index': 0, 'delta': {'content': word if index == 0 else ' ' + word}, 'finish_reason': None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeCompletionHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fields', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.25, help='Fake server latency per request (seconds)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--cache', action='store_true', help='Enable the completion cache (repeat runs become cache hits)')
+    parser.add_argument('--batch-budget', type=int, default=None, help='AI_BATCH_TOKEN_BUDGET (omit for one request per field)')
+    parser.add_argument('--backend', choices=['http', 'fake'], default='http')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of FakeBackend calls that fail (fake backend only)')
+    parser.add_argument('--hedge-percentile', type=float, default=None, help='AI_HEDGE_PERCENTILE, e.g. 95')
+    args = parser.parse_args()
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from tender_app.utils.ai_generator import AIContentGenerator
+    from tender_app.utils.llm_backends import FakeBackend, OpenAICompatibleBackend
+    from tender_app.utils.resilience import metrics
+
+    server = None
+    if args.backend == 'http':
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args.latency))
+        server.completions = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.AI_REQUESTS_PER_MINUTE = None
+    settings.AI_TOKENS_PER_MINUTE = None
+    settings.AI_CACHE_ENABLED = args.cache
+    settings.AI_BATCH_TOKEN_BUDGET = args.batch_budget
+    settings.AI_HEDGE_PERCENTILE = args.hedge_percentile
+    settings.AI_RETRY_BASE_DELAY = 0.05
+
+    fields = [{'id': i, 'field_name': f'Question {i}', 'field_type': 'text'} for i in range(args.fields)]
+    reference = 'Past submission text. ' * 200
+
+    print(f"{args.fields} fields, {args.latency * 1000:.0f} ms per completion")
+    print(f"{args.backend} backend")
+    for concurrency in args.concurrency:
+        if server:
+            backend = OpenAICompatibleBackend(base_url=f'http://127.0.0.1:{server.server_address[1]}/v1')
+            server.completions = 0
+        else:
+            backend = FakeBackend(latency=args.latency, error_rate=args.error_rate)
+        generator = AIContentGenerator(concurrency=concurrency, backend=backend)
+        start = time.perf_counter()
+        results = generator.generate_bulk_content(fields, reference, 'Project: Benchmark')
+        elapsed = time.perf_counter() - start
+        assert list(results) == [str(f['id']) for f in fields]
+        requests = server.completions if server else backend.calls
+        print(f"concurrency={concurrency:>3}  {elapsed:7.2f} s  {len(fields) / elapsed:7.1f} fields/s  "
+              f"{requests} requests")
+
+    snapshot = metrics.snapshot()
+    print(f"retries={snapshot['retries']}  short_circuited={snapshot['short_circuited']}  "
+          f"hedges={snapshot['hedges']} (won {snapshot['hedge_wins']})  latency_ms={snapshot['latency_ms']}")
+
+    if server:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
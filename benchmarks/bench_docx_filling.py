@@ -0,0 +1,86 @@
+# benchmarks/bench_docx_filling.py
+"""Benchmark Word filling at growing document sizes.
+
+Fills every extracted field of generated documents with the position-indexed
+engine (FormFiller) and with the previous python-docx filler, which scanned
+every paragraph for every field. The engine's time should grow with the
+number of fields; the legacy filler's with paragraphs times fields.
+
+Usage:
+    python benchmarks/bench_docx_filling.py --pages 10 20 40 300
+    python benchmarks/bench_docx_filling.py --pages 300 --legacy-max-pages 0
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import docx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tender_ai_tool.settings')
+
+from bench_docx_extraction import make_document
+from tender_app.utils.docx_engine import extract_docx_fields
+from tender_app.utils.form_filler import FormFiller
+
+
+def legacy_fill_word_document(template_path, output_path, field_content):
+    """The previous python-docx filler"""
+    doc = docx.Document(template_path)
+    for paragraph in doc.paragraphs:
+        for field_name, content in field_content.items():
+            for pattern in [f'[{field_name}]', f'{{{field_name}}}', field_name]:
+                if pattern in paragraph.text:
+                    paragraph.text = paragraph.text.replace(pattern, content)
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for field_name, content in field_content.items():
+                    if field_name in cell.text or not cell.text.strip():
+                        cell.text = content
+                        break
+    doc.save(output_path)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 20, 40])
+    parser.add_argument('--legacy-max-pages', type=int, default=40,
+                        help='Skip the legacy filler above this size (it is quadratic)')
+    args = parser.parse_args()
+
+    filler = FormFiller()
+    with tempfile.TemporaryDirectory() as directory:
+        for pages in args.pages:
+            path = os.path.join(directory, f'tender_{pages}.docx')
+            make_document(path, pages)
+            fields = extract_docx_fields(path)
+            content = {}
+            positions = {}
+            for index, field in enumerate(fields):
+                content[field['field_name']] = f'Answer {index}'
+                positions.setdefault(field['field_name'], []).append(field['position_info'])
+
+            output = os.path.join(directory, 'engine.docx')
+            engine_time = timed(filler.fill_document, path, output, content, 'docx', positions)
+            left = len(extract_docx_fields(output))
+
+            legacy = 'skipped'
+            if pages <= args.legacy_max_pages:
+                legacy_time = timed(legacy_fill_word_document, path, os.path.join(directory, 'legacy.docx'), content)
+                legacy = f'{legacy_time:7.3f} s'
+
+            print(f"{pages:4d} pages  {len(fields):5d} fields  engine {engine_time:7.3f} s "
+                  f"({left} fields left unfilled)  legacy {legacy}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/bench_field_persistence.py
+"""Benchmark database writes of the field pipeline as the field count grows.
+
+For each size, times and counts the queries of the three write paths --
+saving extracted fields, saving generated answers and saving the manual
+edit form -- done row by row as before and through tender_app.utils.field_store.
+Runs against a throwaway test database, never the project's own.
+
+Usage:
+    python benchmarks/bench_field_persistence.py --fields 100 1000 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tender_ai_tool.settings')
+
+
+def measure(function):
+    from django.db import connection
+
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+    return elapsed, queries
+
+
+def run(size):
+    from tender_app.models import ExtractedField, TenderProject, TenderTemplate
+    from tender_app.utils.field_store import GeneratedContentWriter, create_fields, update_fields
+
+    project = TenderProject.objects.create(name=f'bench {size}')
+    template = TenderTemplate.objects.create(project=project, file='templates/bench.docx',
+                                             file_type='docx', original_filename='bench.docx')
+    extracted = [{'field_name': f'Field {index}', 'field_type': 'text', 'position_info': {'index': index}}
+                 for index in range(size)]
+
+    def legacy_extract():
+        for field_data in extracted:
+            ExtractedField.objects.create(template=template, field_name=field_data['field_name'],
+                                          field_type=field_data['field_type'],
+                                          position_info=field_data['position_info'])
+
+    def legacy_generate():
+        for field_id in ids:
+            ExtractedField.objects.filter(id=field_id, is_user_edited=False).update(
+                generated_content=f'Answer {field_id}')
+
+    def legacy_save_form():
+        for field_id in ids:
+            field = ExtractedField.objects.get(id=field_id)
+            field.generated_content = f'Edited {field_id}'
+            field.is_filled = True
+            field.save()
+
+    def bulk_generate():
+        writer = GeneratedContentWriter()
+        for field_id in ids:
+            writer.add([{'id': field_id}], f'Answer {field_id}')
+        writer.flush()
+
+    def bulk_save_form():
+        fields = list(ExtractedField.objects.filter(id__in=ids, template__project=project))
+        for field in fields:
+            field.generated_content = f'Edited {field.id}'
+            field.is_filled = True
+        update_fields(fields, ['generated_content', 'is_filled', 'is_user_edited'])
+
+    results = {}
+    results['extract', 'legacy'] = measure(legacy_extract)
+    ids = list(ExtractedField.objects.filter(template=template).values_list('id', flat=True))
+    results['generate', 'legacy'] = measure(legacy_generate)
+    results['save form', 'legacy'] = measure(legacy_save_form)
+    ExtractedField.objects.filter(template=template).delete()
+
+    results['extract', 'bulk'] = measure(lambda: create_fields(template, extracted))
+    ids = list(ExtractedField.objects.filter(template=template).values_list('id', flat=True))
+    results['generate', 'bulk'] = measure(bulk_generate)
+    results['save form', 'bulk'] = measure(bulk_save_form)
+    project.delete()
+
+    for stage in ('extract', 'generate', 'save form'):
+        legacy_time, legacy_queries = results[stage, 'legacy']
+        bulk_time, bulk_queries = results[stage, 'bulk']
+        print(f"{size:>6} fields  {stage:<10} legacy {legacy_time:7.3f} s {legacy_queries:>6} queries   "
+              f"bulk {bulk_time:7.3f} s {bulk_queries:>4} queries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fields', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--batch-size', type=int, help='Overrides FIELD_WRITE_BATCH_SIZE')
+    args = parser.parse_args()
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.db import connection
+
+    # On disk, like the real database, so per-statement commits pay for their fsync
+    settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = os.path.join(tempfile.gettempdir(), 'bench_fields.sqlite3')
+    if args.batch_size:
+        settings.FIELD_WRITE_BATCH_SIZE = args.batch_size
+    test_database = connection.creation.create_test_db(verbosity=0)
+    try:
+        for size in args.fields:
+            run(size)
+    finally:
+        connection.creation.destroy_test_db(test_database, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_parallel_fill.py
+"""Benchmark filling a project's templates one after another and in parallel.
+
+Generates several Word templates of the given sizes and fills them all
+with ParallelFiller, once in-process and once on a process pool. On a
+machine with at least as many cores as templates, the parallel time
+should approach that of the slowest template plus the pool's start-up.
+
+Usage:
+    python benchmarks/bench_parallel_fill.py --pages 40 80 160 300
+    python benchmarks/bench_parallel_fill.py --pages 100 100 100 100 --workers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tender_ai_tool.settings')
+
+from bench_docx_extraction import make_document
+from tender_app.utils.docx_engine import extract_docx_fields
+from tender_app.utils.fill_plans import fill_plans
+from tender_app.utils.parallel_fill import FillTask, ParallelFiller
+
+
+def make_tasks(directory, pages, run):
+    tasks = []
+    for index, size in enumerate(pages):
+        path = os.path.join(directory, f'template_{index}.docx')
+        if not os.path.exists(path):
+            make_document(path, size)
+        content = {}
+        positions = {}
+        for number, field in enumerate(extract_docx_fields(path)):
+            content[field['field_name']] = f'Answer {number}'
+            positions.setdefault(field['field_name'], []).append(field['position_info'])
+        output = os.path.join(directory, run, f'template_{index}_filled.docx')
+        tasks.append(FillTask(index, path, output, content, 'docx', positions))
+    return tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[40, 80, 160, 300])
+    parser.add_argument('--workers', type=int, default=None, help='Pool size (default: one per template)')
+    args = parser.parse_args()
+    workers = args.workers or len(args.pages)
+
+    with tempfile.TemporaryDirectory() as directory:
+        slowest = 0.0
+        for task in make_tasks(directory, args.pages, 'single'):
+            os.makedirs(os.path.dirname(task.output_path), exist_ok=True)
+            fill_plans.clear()
+            start = time.perf_counter()
+            ParallelFiller(max_workers=1).fill([task])
+            elapsed = time.perf_counter() - start
+            slowest = max(slowest, elapsed)
+            print(f"template {task.key}: {args.pages[task.key]:4d} pages  {elapsed:7.3f} s")
+
+        for label, max_workers in (('in-process', 1), (f'{workers} workers', workers)):
+            tasks = make_tasks(directory, args.pages, label)
+            os.makedirs(os.path.dirname(tasks[0].output_path), exist_ok=True)
+            fill_plans.clear()
+            start = time.perf_counter()
+            results = ParallelFiller(max_workers=max_workers).fill(tasks)
+            elapsed = time.perf_counter() - start
+            print(f"{label:>12}: {elapsed:7.3f} s for {sum(results.values())}/{len(tasks)} templates "
+                  f"(slowest template {slowest:.3f} s, {os.cpu_count()} cores)")
+
+if __name__ == '__main__':
+    main()
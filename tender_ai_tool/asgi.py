@@ -2,6 +2,8 @@
 ASGI config for tender_ai_tool project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve through this entry point (e.g. ``uvicorn tender_ai_tool.asgi:application``)
+so AI generation can stream to the browser as Server-Sent Events.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -124,6 +124,57 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
 OPENAI_API_KEY = 'your-open-ai-key-here'
+OPENAI_BASE_URL = None  # None uses the official OpenAI endpoint
+OPENAI_MODEL = 'gpt-4o-mini'
+
+# LLM backend: 'openai', 'openai_compatible' (self-hosted server), 'fake' (offline, deterministic)
+# or a dotted path to an LLMBackend subclass. AI_BACKEND_OPTIONS are passed to its constructor, e.g.
+# {'base_url': 'http://localhost:8001/v1', 'json_mode': False} or {'latency': 0.2, 'error_rate': 0.05}
+AI_BACKEND = 'openai'
+AI_BACKEND_OPTIONS = {}
+AI_REQUEST_TIMEOUT = 60  # Seconds per completion request
+AI_MAX_RETRIES = 3  # Retries for 429, 5xx and connection errors (0 disables)
+AI_RETRY_BASE_DELAY = 0.5  # Seconds; doubled per attempt with full jitter, unless Retry-After says otherwise
+AI_RETRY_MAX_DELAY = 30
+AI_BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures before requests stop being sent
+AI_BREAKER_RESET_SECONDS = 30  # Then one trial request is let through
+AI_HEDGE_PERCENTILE = None  # e.g. 95: duplicate requests slower than the p95 latency
+AI_HEDGE_WORKERS = None  # Threads in the process-wide hedging pool; None for 2 x AI_GENERATION_CONCURRENCY
+
+# AI Generation Settings
+AI_GENERATION_CONCURRENCY = 8  # Parallel completion requests per bulk run
+AI_REQUESTS_PER_MINUTE = 500  # None disables the limit
+AI_TOKENS_PER_MINUTE = 200000  # None disables the limit
+AI_CACHE_ENABLED = True  # Reuse completions for identical requests
+AI_CACHE_TTL = 30 * 24 * 60 * 60  # Seconds
+AI_CACHE_MAX_ENTRIES = 50000  # Least recently used entries are evicted beyond this
+AI_REFERENCE_TOP_K = 4  # Reference chunks retrieved per field
+AI_REFERENCE_TOKEN_BUDGET = 600  # Max reference tokens per field prompt
+REFERENCE_CHUNK_TOKENS = 200  # Target size of indexed reference chunks
+REFERENCE_TEXT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Extracted reference text kept by file hash; None for no limit
+AI_BATCH_TOKEN_BUDGET = 6000  # Pack related fields into one JSON request up to this size; None sends one request per field
+AI_BATCH_MAX_FIELDS = 25
+AI_INPUT_TOKEN_BUDGET = 3000  # Max prompt tokens per single-field request
+AI_MAX_OUTPUT_TOKENS = 800  # Upper bound on max_tokens; short fields get less
+AI_STREAMING = True  # Stream generation token by token to process_document (needs the ASGI server)
+
+# Document Extraction
+EXTRACTION_WORKERS = None  # Extraction processes; None uses every core, 1 extracts in-process
+EXTRACTION_TIMEOUT = 120  # Seconds per document (or PDF page range) before its worker is killed
+EXTRACTION_MAX_TASKS_PER_CHILD = 20  # Recycle workers to contain parser memory leaks
+EXTRACTION_PDF_PAGES_PER_TASK = 50  # Reference PDFs longer than this are split across workers
+EXCEL_MAX_FIELDS_PER_SHEET = 200  # Input cells taken from one worksheet at most
+FIELD_WRITE_BATCH_SIZE = 500  # Extracted and generated fields written per INSERT/UPDATE and transaction
+FILL_PLAN_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Compiled Word/Excel templates kept per process for repeated fills
+FILL_WORKERS = None  # Processes filling a project's templates at once; None uses every core, 1 fills in-process
+BATCH_RENDER_WORKERS = None  # Processes for `render_batch`; None uses every core
+
+# Background Jobs (run `python manage.py run_worker`)
+BACKGROUND_JOBS = True  # False runs jobs inside the web request
+JOB_POLL_INTERVAL = 2  # Seconds between queue polls when idle
+JOB_STALE_SECONDS = 300  # Running jobs without a heartbeat for this long are resumed by another worker
+JOB_HEARTBEAT_SECONDS = 30  # Running jobs heartbeat this often, progress or not; keep well under JOB_STALE_SECONDS
+JOB_MAX_ATTEMPTS = 3
 
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
@@ -0,0 +1,101 @@
+# tender_app/management/commands/gc_blobs.py
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+from datetime import timedelta
+import os
+import time
+
+from tender_app.models import ReferenceDocument, StoredBlob, TenderTemplate
+from tender_app.utils.blob_storage import BLOB_DIR, blob_sha256, blob_storage
+
+class Command(BaseCommand):
+    help = 'Recount blob references and delete uploaded files that no template or reference uses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be deleted without deleting it')
+        parser.add_argument('--grace-seconds', type=int, default=3600,
+                            help='Leave files younger than this alone (uploads may still be in progress)')
+        parser.add_argument('--legacy', action='store_true',
+                            help='Also delete unreferenced files under templates/ and references/ '
+                                 '(copies left by uploads made before blob storage)')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.freed = 0
+        cutoff = timezone.now() - timedelta(seconds=options['grace_seconds'])
+        cutoff_timestamp = time.time() - options['grace_seconds']
+
+        references = self._reference_counts()
+
+        # Counts are kept up to date on save and delete; recounting repairs any drift
+        for blob in StoredBlob.objects.all():
+            count = references.get(blob.name, 0)
+            if blob.ref_count != count:
+                self.stdout.write(f"{blob.name}: {blob.ref_count} references recorded, {count} found")
+                if not self.dry_run:
+                    StoredBlob.objects.filter(name=blob.name).update(ref_count=count)
+
+        unreferenced = StoredBlob.objects.filter(created_at__lt=cutoff).exclude(name__in=list(references))
+        deleted_blobs = 0
+        for blob in unreferenced:
+            if blob_storage.exists(blob.name) and os.path.getmtime(blob_storage.path(blob.name)) >= cutoff_timestamp:
+                continue  # Reused by an upload just now
+            self._delete_file(blob.name)
+            if not self.dry_run:
+                blob.delete()
+            deleted_blobs += 1
+
+        # Blob files without a row: a crash between writing a blob and recording it
+        known = set(StoredBlob.objects.values_list('name', flat=True))
+        stray = [name for name in self._files(BLOB_DIR, cutoff_timestamp)
+                 if name not in known or not blob_sha256(name)]
+        for name in stray:
+            self._delete_file(name)
+
+        legacy = []
+        if options['legacy']:
+            for directory in ('templates', 'references'):
+                legacy.extend(name for name in self._files(directory, cutoff_timestamp) if name not in references)
+            for name in legacy:
+                self._delete_file(name)
+
+        verb = 'Would delete' if self.dry_run else 'Deleted'
+        self.stdout.write(f"{verb} {deleted_blobs} unreferenced blobs, {len(stray)} stray blob files and "
+                          f"{len(legacy)} legacy files, {self.freed / 1024 / 1024:.1f} MiB")
+
+    @staticmethod
+    def _reference_counts():
+        counts = {}
+        for model in (TenderTemplate, ReferenceDocument):
+            for name, count in model.objects.values('file').annotate(count=Count('pk')).values_list('file', 'count'):
+                counts[name] = counts.get(name, 0) + count
+        return counts
+
+    @staticmethod
+    def _files(directory, older_than):
+        """Storage names of the files under a media directory last modified before older_than"""
+        root = blob_storage.path(directory)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if os.path.getmtime(path) < older_than:
+                    yield os.path.relpath(path, blob_storage.location).replace(os.sep, '/')
+
+    def _delete_file(self, name):
+        if not blob_storage.exists(name):
+            return
+        self.freed += blob_storage.size(name)
+        if self.dry_run:
+            return
+        blob_storage.delete(name)
+        if blob_sha256(name):
+            # Prune the two shard directories once empty
+            directory = os.path.dirname(blob_storage.path(name))
+            for _ in range(2):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
@@ -0,0 +1,43 @@
+# tender_app/management/commands/render_batch.py
+from django.core.management.base import BaseCommand, CommandError
+import os
+
+from tender_app.models import TenderTemplate
+from tender_app.utils.batch_render import BatchRenderer, read_value_rows
+
+class Command(BaseCommand):
+    help = 'Fill one template once per row of a CSV or XLSX file of field values (mail merge)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('template_id', type=int)
+        parser.add_argument('values', help='CSV or XLSX file; the header row names the fields')
+        parser.add_argument('--zip', action='store_true',
+                            help='Write one ZIP instead of a directory of documents')
+        parser.add_argument('--name', default='',
+                            help='Name of the output directory or ZIP under media/processed/batch/')
+        parser.add_argument('--name-column', default='',
+                            help='Column whose value names each document (defaults to <template>_<row>)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Render processes (defaults to BATCH_RENDER_WORKERS or every core)')
+
+    def handle(self, *args, **options):
+        try:
+            template = TenderTemplate.objects.select_related('project').get(pk=options['template_id'])
+        except TenderTemplate.DoesNotExist:
+            raise CommandError(f"Template {options['template_id']} does not exist")
+        if not os.path.exists(options['values']):
+            raise CommandError(f"{options['values']} does not exist")
+
+        def progress(rendered):
+            if rendered % 500 == 0:
+                self.stdout.write(f"{rendered} documents rendered")
+
+        result = BatchRenderer(template, max_workers=options['workers']).render(
+            read_value_rows(options['values']),
+            batch_name=options['name'] or None,
+            as_zip=options['zip'],
+            name_column=options['name_column'] or None,
+            on_progress=progress
+        )
+        self.stdout.write(f"Rendered {result.rendered} documents into media/{result.output}"
+                          + (f" ({result.failed} rows failed, see the log)" if result.failed else ''))
@@ -0,0 +1,51 @@
+# tender_app/management/commands/run_worker.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import os
+import signal
+import socket
+import time
+
+from tender_app.utils.job_queue import claim_next_job, run_job
+
+class Command(BaseCommand):
+    help = 'Process queued AI generation and document filling jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when the queue is empty instead of polling')
+        parser.add_argument('--poll-interval', type=float,
+                            default=getattr(settings, 'JOB_POLL_INTERVAL', 2),
+                            help='Seconds to wait between polls when the queue is empty')
+        parser.add_argument('--worker-id', default='',
+                            help='Identifier recorded on claimed jobs (defaults to host:pid)')
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = False
+
+        def stop(signum, frame):
+            # Finish the current job; anything left mid-run is resumed from its last completed field
+            self.stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f"Worker {worker_id} started")
+        while not self.stopping:
+            close_old_connections()
+            job = claim_next_job(worker_id)
+
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f"Running {job.kind} job {job.pk} for project {job.project_id}")
+            run_job(job)
+            job.refresh_from_db()
+            self.stdout.write(f"Job {job.pk} {job.status}")
+
+        self.stdout.write(f"Worker {worker_id} stopped")
@@ -0,0 +1,23 @@
+# tender_app/management/commands/template_library.py
+from django.core.management.base import BaseCommand
+import json
+
+from tender_app.utils.template_library import TemplateLibrary
+
+class Command(BaseCommand):
+    help = 'Show template library statistics or invalidate stored field schemas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['stats', 'invalidate'])
+        parser.add_argument('--sha256', default='',
+                            help='Invalidate only the schema of this template hash')
+        parser.add_argument('--stale', action='store_true',
+                            help='Invalidate only schemas from older extractor versions')
+
+    def handle(self, *args, **options):
+        if options['action'] == 'stats':
+            self.stdout.write(json.dumps(TemplateLibrary.stats(), indent=2))
+            return
+
+        deleted = TemplateLibrary.invalidate(sha256=options['sha256'] or None, stale_only=options['stale'])
+        self.stdout.write(f"Invalidated {deleted} template schemas")
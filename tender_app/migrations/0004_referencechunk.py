@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tender_app', '0003_completioncacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='referencedocument',
+            name='indexed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ReferenceChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ordinal', models.PositiveIntegerField()),
+                ('text', models.TextField()),
+                ('term_counts', models.JSONField()),
+                ('length', models.PositiveIntegerField()),
+                ('reference', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='tender_app.referencedocument')),
+            ],
+            options={
+                'ordering': ['reference_id', 'ordinal'],
+            },
+        ),
+    ]
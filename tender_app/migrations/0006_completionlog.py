@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tender_app', '0005_processingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompletionLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('field_count', models.PositiveIntegerField(default=1)),
+                ('max_tokens', models.PositiveIntegerField()),
+                ('prompt_tokens', models.PositiveIntegerField()),
+                ('completion_tokens', models.PositiveIntegerField()),
+                ('latency_ms', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('field', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='tender_app.extractedfield')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='tender_app.tenderproject')),
+            ],
+        ),
+    ]
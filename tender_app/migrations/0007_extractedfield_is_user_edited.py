@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tender_app', '0006_completionlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extractedfield',
+            name='is_user_edited',
+            field=models.BooleanField(default=False),
+        ),
+    ]
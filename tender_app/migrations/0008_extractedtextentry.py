@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tender_app', '0007_extractedfield_is_user_edited'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractedTextEntry',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('file_type', models.CharField(max_length=10)),
+                ('extractor_version', models.PositiveIntegerField()),
+                ('text', models.TextField()),
+                ('size', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tender_app', '0008_extractedtextentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TemplateSchema',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('file_type', models.CharField(max_length=10)),
+                ('extractor_version', models.PositiveIntegerField()),
+                ('options', models.JSONField(default=dict)),
+                ('fields', models.JSONField()),
+                ('field_count', models.PositiveIntegerField()),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='tendertemplate',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:50
+
+import tender_app.utils.blob_storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tender_app', '0009_templateschema'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='referencedocument',
+            name='file',
+            field=models.FileField(storage=tender_app.utils.blob_storage.get_blob_storage, upload_to='references/'),
+        ),
+        migrations.AlterField(
+            model_name='tendertemplate',
+            name='file',
+            field=models.FileField(storage=tender_app.utils.blob_storage.get_blob_storage, upload_to='templates/'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:52
+
+from django.db import migrations, models
+
+
+def mark_existing_ready(apps, schema_editor):
+    TenderTemplate = apps.get_model('tender_app', 'TenderTemplate')
+    ReferenceDocument = apps.get_model('tender_app', 'ReferenceDocument')
+    TenderTemplate.objects.filter(extractedfield__isnull=False).update(extraction_status='ready')
+    ReferenceDocument.objects.filter(indexed_at__isnull=False).update(extraction_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tender_app', '0010_storedblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='referencedocument',
+            name='extraction_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='referencedocument',
+            name='extraction_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='tendertemplate',
+            name='extraction_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='tendertemplate',
+            name='extraction_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='processingjob',
+            name='kind',
+            field=models.CharField(choices=[('generate', 'Generate Content'), ('fill', 'Fill Documents'), ('prepare', 'Prepare Documents')], max_length=20),
+        ),
+        migrations.RunPython(mark_existing_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tender_app', '0011_extraction_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='processeddocument',
+            name='file',
+            field=models.FileField(max_length=255, upload_to='processed/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tender_app', '0013_processeddocument_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extractedtextentry',
+            name='hit_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tender_app', '0014_extractedtextentry_hit_count'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='extractedtextentry',
+            name='text',
+        ),
+        migrations.AddField(
+            model_name='extractedtextentry',
+            name='chunks',
+            field=models.JSONField(default=[]),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='referencechunk',
+            name='source',
+            field=models.JSONField(default=dict),
+        ),
+    ]
@@ -1,8 +1,20 @@
 # tender_app/models.py
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 import uuid
 
+from .utils.blob_storage import add_reference, get_blob_storage
+
+# Readiness of an uploaded file's fields (templates) or retrieval chunks (references)
+EXTRACTION_STATUSES = [
+    ('pending', 'Pending'),
+    ('processing', 'Processing'),
+    ('ready', 'Ready'),
+    ('failed', 'Failed')
+]
+
 class TenderProject(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=200)
@@ -21,7 +33,7 @@ class TenderProject(models.Model):
 
 class TenderTemplate(models.Model):
     project = models.ForeignKey(TenderProject, on_delete=models.CASCADE)
-    file = models.FileField(upload_to='templates/')
+    file = models.FileField(upload_to='templates/', storage=get_blob_storage)  # Deduplicated by content
     title = models.CharField(max_length=200, blank=True)
     file_type = models.CharField(max_length=10, choices=[
         ('docx', 'Word Document'),
@@ -30,13 +42,30 @@ class TenderTemplate(models.Model):
     ])
     original_filename = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)  # Of the file bytes, set on field extraction
+    extraction_status = models.CharField(max_length=20, choices=EXTRACTION_STATUSES, default='pending')
+    extraction_error = models.TextField(blank=True)
 
 class ReferenceDocument(models.Model):
     project = models.ForeignKey(TenderProject, on_delete=models.CASCADE)
-    file = models.FileField(upload_to='references/')
+    file = models.FileField(upload_to='references/', storage=get_blob_storage)  # Deduplicated by content
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    indexed_at = models.DateTimeField(null=True, blank=True)  # Set once chunks are in the retrieval index
+    extraction_status = models.CharField(max_length=20, choices=EXTRACTION_STATUSES, default='pending')
+    extraction_error = models.TextField(blank=True)
+
+class ReferenceChunk(models.Model):
+    reference = models.ForeignKey(ReferenceDocument, on_delete=models.CASCADE, related_name='chunks')
+    ordinal = models.PositiveIntegerField()
+    text = models.TextField()
+    term_counts = models.JSONField()  # {term: frequency} for BM25 scoring
+    length = models.PositiveIntegerField()  # Number of indexed terms
+    source = models.JSONField(default=dict)  # File plus page, sheet and row range, or paragraph range
+
+    class Meta:
+        ordering = ['reference_id', 'ordinal']
 
 class ExtractedField(models.Model):
     template = models.ForeignKey(TenderTemplate, on_delete=models.CASCADE)
@@ -45,8 +74,99 @@ class ExtractedField(models.Model):
     position_info = models.JSONField()  # Store position/location data
     generated_content = models.TextField(blank=True)
     is_filled = models.BooleanField(default=False)
+    is_user_edited = models.BooleanField(default=False)  # Manual edits are never overwritten by generation
 
 class ProcessedDocument(models.Model):
     project = models.ForeignKey(TenderProject, on_delete=models.CASCADE)
-    file = models.FileField(upload_to='processed/')
+    file = models.FileField(upload_to='processed/', max_length=255)  # processed/<project id>/<run>/<name>
+    template = models.ForeignKey(TenderTemplate, null=True, blank=True, on_delete=models.SET_NULL)
+    fingerprint = models.CharField(max_length=64, blank=True)  # Of template, filler version and values; empty for batches
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class CompletionCacheEntry(models.Model):
+    key = models.CharField(max_length=64, primary_key=True)  # SHA-256 of the request
+    model = models.CharField(max_length=100)
+    response = models.TextField()
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+class ProcessingJob(models.Model):
+    project = models.ForeignKey(TenderProject, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=[
+        ('generate', 'Generate Content'),
+        ('fill', 'Fill Documents'),
+        ('prepare', 'Prepare Documents')  # Extraction and indexing started by uploads
+    ])
+    status = models.CharField(max_length=20, choices=[
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled')
+    ], default='queued', db_index=True)
+    stage = models.CharField(max_length=20, blank=True)  # extract, retrieve, generate or fill
+    progress = models.JSONField(default=dict)  # {stage: {'done': n, 'total': m}}
+    completed_field_ids = models.JSONField(default=list)  # Generated fields, skipped on resume
+    options = models.JSONField(default=dict)
+    cancel_requested = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+class CompletionLog(models.Model):
+    project = models.ForeignKey(TenderProject, on_delete=models.CASCADE, null=True, blank=True)
+    field = models.ForeignKey(ExtractedField, on_delete=models.SET_NULL, null=True, blank=True)  # Null for batched requests
+    model = models.CharField(max_length=100)
+    field_count = models.PositiveIntegerField(default=1)  # Fields answered by this request
+    max_tokens = models.PositiveIntegerField()
+    prompt_tokens = models.PositiveIntegerField()
+    completion_tokens = models.PositiveIntegerField()
+    latency_ms = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class ExtractedTextEntry(models.Model):
+    sha256 = models.CharField(max_length=64, primary_key=True)  # Of the file bytes, shared across projects
+    file_type = models.CharField(max_length=10)
+    extractor_version = models.PositiveIntegerField()
+    chunks = models.JSONField()  # iter_reference_chunks output: [{'text': ..., 'source': {...}}]
+    size = models.PositiveIntegerField()  # Bytes of serialised chunks, for size-based eviction
+    hit_count = models.PositiveIntegerField(default=0)  # Lookups served without re-extraction
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+class TemplateSchema(models.Model):
+    sha256 = models.CharField(max_length=64, primary_key=True)  # Of the template file, shared across projects
+    file_type = models.CharField(max_length=10)
+    extractor_version = models.PositiveIntegerField()
+    options = models.JSONField(default=dict)  # Extraction options the fields depend on
+    fields = models.JSONField()  # [{field_name, field_type, position_info}]
+    field_count = models.PositiveIntegerField()
+    hit_count = models.PositiveIntegerField(default=0)  # Templates served without re-extraction
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+class StoredBlob(models.Model):
+    name = models.CharField(max_length=255, primary_key=True)  # Storage name: blobs/<shard>/<shard>/<sha256>.<ext>
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.IntegerField(default=0)  # Template and reference rows using the blob
+    created_at = models.DateTimeField(auto_now_add=True)
+
+@receiver(post_save, sender=TenderTemplate)
+@receiver(post_save, sender=ReferenceDocument)
+def _count_blob_reference(sender, instance, created, **kwargs):
+    if created:
+        add_reference(instance.file.name, 1)
+
+@receiver(post_delete, sender=TenderTemplate)
+@receiver(post_delete, sender=ReferenceDocument)
+def _release_blob_reference(sender, instance, **kwargs):
+    add_reference(instance.file.name, -1)
@@ -0,0 +1,574 @@
+import asyncio
+import math
+import os
+import tempfile
+import zipfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files import File
+from django.db import connection
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from docx import Document
+from openpyxl import Workbook, load_workbook
+
+from tender_app.models import (ExtractedField, ProcessedDocument, ProcessingJob, ReferenceChunk, ReferenceDocument,
+                               TenderProject, TenderTemplate)
+from tender_app.utils.ai_generator import AIContentGenerator
+from tender_app.utils.batch_render import BatchRenderer
+from tender_app.utils.document_processor import DocumentProcessor
+from tender_app.utils.docx_engine import extract_docx_fields
+from tender_app.utils.excel_engine import extract_excel_fields
+from tender_app.utils.field_groups import group_fields
+from tender_app.utils.field_store import GeneratedContentWriter, create_fields, update_fields
+from tender_app.utils.fill_plans import FillPlanCache
+from tender_app.utils.form_filler import FormFiller
+from tender_app.utils.job_queue import Heartbeat, claim_next_job, request_cancel
+from tender_app.utils.llm_backends import BackendError, Completion, FakeBackend, LLMBackend
+from tender_app.utils.parallel_fill import FillTask, ParallelFiller
+from tender_app.utils.pipeline import GenerationPipeline
+from tender_app.utils.rate_limiter import RateLimiter
+from tender_app.utils.reference_index import ReferenceIndex, chunk_text, index_reference
+from tender_app.utils.resilience import CircuitBreaker, CircuitOpenError, ResilientBackend, metrics
+from tender_app.utils.streaming import start_stream_job, stream_generation
+from tender_app.utils.tokens import count_tokens
+
+REQUEST = {'model': 'test', 'messages': [{'role': 'user', 'content': 'Hello'}]}
+EMPLOYEE_FORM = os.path.join(settings.BASE_DIR, 'employee_form_template.docx')
+
+def docx_paragraphs(source):
+    return [paragraph.text for paragraph in Document(source).paragraphs]
+
+def field_positions(fields):
+    positions = {}
+    for field in fields:
+        positions.setdefault(field['field_name'], []).append(field['position_info'])
+    return positions
+
+class FlakyBackend(LLMBackend):
+    """Raises the given errors on its first calls, then answers"""
+
+    def __init__(self, *errors: BaseException):
+        self.errors = list(errors)
+
+    def complete(self, request):
+        if self.errors:
+            raise self.errors.pop(0)
+        return Completion('ok')
+
+class CountingLimiter(RateLimiter):
+    """Unlimited, but records the tokens of every acquire"""
+
+    def __init__(self):
+        super().__init__()
+        self.acquired = []
+
+    def acquire(self, tokens=0):
+        self.acquired.append(tokens)
+
+class SlowFirstBackend(LLMBackend):
+    """The first call answers after delay, later ones straight away"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+
+    def complete(self, request):
+        self.calls += 1
+        if self.calls == 1:
+            time.sleep(self.delay)
+            return Completion('slow')
+        return Completion('fast')
+
+class BulkGenerationFailureTests(SimpleTestCase):
+    def test_failed_fields_are_not_reported_as_results(self):
+        # Client errors are not retried, and do not trip the breaker
+        generator = AIContentGenerator(backend=FakeBackend(error_rate=0.5, error_status=400, seed=1))
+        generator.cache = None
+        fields = [{'id': number, 'field_name': f'Field {number}', 'field_type': 'text'} for number in range(20)]
+        saved = {}
+
+        results = generator.generate_bulk_content(fields, '', on_result=saved.__setitem__)
+
+        failed = [field_id for field_id, content in results.items() if content.startswith('Error generating')]
+        self.assertTrue(failed)
+        self.assertEqual(sorted(saved), sorted(set(results) - set(failed)))
+        self.assertFalse(any(content.startswith('Error generating') for content in saved.values()))
+
+class CircuitBreakerTrialTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: self.now)
+        self.breaker.record_failure()
+        self.now = 10.0  # Half-open: the next call is the trial
+        self.assertEqual(self.breaker.state, 'half_open')
+
+    def test_unexpected_error_releases_trial(self):
+        backend = ResilientBackend(FlakyBackend(ValueError('bug')), self.breaker, max_retries=0, sleep=lambda _: None)
+        with self.assertRaises(ValueError):
+            backend.complete(REQUEST)
+
+        self.assertEqual(backend.complete(REQUEST).content, 'ok')
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_trial_in_progress_short_circuits_other_calls(self):
+        self.assertEqual(self.breaker.acquire(), 'trial')
+        backend = ResilientBackend(FlakyBackend(), self.breaker, max_retries=0)
+        with self.assertRaises(CircuitOpenError):
+            backend.complete(REQUEST)
+
+    def test_abandoned_stream_releases_trial(self):
+        backend = ResilientBackend(FakeBackend(), self.breaker, max_retries=0)
+
+        async def read_first_piece():
+            stream = backend.stream(REQUEST)
+            await stream.__anext__()
+            await stream.aclose()  # The SSE client disconnected
+
+        asyncio.run(read_first_piece())
+        self.assertEqual(self.breaker.acquire(), 'trial')
+
+class RateLimitedRetryTests(SimpleTestCase):
+    def backend(self, inner, **options):
+        self.limiter = CountingLimiter()
+        return ResilientBackend(inner, CircuitBreaker(failure_threshold=10), rate_limiter=self.limiter,
+                                request_tokens=lambda request: 7, sleep=lambda _: None, **options)
+
+    def test_every_retry_waits_for_capacity(self):
+        backend = self.backend(FlakyBackend(BackendError('busy', status_code=503), BackendError('busy', status_code=429)))
+        self.assertEqual(backend.complete(REQUEST).content, 'ok')
+        self.assertEqual(self.limiter.acquired, [7, 7, 7])
+
+    def test_streamed_retry_waits_for_capacity(self):
+        backend = self.backend(FlakyBackend(BackendError('busy', status_code=503)))
+
+        async def read_all():
+            return [chunk.content async for chunk in backend.stream(REQUEST)]
+
+        self.assertTrue(asyncio.run(read_all()))
+        self.assertEqual(self.limiter.acquired, [7, 7])
+
+    def test_hedge_waits_for_capacity(self):
+        for _ in range(5):
+            metrics.observe(0.01)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            backend = self.backend(SlowFirstBackend(0.5), hedge_percentile=50, hedge_min_samples=1,
+                                   hedge_executor=executor)
+            self.assertEqual(backend.complete(REQUEST).content, 'fast')
+        self.assertEqual(self.limiter.acquired, [7, 7])
+
+class ExcelFieldExtractionTests(SimpleTestCase):
+    def field_names(self, rows):
+        workbook = Workbook()
+        for row in rows:
+            workbook.active.append(row)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'form.xlsx')
+            workbook.save(path)
+            return [field['field_name'] for field in extract_excel_fields(path)]
+
+    def test_two_column_form_rows_are_not_headers(self):
+        rows = [
+            ['Company Name:', None, 'Phone:', None],
+            ['ABN:', None, 'Email:', None],
+            ['Address:', None],
+        ]
+        self.assertEqual(self.field_names(rows), ['Company Name', 'Phone', 'ABN', 'Email', 'Address'])
+
+    def test_label_with_input_before_more_text(self):
+        self.assertEqual(self.field_names([['Contact:', None, 'x']]), ['Contact'])
+
+    def test_formulas_are_not_labels(self):
+        rows = [
+            ['Address:', None, '=1+1'],
+            ['=1+1', 'Email', None],
+        ]
+        self.assertEqual(self.field_names(rows), ['Address', 'Email'])
+
+    def test_table_header_followed_by_data_rows(self):
+        rows = [
+            ['Item', 'Qty', 'Price'],
+            ['Widget', None, None],
+            ['Gadget', 3, '[Enter price]'],
+        ]
+        self.assertEqual(self.field_names(rows), ['Widget - Qty', 'Widget - Price', 'Gadget - Price'])
+
+    def test_labels_without_data_below_are_not_headers(self):
+        self.assertEqual(self.field_names([['Name:', 'Phone:', None]]), ['Phone'])
+
+class FieldGroupTests(SimpleTestCase):
+    def grouped_ids(self, *fields):
+        numbered = [{'id': number, 'field_type': 'text', 'position_info': {}, **field}
+                    for number, field in enumerate(fields, start=1)]
+        return [[field['id'] for field in group] for group in group_fields(numbered)]
+
+    def test_equal_labels_are_generated_once(self):
+        groups = self.grouped_ids(
+            {'field_name': 'Project_v2'}, {'field_name': 'Phase_q3'}, {'field_name': '[Company Name]'},
+            {'field_name': 'project v2'}, {'field_name': 'Phase_Q3'}, {'field_name': 'Company Name:'},
+        )
+        self.assertEqual(groups, [[1, 4], [2, 5], [3, 6]])
+
+    def test_different_types_stay_apart(self):
+        groups = self.grouped_ids({'field_name': 'Start Date'}, {'field_name': 'Start Date', 'field_type': 'date'})
+        self.assertEqual(groups, [[1], [2]])
+
+    def test_names_made_up_from_positions_stay_apart(self):
+        names = ['Field_3', 'Widget_7', 'Table_0_Row_2_Cell_1', 'Header1_Table_0_Row_0_Cell_1',
+                 'Table_1_Row_0_Cell_0_Table_0_Row_1_Cell_1', 'underscore_field_4', '______']
+        groups = self.grouped_ids(*({'field_name': name} for name in names + names))
+        self.assertEqual(groups, [[number] for number in range(1, 2 * len(names) + 1)])
+
+    def test_legacy_spreadsheet_cell_names_stay_apart(self):
+        cell = {'field_name': 'Sheet1_B4', 'position_info': {'sheet': 'Sheet1', 'coordinate': 'B4'}}
+        self.assertEqual(self.grouped_ids(cell, cell), [[1], [2]])
+
+class ChunkTextTests(SimpleTestCase):
+    PARAGRAPH = ' '.join(f'Sentence number {number} describes our safety record in some detail.' for number in range(200))
+
+    def test_long_lines_are_split_between_sentences(self):
+        chunks = chunk_text(f'Heading\n{self.PARAGRAPH}\nFooter', chunk_tokens=50)
+
+        self.assertGreater(len(chunks), 10)
+        self.assertTrue(all(count_tokens(text) <= 50 for _, _, text in chunks))
+        self.assertEqual(' '.join(text.replace('\n', ' ') for _, _, text in chunks), f'Heading {self.PARAGRAPH} Footer')
+        self.assertTrue(all(text.endswith('detail.') for _, _, text in chunks[:-1]))
+        self.assertEqual([(first, last) for first, last, _ in chunks][-1], (1, 2))
+
+    def test_a_word_longer_than_a_chunk_is_cut(self):
+        word = 'x' * 5000
+        chunks = chunk_text(word, chunk_tokens=20)
+        self.assertTrue(all(count_tokens(text) <= 20 for _, _, text in chunks))
+        self.assertEqual(''.join(text for _, _, text in chunks), word)
+
+    def test_best_chunk_larger_than_the_budget_is_truncated(self):
+        chunk = {'title': 'Policy', 'text': self.PARAGRAPH, 'source': {}, 'term_counts': {'safety': 200}, 'length': 2000}
+        context = ReferenceIndex([chunk]).select('safety', token_budget=100)
+
+        self.assertTrue(context.startswith('=== Policy ===\nSentence number 0'))
+        self.assertLessEqual(count_tokens(context), 100)
+
+class ReferenceChunkSourceTests(TestCase):
+    def test_index_chunks_keep_their_sheet_and_rows(self):
+        workbook = Workbook()
+        workbook.active.title = 'Prices'
+        for number in range(1, 41):
+            workbook.active.append([f'Widget {number}', number * 10])
+        project = TenderProject.objects.create(name='Sources')
+        reference = ReferenceDocument.objects.create(project=project, title='Price list', file='references/prices.xlsx')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'prices.xlsx')
+            workbook.save(path)
+            extracted = DocumentProcessor().iter_reference_chunks(path, 'xlsx', rows_per_chunk=25)
+            count = index_reference(reference, extracted, chunk_tokens=20)
+
+        chunks = list(ReferenceChunk.objects.filter(reference=reference))
+        self.assertEqual(len(chunks), count)
+        self.assertGreater(count, 2)
+        rows = []
+        for chunk in chunks:
+            first, last = chunk.source['rows']
+            self.assertEqual(chunk.source['file'], 'prices.xlsx')
+            self.assertEqual(chunk.source['sheet'], 'Prices')
+            self.assertEqual(chunk.text.splitlines(), [f'Widget {n} {n * 10}' for n in range(first, last + 1)])
+            rows.extend(range(first, last + 1))
+        self.assertEqual(rows, list(range(1, 41)))
+
+        first, last = chunks[-1].source['rows']
+        context = ReferenceIndex.for_project(project).select('Widget 40', top_k=1)
+        self.assertTrue(context.startswith(f'=== Price list (sheet Prices, rows {first}-{last}) ==='))
+
+class MediaRootMixin:
+    """Runs each test with an empty MEDIA_ROOT of its own"""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = directory.name
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def upload_template(self, project, path=EMPLOYEE_FORM):
+        with open(path, 'rb') as file:
+            return TenderTemplate.objects.create(project=project, file=File(file, name=os.path.basename(path)),
+                                                 file_type='docx', original_filename=os.path.basename(path))
+
+    def media_path(self, name):
+        return os.path.join(self.media_root, *name.split('/'))
+
+class BatchRenderTests(MediaRootMixin, TestCase):
+    ROWS = [
+        {'name': 'ann', 'Field_1': 'Ann Archer', 'Job Title': 'Chef'},
+        {'name': 'bob', 'Field_1': 'Bob Baker'},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.project = TenderProject.objects.create(name='Batch')
+        self.template = self.upload_template(self.project)
+
+    def test_directory_of_named_documents(self):
+        result = BatchRenderer(self.template, max_workers=1).render(self.ROWS, batch_name='staff', name_column='name')
+
+        self.assertEqual((result.rendered, result.failed, result.output), (2, 0, 'processed/batch/staff'))
+        self.assertEqual(sorted(ProcessedDocument.objects.filter(project=self.project).values_list('file', flat=True)),
+                         ['processed/batch/staff/ann.docx', 'processed/batch/staff/bob.docx'])
+        ann = docx_paragraphs(self.media_path('processed/batch/staff/ann.docx'))
+        bob = docx_paragraphs(self.media_path('processed/batch/staff/bob.docx'))
+        self.assertEqual((ann[2], ann[7]), ('Full Name: Ann Archer', 'Position: Chef'))
+        # An empty cell leaves the placeholder
+        self.assertEqual((bob[2], bob[7]), ('Full Name: Bob Baker', 'Position: [Job Title]'))
+
+    def test_zip_rendered_on_a_pool(self):
+        result = BatchRenderer(self.template, max_workers=2).render(self.ROWS, batch_name='staff', as_zip=True)
+
+        self.assertEqual((result.rendered, result.failed, result.output), (2, 0, 'processed/batch/staff.zip'))
+        self.assertEqual(list(ProcessedDocument.objects.filter(project=self.project).values_list('file', flat=True)),
+                         ['processed/batch/staff.zip'])
+        with zipfile.ZipFile(self.media_path(result.output)) as archive:
+            self.assertEqual(sorted(archive.namelist()),
+                             ['employee_form_template_00001.docx', 'employee_form_template_00002.docx'])
+            names = [docx_paragraphs(archive.open(name))[2] for name in sorted(archive.namelist())]
+        self.assertEqual(names, ['Full Name: Ann Archer', 'Full Name: Bob Baker'])
+
+@override_settings(FILL_WORKERS=1)
+class IncrementalFillTests(MediaRootMixin, TestCase):
+    def test_only_templates_with_changed_fields_are_rendered_again(self):
+        project = TenderProject.objects.create(name='Incremental')
+        employee = self.upload_template(project)
+        advanced = self.upload_template(project, os.path.join(settings.BASE_DIR, 'advanced_template.docx'))
+        pipeline = GenerationPipeline(project)
+        pipeline.extract_fields()
+        for field in ExtractedField.objects.filter(template__project=project):
+            field.generated_content = f'Answer {field.pk}'
+            field.save()
+
+        def current_documents():
+            return {document.template_id: document
+                    for document in ProcessedDocument.objects.filter(project=project)}
+
+        self.assertEqual(pipeline.fill_documents(), 2)
+        first = current_documents()
+        self.assertEqual(pipeline.fill_documents(), 2)
+        self.assertEqual({pk: document.pk for pk, document in current_documents().items()},
+                         {pk: document.pk for pk, document in first.items()})
+
+        ExtractedField.objects.filter(template=employee, field_name='Field_1').update(generated_content='Jane Citizen')
+        self.assertEqual(pipeline.fill_documents(), 2)
+        second = current_documents()
+
+        self.assertEqual(second[advanced.pk].pk, first[advanced.pk].pk)
+        self.assertNotEqual(second[employee.pk].pk, first[employee.pk].pk)
+        self.assertEqual(docx_paragraphs(second[employee.pk].file.path)[2], 'Full Name: Jane Citizen')
+        # The superseded document is gone, the unchanged one is still there
+        self.assertFalse(os.path.exists(first[employee.pk].file.path))
+        self.assertTrue(os.path.exists(second[advanced.pk].file.path))
+        self.assertEqual(ProcessedDocument.objects.filter(project=project).count(), 2)
+
+class ParallelFillTests(SimpleTestCase):
+    def test_pool_fills_each_template_and_reports_failures(self):
+        positions = field_positions(extract_docx_fields(EMPLOYEE_FORM))
+        with tempfile.TemporaryDirectory() as directory:
+            tasks = [
+                FillTask(key, path, os.path.join(directory, f'{key}.docx'), {'Field_1': f'Name {key}'}, 'docx', positions)
+                for key, path in (('a', EMPLOYEE_FORM), ('missing', os.path.join(directory, 'missing.docx')),
+                                  ('b', EMPLOYEE_FORM))
+            ]
+            reported = {}
+
+            results = ParallelFiller(max_workers=2).fill(tasks, on_result=reported.__setitem__)
+
+            self.assertEqual(list(results.items()), [('a', True), ('missing', False), ('b', True)])
+            self.assertEqual(reported, results)
+            self.assertEqual(docx_paragraphs(os.path.join(directory, 'a.docx'))[2], 'Full Name: Name a')
+            self.assertEqual(docx_paragraphs(os.path.join(directory, 'b.docx'))[2], 'Full Name: Name b')
+            self.assertEqual(sorted(os.listdir(directory)), ['a.docx', 'b.docx'])
+
+class WordFillTests(SimpleTestCase):
+    def test_fills_placeholders_in_place_keeping_run_formatting(self):
+        content = {'Field_1': 'Jane Citizen', 'Job Title': 'Engineer', 'Field_9': 'J. Citizen'}
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'filled.docx')
+            filled = FormFiller().fill_document(EMPLOYEE_FORM, output, content, 'docx',
+                                                field_positions(extract_docx_fields(EMPLOYEE_FORM)))
+            self.assertTrue(filled)
+            template, document = Document(EMPLOYEE_FORM), Document(output)
+
+        self.assertEqual(len(document.paragraphs), len(template.paragraphs))
+        paragraphs = {index: paragraph.text for index, paragraph in enumerate(document.paragraphs)}
+        self.assertEqual(paragraphs[2], 'Full Name: Jane Citizen')
+        self.assertEqual(paragraphs[7], 'Position: Engineer')
+        self.assertEqual(paragraphs[13], 'Employee Signature: J. Citizen')
+        # Fields without content keep their placeholder, other text is untouched
+        self.assertEqual(paragraphs[6], 'Department: [Select Department]')
+        self.assertEqual(paragraphs[1], 'Personal Information')
+
+        for index in (2, 7, 13):
+            label, value = document.paragraphs[index].runs
+            template_label, placeholder = template.paragraphs[index].runs
+            self.assertTrue(label.bold)
+            self.assertEqual(label._r.xml, template_label._r.xml)
+            # The value takes the placeholder run's formatting
+            self.assertEqual(value._r.rPr is None, placeholder._r.rPr is None)
+            if placeholder._r.rPr is not None:
+                self.assertEqual(value._r.rPr.xml, placeholder._r.rPr.xml)
+            self.assertEqual(document.paragraphs[index].style.name, template.paragraphs[index].style.name)
+
+class ExcelFillTests(SimpleTestCase):
+    def test_fills_input_cells_from_one_compiled_plan(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.title = 'Details'
+        for row in (['Company Name:', None, 'Phone:', None], ['ABN:', None, 'Total:', '=1+1']):
+            sheet.append(row)
+        sheet['B1'].font = sheet['B1'].font.copy(bold=True)
+        plans = FillPlanCache()
+
+        with tempfile.TemporaryDirectory() as directory:
+            template = os.path.join(directory, 'form.xlsx')
+            workbook.save(template)
+            positions = field_positions(extract_excel_fields(template))
+            self.assertEqual(sorted(positions), ['ABN', 'Company Name', 'Phone'])
+
+            filled = []
+            for number, content in enumerate([{'Company Name': 'Acme Pty Ltd', 'Phone': '02 9999 0000'},
+                                              {'Company Name': 'Other Co', 'ABN': '12 345 678 901'}]):
+                output = os.path.join(directory, f'filled_{number}.xlsx')
+                self.assertTrue(FormFiller(plans=plans).fill_document(template, output, content, 'xlsx', positions))
+                filled.append(load_workbook(output)['Details'])
+
+        first, second = filled
+        self.assertEqual([[cell.value for cell in row] for row in first.iter_rows()],
+                         [['Company Name:', 'Acme Pty Ltd', 'Phone:', '02 9999 0000'], ['ABN:', None, 'Total:', '=1+1']])
+        self.assertEqual(second['B1'].value, 'Other Co')
+        self.assertEqual(second['B2'].value, '12 345 678 901')
+        self.assertIsNone(second['D1'].value)
+        self.assertTrue(first['B1'].font.bold)
+        self.assertEqual(plans.stats()['misses'], 1)
+        self.assertEqual(plans.stats()['hits'], 1)
+
+@override_settings(FIELD_WRITE_BATCH_SIZE=2000)
+class FieldPersistenceQueryTests(TestCase):
+    """Each stage's writes take one transaction whatever the field count (within one write batch)
+
+    Only the INSERT of extracted fields grows, by the statements the
+    database needs to stay under its per-statement variable limit.
+    """
+
+    SIZES = (10, 1000)
+
+    def make_template(self):
+        project = TenderProject.objects.create(name='Queries')
+        return TenderTemplate.objects.create(project=project, file='templates/queries.docx',
+                                             file_type='docx', original_filename='queries.docx')
+
+    def extracted(self, size):
+        return [{'field_name': f'Field {index}', 'field_type': 'text', 'position_info': {'index': index}}
+                for index in range(size)]
+
+    def insert_statements(self, size):
+        fields = [field for field in ExtractedField._meta.concrete_fields if not field.primary_key]
+        return math.ceil(size / connection.ops.bulk_batch_size(fields, [None] * size))
+
+    def test_extract(self):
+        for size in self.SIZES:
+            with self.subTest(fields=size):
+                template = self.make_template()
+                # Savepoint, the INSERT, release
+                with self.assertNumQueries(2 + self.insert_statements(size)):
+                    create_fields(template, self.extracted(size))
+                self.assertEqual(ExtractedField.objects.filter(template=template).count(), size)
+
+    def test_generate(self):
+        for size in self.SIZES:
+            with self.subTest(fields=size):
+                template = self.make_template()
+                create_fields(template, self.extracted(size))
+                ids = list(ExtractedField.objects.filter(template=template).values_list('id', flat=True))
+                writer = GeneratedContentWriter()
+                # Savepoint, one executemany UPDATE, release
+                with self.assertNumQueries(3):
+                    for field_id in ids:
+                        writer.add([{'id': field_id}], f'Answer {field_id}')
+                    writer.flush()
+                self.assertFalse(ExtractedField.objects.filter(template=template, generated_content='').exists())
+
+    def test_save_form(self):
+        for size in self.SIZES:
+            with self.subTest(fields=size):
+                template = self.make_template()
+                create_fields(template, self.extracted(size))
+                # One SELECT, then savepoint, one executemany UPDATE, release
+                with self.assertNumQueries(4):
+                    fields = list(ExtractedField.objects.filter(template=template))
+                    for field in fields:
+                        field.generated_content = f'Edited {field.id}'
+                        field.is_filled = True
+                    update_fields(fields, ['generated_content', 'is_filled', 'is_user_edited'])
+                self.assertEqual(ExtractedField.objects.filter(template=template, is_filled=True).count(), size)
+
+@override_settings(JOB_STALE_SECONDS=0.3)
+class HeartbeatTests(TransactionTestCase):
+    # The heartbeat writes from its own thread, so its writes must be committed to be seen here
+
+    def setUp(self):
+        project = TenderProject.objects.create(name='Heartbeat')
+        self.job = ProcessingJob.objects.create(project=project, kind='generate', status='running', worker='first',
+                                                attempts=1, started_at=timezone.now(), heartbeat_at=timezone.now())
+
+    def test_slow_step_without_progress_is_not_reclaimed(self):
+        with Heartbeat(self.job, interval=0.05):
+            time.sleep(0.6)  # One long step: no progress is flushed
+            self.assertIsNone(claim_next_job('second'))
+
+        last_beat = ProcessingJob.objects.get(pk=self.job.pk).heartbeat_at
+        time.sleep(0.6)
+        self.assertEqual(ProcessingJob.objects.get(pk=self.job.pk).heartbeat_at, last_beat)
+        self.assertEqual(claim_next_job('second').pk, self.job.pk)
+
+    def test_reclaimed_job_is_left_to_its_new_worker(self):
+        ProcessingJob.objects.filter(pk=self.job.pk).update(worker='second')
+        before = ProcessingJob.objects.get(pk=self.job.pk).heartbeat_at
+        with Heartbeat(self.job, interval=0.05):
+            time.sleep(0.2)
+        self.assertEqual(ProcessingJob.objects.get(pk=self.job.pk).heartbeat_at, before)
+
+@override_settings(AI_BACKEND='fake', AI_BACKEND_OPTIONS={'latency': 0.2}, AI_GENERATION_CONCURRENCY=2,
+                   AI_CACHE_ENABLED=False)
+class StreamCancellationTests(TransactionTestCase):
+    # The stream saves fields from an executor thread, so its writes must be committed to be seen here
+
+    def test_no_fields_are_written_after_a_cancelled_stream_ends(self):
+        project = TenderProject.objects.create(name='Cancelled')
+        template = TenderTemplate.objects.create(project=project, file='templates/cancelled.docx', file_type='docx',
+                                                 original_filename='cancelled.docx', extraction_status='ready')
+        create_fields(template, [{'field_name': f'Field {index}', 'field_type': 'text', 'position_info': {}}
+                                 for index in range(40)])
+        job = start_stream_job(project, use_cache=False)
+        generated = ExtractedField.objects.filter(template=template).exclude(generated_content='')
+
+        async def cancel_mid_stream():
+            written = None
+            events = []
+            async for event in stream_generation(job, use_cache=False):
+                events.append(event)
+                if event.startswith('event: field_done') and written is None:
+                    await sync_to_async(request_cancel)(job)
+                    written = 0
+            written = await sync_to_async(generated.count)()
+            await asyncio.sleep(1)  # Long enough for several more fields, were any still running
+            return events, written, await sync_to_async(generated.count)()
+
+        events, written, written_later = asyncio.run(cancel_mid_stream())
+
+        self.assertIn('Generation was cancelled', events[-1])
+        self.assertLess(written, 40)
+        self.assertEqual(written_later, written)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'cancelled')
@@ -8,10 +8,16 @@ urlpatterns = [
     path('project/<uuid:project_id>/', views.ProjectDetailView.as_view(), name='project_detail'),
     path('project/<uuid:project_id>/upload/', views.DocumentUploadView.as_view(), name='upload_documents'),
     path('project/<uuid:project_id>/process/', views.ProcessDocumentView.as_view(), name='process_document'),
+    path('project/<uuid:project_id>/process/stream/', views.GenerationStreamView.as_view(), name='process_document_stream'),
     path('project/<uuid:project_id>/download/', views.DownloadDocumentsView.as_view(), name='download_documents'),
     path('download/<int:document_id>/', views.DownloadFileView.as_view(), name='download_file'),
     path('ajax/update-field/', views.AjaxFieldUpdateView.as_view(), name='ajax_update_field'),
     path('project/<uuid:project_id>/download/bulk/', views.BulkDownloadView.as_view(), name='bulk_download'),
     path('document/<int:document_id>/preview/', views.DocumentPreviewView.as_view(), name='document_preview'),
     path('ajax/share-document/', views.ShareDocumentView.as_view(), name='share_document'),
+    path('ajax/project-status/<uuid:project_id>/', views.ProjectStatusView.as_view(), name='project_status'),
+    path('ajax/project-files/<uuid:project_id>/', views.ProjectFilesStatusView.as_view(), name='project_files'),
+    path('ajax/project-usage/<uuid:project_id>/', views.ProjectUsageView.as_view(), name='project_usage'),
+    path('ajax/ai-metrics/', views.AIMetricsView.as_view(), name='ai_metrics'),
+    path('ajax/cancel-job/<int:job_id>/', views.CancelJobView.as_view(), name='cancel_job'),
 ]
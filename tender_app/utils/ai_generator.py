@@ -1,96 +1,484 @@
-import openai
 from django.conf import settings
-from typing import List, Dict, Any
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Tuple, Callable, AsyncIterator
 import json
 import logging
+import time
+
+from .completion_cache import CompletionCache
+from .llm_backends import BackendError, LLMBackend, get_backend
+from .prompt_budget import PromptBudgeter
+from .rate_limiter import RateLimiter
+from .reference_index import ReferenceIndex
+from .resilience import ResilientBackend
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = """You are an expert tender response writer for an Australian business.
+                        Generate professional, compliant responses based on past submissions.
+                        Keep responses concise and relevant."""
+
 class AIContentGenerator:
-    """Generates tender responses using OpenAI API"""
-    
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-    
-    def generate_field_content(self, field_info: Dict[str, Any], 
-                             reference_content: str, 
-                             project_context: str = "") -> str:
+    """Generates tender responses using the configured LLM backend"""
+
+    def __init__(self, concurrency: Optional[int] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[CompletionCache] = None,
+                 backend: Optional[LLMBackend] = None):
+        self.model = getattr(settings, 'OPENAI_MODEL', 'gpt-4o-mini')
+        self.concurrency = concurrency or getattr(settings, 'AI_GENERATION_CONCURRENCY', 8)
+        self.rate_limiter = rate_limiter or RateLimiter(
+            requests_per_minute=getattr(settings, 'AI_REQUESTS_PER_MINUTE', None),
+            tokens_per_minute=getattr(settings, 'AI_TOKENS_PER_MINUTE', None)
+        )
+        # Retries and hedges wait for rate limit capacity too, so the limiter goes inside the retry loop
+        self.backend = ResilientBackend.from_settings(backend or get_backend(), self.rate_limiter, self._request_tokens)
+        if cache is None and getattr(settings, 'AI_CACHE_ENABLED', False):
+            cache = CompletionCache(
+                ttl_seconds=getattr(settings, 'AI_CACHE_TTL', None),
+                max_entries=getattr(settings, 'AI_CACHE_MAX_ENTRIES', None)
+            )
+        self.cache = cache
+        self.reference_top_k = getattr(settings, 'AI_REFERENCE_TOP_K', 4)
+        self.reference_token_budget = getattr(settings, 'AI_REFERENCE_TOKEN_BUDGET', 600)
+        self.batch_token_budget = getattr(settings, 'AI_BATCH_TOKEN_BUDGET', None)
+        self.batch_max_fields = getattr(settings, 'AI_BATCH_MAX_FIELDS', 25)
+        self.budgeter = PromptBudgeter(
+            self.model,
+            input_budget=getattr(settings, 'AI_INPUT_TOKEN_BUDGET', 3000),
+            max_output_tokens=getattr(settings, 'AI_MAX_OUTPUT_TOKENS', 800)
+        )
+        self.usage_records = []  # One entry per completion sent; see drain_usage()
+
+    def generate_field_content(self, field_info: Dict[str, Any],
+                             reference_content: str,
+                             project_context: str = "",
+                             use_cache: bool = True,
+                             reference_index: Optional[ReferenceIndex] = None) -> str:
         """Generate content for a specific field using AI"""
-        
+
+        request = self._build_request(field_info, reference_content, project_context, reference_index)
+
+        key = None
+        if use_cache and self.cache:
+            key = self.cache.make_key(request)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        content, ok = self._complete_field(field_info, request)
+        if ok and key:
+            self.cache.set(key, request['model'], content)
+        return content
+
+    def _complete_field(self, field_info: Dict[str, Any], request: Dict[str, Any]) -> Tuple[str, bool]:
+        """Run a field's completion, returning (content, succeeded) with errors mapped to placeholder text"""
+        field_name = field_info.get('field_name', 'Unknown Field')
+
+        try:
+            return self._complete(request, field_info), True
+
+        except BackendError as e:
+            logger.error(f"LLM backend error for field {field_name}: {e}")
+            return f"Error generating content for {field_name}. Please try again.", False
+        except Exception as e:
+            logger.error(f"Unexpected error for field {field_name}: {e}")
+            return f"[Please fill in content for {field_name}]", False
+
+    def _build_request(self, field_info: Dict[str, Any], reference_content: str,
+                       project_context: str,
+                       reference_index: Optional[ReferenceIndex] = None) -> Dict[str, Any]:
+        """Build the chat completion arguments for a single field"""
         field_name = field_info.get('field_name', 'Unknown Field')
         field_type = field_info.get('field_type', 'text')
-        
+        project_context = self.budgeter.fit_context(project_context)
+
+        # References get whatever the input budget leaves after the rest of the prompt
+        fixed_tokens = (self.budgeter.count(SYSTEM_PROMPT)
+                        + self.budgeter.count(self._create_field_prompt(field_name, field_type, '', project_context)))
+        reference_budget = self.budgeter.reference_budget(fixed_tokens, self.reference_token_budget)
+
+        if reference_index is not None:
+            # Only the chunks relevant to this field, instead of a fixed prefix of everything
+            reference_content = reference_index.select(field_name, self.reference_top_k, reference_budget)
+        else:
+            reference_content = self.budgeter.truncate(reference_content, reference_budget)
+
         prompt = self._create_field_prompt(field_name, field_type, reference_content, project_context)
-        
+
+        return {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            'max_tokens': self.budgeter.max_tokens_for(field_info),
+            'temperature': 0.7,
+        }
+
+    def _complete(self, request: Dict[str, Any], field_info: Optional[Dict[str, Any]] = None) -> str:
+        """Send one chat completion (the backend waits for rate limit capacity)"""
+        start = time.perf_counter()
+        completion = self.backend.complete(request)
+
+        self._record_usage(
+            request, field_info or {},
+            prompt_tokens=completion.prompt_tokens or self._prompt_tokens(request),
+            completion_tokens=completion.completion_tokens or self.budgeter.count(completion.content),
+            latency=time.perf_counter() - start
+        )
+        return completion.content
+
+    def _prompt_tokens(self, request: Dict[str, Any]) -> int:
+        return sum(self.budgeter.count(message['content']) for message in request['messages'])
+
+    def _request_tokens(self, request: Dict[str, Any]) -> int:
+        """Tokens a request may consume against the tokens-per-minute quota"""
+        return self._prompt_tokens(request) + request.get('max_tokens', 0)
+
+    def _record_usage(self, request: Dict[str, Any], field_info: Dict[str, Any],
+                      prompt_tokens: int, completion_tokens: int, latency: float):
+        self.usage_records.append({
+            'field_id': field_info.get('id'),
+            'field_count': field_info.get('field_count', 1),
+            'model': request['model'],
+            'max_tokens': request.get('max_tokens', 0),
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'latency_ms': int(latency * 1000),
+        })
+
+    def drain_usage(self) -> List[Dict[str, Any]]:
+        """Return and clear the usage recorded since the last call"""
+        records, self.usage_records = self.usage_records, []
+        return records
+
+    async def stream_field_content(self, field_info: Dict[str, Any],
+                                   reference_content: str,
+                                   project_context: str = "",
+                                   use_cache: bool = True,
+                                   reference_index: Optional[ReferenceIndex] = None) -> AsyncIterator[str]:
+        """Yield a field's content as it is generated (a cache hit arrives as a single piece)
+
+        A failed completion raises, possibly after some pieces were yielded,
+        so callers can tell a partial answer from a whole one.
+        """
+        field_name = field_info.get('field_name', 'Unknown Field')
+        request = self._build_request(field_info, reference_content, project_context, reference_index)
+
+        key = None
+        if use_cache and self.cache:
+            key = self.cache.make_key(request)
+            cached = await sync_to_async(self.cache.get)(key)
+            if cached is not None:
+                yield cached
+                return
+
+        parts = []
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # Updated model name
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are an expert tender response writer for an Australian business. 
-                        Generate professional, compliant responses based on past submissions. 
-                        Keep responses concise and relevant."""
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=800,
-                temperature=0.7
+            start = time.perf_counter()
+            prompt_tokens = completion_tokens = None
+            async for chunk in self.backend.stream(request):
+                if chunk.prompt_tokens is not None:
+                    prompt_tokens, completion_tokens = chunk.prompt_tokens, chunk.completion_tokens
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+
+            self._record_usage(
+                request, field_info,
+                prompt_tokens=prompt_tokens or self._prompt_tokens(request),
+                completion_tokens=completion_tokens or self.budgeter.count(''.join(parts)),
+                latency=time.perf_counter() - start
             )
-            
-            return response.choices[0].message.content.strip()
-            
-        except openai.APIError as e:
-            logger.error(f"OpenAI API error for field {field_name}: {e}")
-            return f"Error generating content for {field_name}. Please try again."
+
+        except BackendError as e:
+            logger.error(f"LLM backend error for field {field_name}: {e}")
+            raise
         except Exception as e:
             logger.error(f"Unexpected error for field {field_name}: {e}")
-            return f"[Please fill in content for {field_name}]"
-    
-    def _create_field_prompt(self, field_name: str, field_type: str, 
+            raise
+
+        if key:
+            await sync_to_async(self.cache.set)(key, request['model'], ''.join(parts).strip())
+
+    def _create_field_prompt(self, field_name: str, field_type: str,
                            reference_content: str, project_context: str) -> str:
         """Create a detailed prompt for field content generation"""
-        
-        # Limit reference content to avoid token limits
-        limited_reference = reference_content[:1500] if reference_content else "No reference content available."
-        
+
+        limited_reference = reference_content or "No reference content available."
+
         prompt = f"""
         Generate a professional tender response for: {field_name}
-        
+
         Field Type: {field_type}
         Project Context: {project_context}
-        
+
         Reference Content:
         {limited_reference}
-        
+
         Requirements:
         - Professional Australian business language
         - Concise but comprehensive (2-4 sentences)
         - Directly address the field requirement
         - Use reference content as guidance
-        
+
         Response:
         """
-        
+
         return prompt
-    
-    def generate_bulk_content(self, fields: List[Dict[str, Any]], 
-                            reference_content: str, 
-                            project_context: str = "") -> Dict[str, str]:
-        """Generate content for multiple fields"""
-        
+
+    def generate_bulk_content(self, fields: List[Dict[str, Any]],
+                            reference_content: str,
+                            project_context: str = "",
+                            use_cache: bool = True,
+                            reference_index: Optional[ReferenceIndex] = None,
+                            on_result: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+        """Generate content for multiple fields concurrently, keyed by field id in input order
+
+        on_result(field_id, content) is called on the calling thread as each field succeeds
+        (failed fields only get placeholder text in the returned dict); an exception raised
+        from it cancels the remaining work and propagates.
+        """
+
+        if self.batch_token_budget and len(fields) > 1:
+            results = self._generate_batched(fields, reference_content, project_context,
+                                             use_cache, reference_index, on_result)
+        else:
+            results = self._generate_single(fields, reference_content, project_context,
+                                            use_cache, reference_index, on_result)
+
+        # Deterministic ordering regardless of completion order
+        return {str(field.get('id')): results[str(field.get('id'))] for field in fields}
+
+    def _generate_single(self, fields: List[Dict[str, Any]], reference_content: str,
+                         project_context: str, use_cache: bool,
+                         reference_index: Optional[ReferenceIndex],
+                         on_result: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+        """One completion per field"""
+        jobs = {
+            str(field.get('id')): (field, self._build_request(field, reference_content, project_context, reference_index))
+            for field in fields
+        }
+
+        on_complete = None
+        if on_result:
+            def on_complete(job_id, content, ok):
+                # A failed field gets placeholder text in the results, which must not be saved as its answer
+                if ok:
+                    on_result(job_id, content)
+
+        outcomes = self._run_requests(jobs, use_cache, on_complete=on_complete)
+        return {field_id: content for field_id, (content, ok) in outcomes.items()}
+
+    def _generate_batched(self, fields: List[Dict[str, Any]], reference_content: str,
+                          project_context: str, use_cache: bool,
+                          reference_index: Optional[ReferenceIndex],
+                          on_result: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+        """Pack related fields into JSON-mode requests, retrying malformed answers one field at a time"""
+        project_context = self.budgeter.fit_context(project_context)
+        if reference_index is not None:
+            reference_tokens = self.reference_token_budget
+        else:
+            reference_tokens = min(self.budgeter.count(reference_content), self.reference_token_budget)
+        shared_tokens = self.budgeter.count(SYSTEM_PROMPT) + self.budgeter.count(project_context) + reference_tokens
+
+        batches = self._plan_batches(fields, shared_tokens)
+        # A batch of one gains nothing from JSON mode
+        retry = [batch[0] for batch in batches if len(batch) == 1]
+        batches = [batch for batch in batches if len(batch) > 1]
+
+        jobs = {}
+        for batch_index, batch in enumerate(batches):
+            batch_info = {'field_name': f"batch of {len(batch)} fields", 'field_count': len(batch)}
+            jobs[f"batch-{batch_index}"] = (
+                batch_info,
+                self._build_batch_request(batch, reference_content, project_context, reference_index)
+            )
+
+        def is_complete(job_id, content):
+            batch = batches[int(job_id.split('-')[1])]
+            return len(self._parse_batch_response(content, batch)) == len(batch)
+
+        def on_complete(job_id, content, ok):
+            if on_result and ok:
+                for field_id, value in self._parse_batch_response(content, batches[int(job_id.split('-')[1])]).items():
+                    on_result(field_id, value)
+
+        outcomes = self._run_requests(jobs, use_cache, cacheable=is_complete, on_complete=on_complete)
+
         results = {}
-        
+        for batch_index, batch in enumerate(batches):
+            content, ok = outcomes[f"batch-{batch_index}"]
+            parsed = self._parse_batch_response(content, batch) if ok else {}
+            for field in batch:
+                field_id = str(field.get('id'))
+                if field_id in parsed:
+                    results[field_id] = parsed[field_id]
+                else:
+                    retry.append(field)
+
+        if retry:
+            results.update(self._generate_single(retry, reference_content, project_context,
+                                                 use_cache, reference_index, on_result))
+        return results
+
+    def _plan_batches(self, fields: List[Dict[str, Any]], shared_tokens: int) -> List[List[Dict[str, Any]]]:
+        """Group fields by template section and pack each group up to the token budget"""
+        groups = {}
         for field in fields:
+            groups.setdefault(self._batch_group_key(field), []).append(field)
+
+        batches = []
+        for group in groups.values():
+            current, current_tokens = [], shared_tokens
+            for field in group:
+                field_tokens = self.budgeter.count(self._batch_field_line(field)) + self._batch_output_tokens(field)
+                if current and (current_tokens + field_tokens > self.batch_token_budget
+                                or len(current) >= self.batch_max_fields):
+                    batches.append(current)
+                    current, current_tokens = [], shared_tokens
+                current.append(field)
+                current_tokens += field_tokens
+            if current:
+                batches.append(current)
+        return batches
+
+    @staticmethod
+    def _batch_group_key(field: Dict[str, Any]) -> tuple:
+        """Fields from the same table, sheet or page are batched together"""
+        position = field.get('position_info') or {}
+        for key in ('table_index', 'sheet', 'page'):
+            if key in position:
+                return (field.get('template_id'), key, position[key])
+        return (field.get('template_id'), 'body')
+
+    def _batch_output_tokens(self, field: Dict[str, Any]) -> int:
+        """Output allowance for one field inside a JSON answer (its id, quotes and separators included)"""
+        return self.budgeter.max_tokens_for(field) + 10
+
+    @staticmethod
+    def _batch_field_line(field: Dict[str, Any]) -> str:
+        return f'- "{field.get("id")}": {field.get("field_name", "Unknown Field")} ({field.get("field_type", "text")})'
+
+    def _build_batch_request(self, batch: List[Dict[str, Any]], reference_content: str,
+                             project_context: str,
+                             reference_index: Optional[ReferenceIndex] = None) -> Dict[str, Any]:
+        """Build one JSON-mode completion covering every field in the batch"""
+        project_context = self.budgeter.fit_context(project_context)
+        if reference_index is not None:
+            query = ' '.join(field.get('field_name', '') for field in batch)
+            reference_content = reference_index.select(query, self.reference_top_k, self.reference_token_budget)
+        else:
+            reference_content = self.budgeter.truncate(reference_content, self.reference_token_budget)
+        limited_reference = reference_content or "No reference content available."
+        field_lines = '\n        '.join(self._batch_field_line(field) for field in batch)
+
+        prompt = f"""
+        Generate professional tender responses for each of the following fields.
+
+        Project Context: {project_context}
+
+        Reference Content:
+        {limited_reference}
+
+        Fields (id: name (type)):
+        {field_lines}
+
+        Requirements:
+        - Professional Australian business language
+        - Concise but comprehensive (2-4 sentences per field)
+        - Directly address each field requirement
+        - Use reference content as guidance
+
+        Return a JSON object whose keys are the field ids above and whose values are the response text.
+        """
+
+        return {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            'max_tokens': sum(self._batch_output_tokens(field) for field in batch),
+            'temperature': 0.7,
+            'response_format': {'type': 'json_object'},
+        }
+
+    @staticmethod
+    def _parse_batch_response(content: str, batch: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Return the well-formed answers from a batched response, keyed by field id"""
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+
+        parsed = {}
+        for field in batch:
             field_id = str(field.get('id'))
-            try:
-                content = self.generate_field_content(field, reference_content, project_context)
-                results[field_id] = content
-            except Exception as e:
-                logger.error(f"Error generating content for field {field_id}: {e}")
-                results[field_id] = f"[Content for {field.get('field_name', 'Unknown Field')}]"
-        
-        return results
+            value = data.get(field_id)
+            if isinstance(value, str) and value.strip():
+                parsed[field_id] = value.strip()
+        return parsed
+
+    def _run_requests(self, jobs: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]],
+                      use_cache: bool,
+                      cacheable: Optional[Callable[[str, str], bool]] = None,
+                      on_complete: Optional[Callable[[str, str, bool], None]] = None) -> Dict[str, Tuple[str, bool]]:
+        """Run {job_id: (field_info, request)} through the cache and the worker pool"""
+        outcomes = {}
+        keys = {}
+        if use_cache and self.cache:
+            keys = {job_id: self.cache.make_key(request) for job_id, (_, request) in jobs.items()}
+            cached = self.cache.get_many(keys.values())
+            for job_id, key in keys.items():
+                if key in cached:
+                    outcomes[job_id] = (cached[key], True)
+
+        pending = [job_id for job_id in jobs if job_id not in outcomes]
+        completed = {}
+
+        def finish(job_id, outcome):
+            completed[job_id] = outcome
+            if on_complete:
+                on_complete(job_id, *outcome)
+
+        try:
+            if on_complete:
+                for job_id, (content, ok) in list(outcomes.items()):
+                    on_complete(job_id, content, ok)
+
+            if self.concurrency <= 1 or len(pending) <= 1:
+                for job_id in pending:
+                    finish(job_id, self._generate_isolated(*jobs[job_id]))
+            else:
+                executor = ThreadPoolExecutor(max_workers=min(self.concurrency, len(pending)))
+                try:
+                    futures = {executor.submit(self._generate_isolated, *jobs[job_id]): job_id for job_id in pending}
+                    for future in as_completed(futures):
+                        finish(futures[future], future.result())
+                finally:
+                    # Drop queued work if the caller aborted (e.g. the job was cancelled)
+                    executor.shutdown(wait=True, cancel_futures=True)
+        finally:
+            # Cache writes happen here, on the calling thread, rather than in the workers
+            if keys:
+                self.cache.set_many({
+                    keys[job_id]: (jobs[job_id][1]['model'], content)
+                    for job_id, (content, ok) in completed.items()
+                    if ok and (cacheable is None or cacheable(job_id, content))
+                })
+
+        outcomes.update(completed)
+        return outcomes
+
+    def _generate_isolated(self, field: Dict[str, Any], request: Dict[str, Any]) -> Tuple[str, bool]:
+        """Generate one field, never letting its failure affect the rest of the batch"""
+        try:
+            return self._complete_field(field, request)
+        except Exception as e:
+            logger.error(f"Error generating content for field {field.get('id')}: {e}")
+            return f"[Content for {field.get('field_name', 'Unknown Field')}]", False
@@ -0,0 +1,307 @@
+# tender_app/utils/batch_render.py
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.conf import settings
+from django.utils import timezone
+from openpyxl import load_workbook
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import csv
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import zipfile
+
+from .field_store import write_batch_size
+from .fill_plans import PLAN_FILE_TYPES, PositionInfo, compile_plan
+from .form_filler import FormFiller
+
+logger = logging.getLogger(__name__)
+
+BATCH_DIR = 'processed/batch'
+UNSAFE_FILENAME_CHARS = re.compile(r'[^\w\- .]+')
+
+class BatchResult(NamedTuple):
+    rendered: int
+    failed: int
+    output: str  # Storage name of the directory or ZIP, relative to MEDIA_ROOT
+
+def read_value_rows(file_path: str) -> Iterator[Dict[str, str]]:
+    """Yield {column header: value} for each row of a CSV or XLSX file (first sheet), streaming
+
+    Empty cells are left out, so their fields keep the template's placeholder.
+    """
+    if file_path.lower().endswith('.xlsx'):
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = [str(value).strip() if value is not None else '' for value in next(rows, [])]
+            for values in rows:
+                row = {
+                    column: _cell_text(value)
+                    for column, value in zip(header, values)
+                    if column and value is not None
+                }
+                if row:
+                    yield row
+        finally:
+            workbook.close()
+        return
+
+    with open(file_path, newline='', encoding='utf-8-sig') as file:
+        for record in csv.DictReader(file):
+            row = {column.strip(): value for column, value in record.items() if column and value not in (None, '')}
+            if row:
+                yield row
+
+def _cell_text(value: Any) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+# Worker state: each render process compiles the template once
+
+_worker_template: Optional[Tuple[str, str, Dict[str, List[PositionInfo]]]] = None
+_worker_plan = None
+
+def _init_worker(template_path: str, file_type: str, field_positions: Dict[str, List[PositionInfo]]):
+    global _worker_template, _worker_plan
+    _worker_template = (template_path, file_type, field_positions)
+    _worker_plan = compile_plan(template_path, file_type, field_positions) if file_type in PLAN_FILE_TYPES else None
+
+def _render_task(field_content: Dict[str, str]) -> bytes:
+    if _worker_plan is not None:
+        return _worker_plan.render(field_content)
+
+    # PDFs have no plan: fill through a temporary file
+    template_path, file_type, field_positions = _worker_template
+    handle, temp_path = tempfile.mkstemp(suffix=f".{file_type}")
+    os.close(handle)
+    try:
+        if not FormFiller().fill_document(template_path, temp_path, field_content, file_type, field_positions):
+            raise ValueError('Filling failed')
+        with open(temp_path, 'rb') as file:
+            return file.read()
+    finally:
+        os.remove(temp_path)
+
+class BatchRenderer:
+    """Renders one template once per row of field values (mail merge)
+
+    Rows are streamed from any iterable and rendered on a process pool with
+    at most a few rows per worker in flight, so memory does not grow with
+    the number of rows. Each worker compiles the template's fill plan once.
+    Documents go into a directory, or a ZIP, under MEDIA_ROOT/processed/batch/.
+    Each document in a directory becomes a ProcessedDocument; a ZIP is
+    recorded as one.
+    """
+
+    def __init__(self, template, max_workers: Optional[int] = None):
+        self.template = template
+        self.max_workers = max_workers or getattr(settings, 'BATCH_RENDER_WORKERS', None) or os.cpu_count() or 1
+
+    def field_positions(self) -> Dict[str, List[PositionInfo]]:
+        """Positions of every field of the template, extracting them first if needed"""
+        from ..models import ExtractedField
+        from .pipeline import GenerationPipeline
+
+        if self.template.extraction_status != 'ready' and not self.template.extractedfield_set.exists():
+            GenerationPipeline(self.template.project).extract_fields()
+
+        positions = {}
+        for field_name, position_info in ExtractedField.objects.filter(
+                template=self.template).order_by('id').values_list('field_name', 'position_info'):
+            positions.setdefault(field_name, []).append(position_info)
+        return positions
+
+    def render(self, rows: Iterable[Dict[str, str]], batch_name: Optional[str] = None, as_zip: bool = False,
+               name_column: Optional[str] = None,
+               on_progress: Optional[Callable[[int], None]] = None) -> BatchResult:
+        """Render one document per row; name_column names each file after that column's value"""
+        field_positions = self.field_positions()
+        file_type = self.template.file_type.lstrip('.')
+        base_name = os.path.splitext(self.template.original_filename)[0]
+        batch_name = _safe_filename(batch_name or f"{base_name}_{timezone.now():%Y%m%d%H%M%S}")
+
+        writer = _ZipWriter(batch_name) if as_zip else _DirectoryWriter(batch_name)
+        names = _OutputNames(base_name, file_type, name_column)
+        recorder = _DocumentRecorder(self.template.project)
+        rendered = failed = 0
+        checked_columns = False
+
+        def numbered(rows: Iterable[Dict[str, str]]) -> Iterator[Tuple[int, Dict[str, str]]]:
+            nonlocal checked_columns
+            for number, row in enumerate(rows, start=1):
+                if not checked_columns:
+                    checked_columns = True
+                    unknown = sorted(set(row) - set(field_positions) - {name_column})
+                    if unknown:
+                        logger.warning(f"Columns that match no field of {self.template.original_filename}: {unknown}")
+                yield number, row
+
+        def done(number: int, row: Dict[str, str], data: Optional[bytes], error: Optional[str] = None):
+            nonlocal rendered, failed
+            if error is not None:
+                failed += 1
+                logger.error(f"Row {number}: rendering failed: {error}")
+                return
+            name = writer.write(names.next(number, row), data)
+            if not as_zip:
+                recorder.add(name)
+            rendered += 1
+            if on_progress:
+                on_progress(rendered)
+
+        try:
+            if self.max_workers <= 1:
+                _init_worker(self.template.file.path, file_type, field_positions)
+                for number, row in numbered(rows):
+                    try:
+                        data = _render_task(row)
+                    except Exception as e:
+                        done(number, row, None, str(e))
+                        continue
+                    done(number, row, data)
+            else:
+                self._render_pool(numbered(rows), file_type, field_positions, done)
+            output = writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            recorder.flush()
+
+        if as_zip:
+            recorder.add(output)
+            recorder.flush()
+        logger.info(f"Rendered {rendered} documents from {self.template.original_filename} into {output}"
+                    + (f"; {failed} rows failed" if failed else ''))
+        return BatchResult(rendered, failed, output)
+
+    def _render_pool(self, rows: Iterator[Tuple[int, Dict[str, str]]], file_type: str,
+                     field_positions: Dict[str, List[PositionInfo]], done: Callable):
+        # spawn: forking a process that holds database connections and threads is unsafe
+        pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.template.file.path, file_type, field_positions)
+        )
+        window = self.max_workers * 4  # Rows in flight; bounds memory however many rows there are
+        in_flight = {}
+        try:
+            for number, row in rows:
+                in_flight[pool.submit(_render_task, row)] = (number, row)
+                if len(in_flight) >= window:
+                    self._collect(in_flight, done, FIRST_COMPLETED)
+            self._collect(in_flight, done)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _collect(in_flight: Dict[Any, Tuple[int, Dict[str, str]]], done: Callable, return_when: str = ALL_COMPLETED):
+        finished, _ = wait(in_flight, return_when=return_when)
+        for future in finished:
+            number, row = in_flight.pop(future)
+            error = future.exception()
+            if error is not None:
+                done(number, row, None, str(error))
+            else:
+                done(number, row, future.result())
+
+def _safe_filename(name: str) -> str:
+    return UNSAFE_FILENAME_CHARS.sub('_', name).strip(' .') or 'document'
+
+def _set_permissions(path: str):
+    # mkstemp creates files readable by the owner only
+    os.chmod(path, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+
+class _OutputNames:
+    """File names for rendered rows: the name column's value, or <template>_<row number>, made unique"""
+
+    def __init__(self, base_name: str, file_type: str, name_column: Optional[str]):
+        self.base_name = base_name
+        self.extension = f".{file_type}"
+        self.name_column = name_column
+        self.used = set()
+
+    def next(self, number: int, row: Dict[str, str]) -> str:
+        stem = row.get(self.name_column) if self.name_column else None
+        stem = _safe_filename(stem) if stem else f"{self.base_name}_{number:05d}"
+        name = f"{stem}{self.extension}"
+        suffix = 1
+        while name.lower() in self.used:
+            suffix += 1
+            name = f"{stem}_{suffix}{self.extension}"
+        self.used.add(name.lower())
+        return name
+
+class _DirectoryWriter:
+    """Writes each document into processed/batch/<batch>/, each via a temporary file and a rename"""
+
+    def __init__(self, batch_name: str):
+        self.name = f"{BATCH_DIR}/{batch_name}"
+        self.directory = os.path.join(settings.MEDIA_ROOT, *self.name.split('/'))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write(self, file_name: str, data: bytes) -> str:
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.render-')
+        with os.fdopen(handle, 'wb') as file:
+            file.write(data)
+        _set_permissions(temp_path)
+        os.replace(temp_path, os.path.join(self.directory, file_name))
+        return f"{self.name}/{file_name}"
+
+    def close(self) -> str:
+        return self.name
+
+    def abort(self):
+        pass  # Documents already written are complete and recorded
+
+class _ZipWriter:
+    """Appends documents to processed/batch/<batch>.zip, which appears only once complete"""
+
+    def __init__(self, batch_name: str):
+        self.name = f"{BATCH_DIR}/{batch_name}.zip"
+        self.path = os.path.join(settings.MEDIA_ROOT, *self.name.split('/'))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        handle, self.temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix='.render-')
+        os.close(handle)
+        # Office documents are already deflated; storing them avoids compressing twice
+        self.archive = zipfile.ZipFile(self.temp_path, 'w', zipfile.ZIP_STORED, allowZip64=True)
+
+    def write(self, file_name: str, data: bytes) -> str:
+        self.archive.writestr(file_name, data)
+        return f"{self.name}/{file_name}"
+
+    def close(self) -> str:
+        self.archive.close()
+        _set_permissions(self.temp_path)
+        os.replace(self.temp_path, self.path)
+        return self.name
+
+    def abort(self):
+        self.archive.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+class _DocumentRecorder:
+    """Creates ProcessedDocument rows in batches as documents are written"""
+
+    def __init__(self, project):
+        self.project = project
+        self.pending: List[str] = []
+
+    def add(self, name: str):
+        self.pending.append(name)
+        if len(self.pending) >= write_batch_size():
+            self.flush()
+
+    def flush(self):
+        from ..models import ProcessedDocument
+
+        if self.pending:
+            ProcessedDocument.objects.bulk_create(
+                [ProcessedDocument(project=self.project, file=name) for name in self.pending]
+            )
+            self.pending = []
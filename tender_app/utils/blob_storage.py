@@ -0,0 +1,111 @@
+# tender_app/utils/blob_storage.py
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.core.signals import setting_changed
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils.functional import LazyObject, empty
+from typing import Optional
+import hashlib
+import logging
+import os
+import re
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = 'blobs'
+BLOB_NAME_PATTERN = re.compile(rf'^{BLOB_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<sha256>[0-9a-f]{{64}})(\.\w+)?$')
+
+def blob_name(sha256: str, extension: str) -> str:
+    """'blobs/ab/cd/abcd...<64 hex>.docx': two levels of shards keep directories small"""
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension.lower()}"
+
+def blob_sha256(name: str) -> Optional[str]:
+    """The content hash encoded in a blob name, or None for files stored before blobs"""
+    match = BLOB_NAME_PATTERN.match(name or '')
+    return match.group('sha256') if match else None
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores each distinct upload once, named after the SHA-256 of its bytes
+
+    The name a FileField asks for only contributes its extension (the
+    pipeline picks parsers by extension). The upload is hashed first and
+    only written when no blob with that hash exists yet, so re-uploading
+    a reference pack costs a read, not a write. New blobs are written to a
+    temporary file and renamed into place, so a reader never sees half a
+    blob. StoredBlob rows count the model rows using each blob; the
+    gc_blobs command deletes blobs nobody references.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Equal names mean equal content, so an existing blob is reused rather than renamed
+        return name
+
+    def _save(self, name, content):
+        from ..models import StoredBlob
+
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        sha256 = digest.hexdigest()
+        name = blob_name(sha256, os.path.splitext(name)[1])
+
+        if not self.exists(name):
+            self._write_blob(name, content)
+        else:
+            logger.info(f"Upload matches existing blob {name}; not written again")
+            # Restart gc_blobs' grace period: the row using the blob is about to be saved
+            os.utime(self.path(name))
+
+        StoredBlob.objects.get_or_create(name=name, defaults={'sha256': sha256, 'size': size})
+        return name
+
+    def _write_blob(self, name: str, content):
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            if hasattr(content, 'temporary_file_path'):
+                # Large uploads are already on disk: move instead of copying
+                os.close(handle)
+                file_move_safe(content.temporary_file_path(), temp_path, allow_overwrite=True)
+            else:
+                with os.fdopen(handle, 'wb') as temp_file:
+                    for chunk in content.chunks():
+                        temp_file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+class _DefaultBlobStorage(LazyObject):
+    def _setup(self):
+        self._wrapped = ContentAddressedStorage(location=settings.MEDIA_ROOT, base_url=settings.MEDIA_URL)
+
+blob_storage = _DefaultBlobStorage()
+
+@receiver(setting_changed)
+def _reset_blob_storage(setting, **kwargs):
+    # As Django's own storages do: tests that override MEDIA_ROOT get blobs stored there
+    if setting in ('MEDIA_ROOT', 'MEDIA_URL'):
+        blob_storage._wrapped = empty
+
+def get_blob_storage():
+    """Storage for FileFields (a callable, so migrations do not serialise the instance)"""
+    return blob_storage
+
+def add_reference(name: str, delta: int):
+    """Adjust the reference count of a blob (names of pre-blob files are ignored)"""
+    from ..models import StoredBlob
+
+    if blob_sha256(name):
+        StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') + delta)
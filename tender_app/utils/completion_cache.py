@@ -0,0 +1,131 @@
+# tender_app/utils/completion_cache.py
+from django.utils import timezone
+from django.db.models import F, Sum
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Optional
+import hashlib
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class CompletionCache:
+    """Content-addressed, database-backed cache of chat completion responses"""
+
+    _stats_lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_entries: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """Hash everything that affects the completion: model, parameters and messages"""
+        canonical = json.dumps(request, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None on a miss"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Look up several keys in one query, refreshing their LRU position"""
+        from ..models import CompletionCacheEntry
+
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        try:
+            entries = CompletionCacheEntry.objects.filter(key__in=keys)
+            if self.ttl_seconds:
+                entries = entries.filter(created_at__gte=timezone.now() - timedelta(seconds=self.ttl_seconds))
+            found = dict(entries.values_list('key', 'response'))
+
+            if found:
+                CompletionCacheEntry.objects.filter(key__in=list(found)).update(
+                    hit_count=F('hit_count') + 1,
+                    last_used_at=timezone.now()
+                )
+        except Exception as e:
+            # A broken cache must never block generation; treat it as a miss
+            logger.error(f"Completion cache lookup failed: {e}")
+            found = {}
+        self._record(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def set(self, key: str, model: str, response: str):
+        """Store a single response"""
+        self.set_many({key: (model, response)})
+
+    def set_many(self, entries: Dict[str, tuple]):
+        """Store {key: (model, response)} pairs, then enforce TTL and size limits"""
+        from ..models import CompletionCacheEntry
+
+        if not entries:
+            return
+        now = timezone.now()
+        try:
+            CompletionCacheEntry.objects.bulk_create(
+                [
+                    CompletionCacheEntry(key=key, model=model, response=response,
+                                         created_at=now, last_used_at=now)
+                    for key, (model, response) in entries.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['key'],
+                update_fields=['model', 'response', 'created_at', 'last_used_at'],
+            )
+            self.evict()
+        except Exception as e:
+            logger.error(f"Completion cache store failed: {e}")
+
+    def evict(self):
+        """Drop expired entries, then least recently used entries beyond max_entries"""
+        from ..models import CompletionCacheEntry
+
+        if self.ttl_seconds:
+            CompletionCacheEntry.objects.filter(
+                created_at__lt=timezone.now() - timedelta(seconds=self.ttl_seconds)
+            ).delete()
+
+        if self.max_entries:
+            excess = CompletionCacheEntry.objects.count() - self.max_entries
+            if excess > 0:
+                stale_keys = list(CompletionCacheEntry.objects.order_by('last_used_at', 'key')
+                                  .values_list('key', flat=True)[:excess])
+                CompletionCacheEntry.objects.filter(key__in=stale_keys).delete()
+
+    @classmethod
+    def _record(cls, hits: int = 0, misses: int = 0):
+        with cls._stats_lock:
+            cls._hits += hits
+            cls._misses += misses
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Stored hit counts (every entry was one miss) plus this process's lookups
+
+        Generation runs in run_worker, so a web process's own counters
+        usually stay at zero; the stored counts cover every process.
+        """
+        from ..models import CompletionCacheEntry
+
+        entries = CompletionCacheEntry.objects.count()
+        hits = CompletionCacheEntry.objects.aggregate(hits=Sum('hit_count'))['hits'] or 0
+        with cls._stats_lock:
+            process_hits, process_misses = cls._hits, cls._misses
+        process_lookups = process_hits + process_misses
+        return {
+            'entries': entries,
+            'hits': hits,
+            'hit_rate': hits / (hits + entries) if hits + entries else 0.0,
+            'process': {
+                'hits': process_hits,
+                'misses': process_misses,
+                'hit_rate': process_hits / process_lookups if process_lookups else 0.0,
+            },
+        }
@@ -0,0 +1,496 @@
+# tender_app/utils/docx_engine.py
+from lxml import etree
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import copy
+import logging
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+NAMESPACES = {
+    'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
+    'mc': 'http://schemas.openxmlformats.org/markup-compatibility/2006',
+    'wps': 'http://schemas.microsoft.com/office/word/2010/wordprocessingShape',
+    'v': 'urn:schemas-microsoft-com:vml',
+    'wp': 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing',
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+}
+PREFIXES = {uri: prefix for prefix, uri in NAMESPACES.items()}
+
+def _tag(name: str) -> str:
+    prefix, local = name.split(':')
+    return f"{{{NAMESPACES[prefix]}}}{local}"
+
+P, TBL, TR, TC, R, T = (_tag(name) for name in ('w:p', 'w:tbl', 'w:tr', 'w:tc', 'w:r', 'w:t'))
+BODY, HYPERLINK, TXBX_CONTENT, FALLBACK = (_tag(name) for name in ('w:body', 'w:hyperlink', 'w:txbxContent', 'mc:Fallback'))
+TC_PR, GRID_SPAN, V_MERGE, VAL, BR_TYPE = (_tag(name) for name in ('w:tcPr', 'w:gridSpan', 'w:vMerge', 'w:val', 'w:type'))
+P_PR, R_PR, TAB = (_tag(name) for name in ('w:pPr', 'w:rPr', 'w:tab'))
+# Revision marks allowed on a paragraph mark but not on a run
+MARK_ONLY = {_tag(name) for name in ('w:ins', 'w:del', 'w:moveFrom', 'w:moveTo', 'w:rPrChange')}
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+DOCUMENT_PART = 'word/document.xml'
+
+# Run content and its text, as python-docx renders it
+RUN_TEXT = {_tag('w:tab'): '\t', _tag('w:ptab'): '\t', _tag('w:cr'): '\n', _tag('w:noBreakHyphen'): '-'}
+BR = _tag('w:br')
+
+# [Field Name], ___ (three or more underscores) and {Field Name}, in one pass
+FIELD_PATTERN = re.compile(r'\[(?P<bracket>[^\]]+)\]|_{3,}|\{(?P<brace>[^}]+)\}')
+
+HEADER_FOOTER_PATTERN = re.compile(r'^word/(header|footer)(\d*)\.xml$')
+
+# One step of an xml_path: /w:tbl[2], or /w:body without an index for the only such child
+PATH_STEP_PATTERN = re.compile(r'/(\w+):([\w.-]+)(?:\[(\d+)\])?')
+
+def extract_docx_fields(file_path: str) -> List[Dict[str, Any]]:
+    """Find the fillable fields of a Word document without building its object model
+
+    word/document.xml and then every header and footer part are streamed
+    from the zip, one top-level paragraph or table at a time. Paragraphs
+    (including those in text boxes) yield a field for each [Name], {Name} or
+    run of underscores; empty table cells, at any nesting depth, yield
+    Table_<t>_Row_<r>_Cell_<c> fields. Merged cells are reported once.
+
+    Body fields keep the order and names of the python-docx extractor:
+    paragraph fields first, then body table cells, then headers and footers.
+    Every field records its part and an XML path in position_info.
+    """
+    fields = []
+    table_fields = []
+
+    with zipfile.ZipFile(file_path) as archive:
+        parts = sorted((name for name in archive.namelist() if HEADER_FOOTER_PATTERN.match(name)),
+                       key=_part_sort_key)
+
+        walker = _FieldWalker(fields, table_fields, DOCUMENT_PART, '')
+        paragraph_index = 0
+        for tag, index, element in _iter_blocks(archive, DOCUMENT_PART, BODY):
+            path = f"/w:document/w:body/{_prefixed(tag)}[{index}]"
+            if tag == P:
+                walker.paragraph(element, path, paragraph_index)
+                paragraph_index += 1
+            elif tag == TBL:
+                walker.table(element, path, index - 1, f"Table_{index - 1}")
+        fields.extend(table_fields)
+
+        for part in parts:
+            kind, number = HEADER_FOOTER_PATTERN.match(part).groups()
+            root = 'w:hdr' if kind == 'header' else 'w:ftr'
+            walker = _FieldWalker(fields, fields, part, f"{kind.capitalize()}{number}")
+            for tag, index, element in _iter_blocks(archive, part, _tag(root)):
+                path = f"/{root}/{_prefixed(tag)}[{index}]"
+                if tag == P:
+                    walker.paragraph(element, path)
+                elif tag == TBL:
+                    walker.table(element, path, index - 1, f"{walker.name_prefix}_Table_{index - 1}")
+
+    return fields
+
+def iter_docx_paragraphs(file_path: str) -> Iterator[str]:
+    """Yield the text of each top-level body paragraph, as python-docx's doc.paragraphs would"""
+    with zipfile.ZipFile(file_path) as archive:
+        for tag, _, element in _iter_blocks(archive, DOCUMENT_PART, BODY):
+            if tag == P:
+                yield paragraph_text(element)
+
+def paragraph_text(paragraph: ET.Element) -> str:
+    """Text of a w:p: its runs and hyperlinked runs, with tabs and line breaks as \\t and \\n"""
+    parts = []
+    for child in paragraph:
+        if child.tag == R:
+            parts.append(_run_text(child))
+        elif child.tag == HYPERLINK:
+            parts.extend(_run_text(run) for run in child if run.tag == R)
+    return ''.join(parts)
+
+def _run_text(run: ET.Element) -> str:
+    parts = []
+    for child in run:
+        if child.tag == T:
+            parts.append(child.text or '')
+        elif child.tag == BR:
+            # Page and column breaks have no text equivalent
+            parts.append('\n' if child.get(BR_TYPE, 'textWrapping') == 'textWrapping' else '')
+        elif child.tag in RUN_TEXT:
+            parts.append(RUN_TEXT[child.tag])
+    return ''.join(parts)
+
+def _iter_blocks(archive: zipfile.ZipFile, part: str, container: str) -> Iterator[Tuple[str, int, ET.Element]]:
+    """Yield (tag, 1-based index among same-tag siblings, element) for each child of container
+
+    Each block is detached once the caller is done with it, so memory is
+    bounded by the largest paragraph or table rather than the document.
+    """
+    counts = {}
+    depth = 0
+    container_depth = None
+    parent = None
+
+    with archive.open(part) as stream:
+        for event, element in ET.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if container_depth is None and element.tag == container:
+                    container_depth, parent = depth, element
+                continue
+
+            if container_depth is not None and depth == container_depth + 1:
+                counts[element.tag] = counts.get(element.tag, 0) + 1
+                yield element.tag, counts[element.tag], element
+                parent.remove(element)
+            elif depth == container_depth:
+                container_depth = None
+            depth -= 1
+
+def _prefixed(tag: str) -> str:
+    """'{http://...wordprocessingml/2006/main}tbl' -> 'w:tbl'"""
+    uri, _, local = tag[1:].partition('}')
+    return f"{PREFIXES.get(uri, uri)}:{local}"
+
+def _child_paths(element: ET.Element, path: str) -> Iterator[Tuple[ET.Element, str]]:
+    counts = {}
+    for child in element:
+        counts[child.tag] = counts.get(child.tag, 0) + 1
+        yield child, f"{path}/{_prefixed(child.tag)}[{counts[child.tag]}]"
+
+def _part_sort_key(part: str) -> Tuple[bool, int]:
+    kind, number = HEADER_FOOTER_PATTERN.match(part).groups()
+    return kind != 'header', int(number or 0)
+
+class _FieldWalker:
+    """Collects the fields of one part; paragraph and table fields may go to separate lists
+
+    name_prefix ('Header1', 'Footer2', or '' for the body) starts the names of
+    table cells outside the body, which would otherwise repeat body names.
+    """
+
+    def __init__(self, fields: List[Dict[str, Any]], table_fields: List[Dict[str, Any]],
+                 part: str, name_prefix: str = ''):
+        self.fields = fields
+        self.table_fields = table_fields
+        self.part = part
+        self.name_prefix = name_prefix
+        self.textboxes = 0
+
+    def paragraph(self, element: ET.Element, path: str, paragraph_index: Optional[int] = None):
+        text = paragraph_text(element)
+        for match in FIELD_PATTERN.finditer(text):
+            name = match.group('bracket') or match.group('brace')
+            position_info = {
+                'part': self.part,
+                'xml_path': path,
+                'start': match.start(),
+                'end': match.end(),
+                'original_text': match.group(0)
+            }
+            if paragraph_index is not None:
+                position_info['paragraph_index'] = paragraph_index
+            self.fields.append({
+                'field_name': name or f"Field_{len(self.fields)+1}",
+                'field_type': 'text',
+                'position_info': position_info
+            })
+
+        if element.find(f".//{TXBX_CONTENT}") is None:
+            return
+        for textbox, textbox_path in self._textboxes(element, path):
+            self.textboxes += 1
+            name = '_'.join(part for part in (self.name_prefix, f"Textbox{self.textboxes}") if part)
+            table_index = 0
+            for child, child_path in _child_paths(textbox, textbox_path):
+                if child.tag == P:
+                    self.paragraph(child, child_path)
+                elif child.tag == TBL:
+                    self.table(child, child_path, table_index, f"{name}_Table_{table_index}")
+                    table_index += 1
+
+    def table(self, element: ET.Element, path: str, table_index: int, name: str):
+        """Fields for the empty cells of a table; name is the table's own, e.g. 'Table_2'"""
+        rows = [(row, row_path) for row, row_path in _child_paths(element, path) if row.tag == TR]
+        for row_index, (row, row_path) in enumerate(rows):
+            # Cell numbers count layout-grid columns, like python-docx's row.cells
+            cell_index = 0
+            for cell, cell_path in _child_paths(row, row_path):
+                if cell.tag != TC:
+                    continue
+                span, continued = self._merge(cell)
+                if not continued:
+                    self._cell(cell, cell_path, f"{name}_Row_{row_index}_Cell_{cell_index}",
+                               table_index, row_index, cell_index)
+                cell_index += span
+
+    def _cell(self, cell: ET.Element, path: str, name: str, table_index: int, row_index: int, cell_index: int):
+        nested = [(child, child_path) for child, child_path in _child_paths(cell, path) if child.tag == TBL]
+        text = '\n'.join(paragraph_text(child) for child in cell if child.tag == P)
+
+        if not text.strip() and not nested:
+            self.table_fields.append({
+                'field_name': name,
+                'field_type': 'table_cell',
+                'position_info': {
+                    'part': self.part,
+                    'xml_path': path,
+                    'table_index': table_index,
+                    'row_index': row_index,
+                    'cell_index': cell_index
+                }
+            })
+
+        for nested_index, (table, table_path) in enumerate(nested):
+            self.table(table, table_path, nested_index, f"{name}_Table_{nested_index}")
+
+    @staticmethod
+    def _merge(cell: ET.Element) -> Tuple[int, bool]:
+        """(grid columns spanned, whether this cell continues a vertical merge from the row above)"""
+        properties = cell.find(TC_PR)
+        if properties is None:
+            return 1, False
+        grid_span = properties.find(GRID_SPAN)
+        v_merge = properties.find(V_MERGE)
+        span = int(grid_span.get(VAL, 1)) if grid_span is not None else 1
+        return span, v_merge is not None and v_merge.get(VAL, 'continue') == 'continue'
+
+    @staticmethod
+    def _textboxes(element: ET.Element, path: str) -> Iterator[Tuple[ET.Element, str]]:
+        """Text box contents inside a paragraph, skipping the VML fallback copies of DrawingML boxes"""
+        for child, child_path in _child_paths(element, path):
+            if child.tag == TXBX_CONTENT:
+                yield child, child_path
+            elif child.tag != FALLBACK:
+                yield from _FieldWalker._textboxes(child, child_path)
+
+class SlotFiller:
+    """Puts content into the fields of one parsed part (an lxml tree), editing runs in place
+
+    Each (position_info, content) slot is found from the xml_path recorded
+    at extraction or, for fields extracted before paths were recorded, from
+    the body paragraph and table indexes. Only the runs a field covers are
+    changed, so the formatting around it is kept.
+    """
+
+    def __init__(self, root, part: str):
+        self.root = root
+        self.part = part
+        self._body_blocks = None
+        self._children = {}  # element -> {(tag, 1-based index among same-tag siblings): child}
+
+    def fill(self, slots: List[Tuple[Dict[str, Any], str]]) -> int:
+        filled = 0
+        paragraphs = {}
+        for position_info, content in slots:
+            element = self._find(position_info)
+            if element is None:
+                logger.warning(f"No element in {self.part} for field at {position_info}")
+            elif element.tag == TC:
+                self._fill_cell(element, content)
+                filled += 1
+            elif element.tag == P:
+                paragraphs.setdefault(element, []).append((position_info, content))
+
+        for paragraph, paragraph_slots in paragraphs.items():
+            text = paragraph_text(paragraph)
+            located = []
+            for position_info, content in paragraph_slots:
+                span = self._locate(text, position_info)
+                if span is None:
+                    logger.warning(f"Field text {position_info.get('original_text')!r} not found in {self.part}")
+                else:
+                    located.append((*span, content))
+            # Right to left, so each edit leaves the offsets of the ones before it valid
+            for start, end, content in sorted(located, reverse=True):
+                self._replace(paragraph, start, end, content)
+            filled += len(located)
+        return filled
+
+    def fill_markers(self, unplaced: Dict[str, str]) -> int:
+        filled = 0
+        for paragraph in self.root.iter(P):
+            text = paragraph_text(paragraph)
+            if '[' not in text and '{' not in text:
+                continue
+            matches = [
+                (match.start(), match.end(), unplaced[name])
+                for match in FIELD_PATTERN.finditer(text)
+                for name in [match.group('bracket') or match.group('brace')]
+                if name in unplaced
+            ]
+            for start, end, content in reversed(matches):
+                self._replace(paragraph, start, end, content)
+            filled += len(matches)
+        return filled
+
+    def _find(self, position_info: Dict[str, Any]):
+        path = position_info.get('xml_path')
+        if path:
+            element = self._resolve(path)
+            if element is not None:
+                return element
+        if self.part != DOCUMENT_PART:
+            return None
+
+        paragraphs, tables = self._legacy_blocks()
+        try:
+            if 'paragraph_index' in position_info:
+                return paragraphs[position_info['paragraph_index']]
+            if 'table_index' in position_info:
+                rows = tables[position_info['table_index']].findall(TR)
+                return self._grid_cell(rows[position_info['row_index']], position_info['cell_index'])
+        except (IndexError, KeyError, TypeError):
+            pass
+        return None
+
+    def _resolve(self, path: str):
+        """The element at an xml_path, indexing each parent's children once
+
+        XPath would rescan the siblings before w:p[5000] for every field on
+        a long document; the index makes each lookup cost the path's depth.
+        """
+        steps = [match.groups() for match in PATH_STEP_PATTERN.finditer(path)]
+        if ''.join(f"/{prefix}:{local}" + (f"[{index}]" if index else '') for prefix, local, index in steps) != path:
+            # Steps through elements in namespaces without a prefix here
+            return None
+        try:
+            tags = [(_tag(f"{prefix}:{local}"), int(index or 1)) for prefix, local, index in steps]
+        except KeyError:
+            return None
+        if not tags or tags[0] != (self.root.tag, 1):
+            return None
+
+        element = self.root
+        for key in tags[1:]:
+            children = self._children.get(element)
+            if children is None:
+                children = self._children[element] = {}
+                counts = {}
+                for child in element:
+                    counts[child.tag] = counts.get(child.tag, 0) + 1
+                    children[(child.tag, counts[child.tag])] = child
+            element = children.get(key)
+            if element is None:
+                return None
+        return element
+
+    def _legacy_blocks(self):
+        """Top-level body paragraphs and tables, as python-docx numbers them"""
+        if self._body_blocks is None:
+            body = self.root.find(BODY)
+            self._body_blocks = (body.findall(P), body.findall(TBL)) if body is not None else ([], [])
+        return self._body_blocks
+
+    @staticmethod
+    def _grid_cell(row, cell_index: int):
+        column = 0
+        for cell in row.findall(TC):
+            span, _ = _FieldWalker._merge(cell)
+            if column <= cell_index < column + span:
+                return cell
+            column += span
+        return None
+
+    @staticmethod
+    def _locate(text: str, position_info: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+        original = position_info.get('original_text', '')
+        start, end = position_info.get('start'), position_info.get('end')
+        if start is not None and text[start:end] == original:
+            return start, end
+        start = text.find(original) if original else -1
+        return (start, start + len(original)) if start >= 0 else None
+
+    @staticmethod
+    def _pieces(paragraph) -> List[Tuple[Any, int]]:
+        """(run child, length) for everything paragraph_text turns into characters, in order"""
+        runs = []
+        for child in paragraph:
+            if child.tag == R:
+                runs.append(child)
+            elif child.tag == HYPERLINK:
+                runs.extend(run for run in child if run.tag == R)
+
+        pieces = []
+        for run in runs:
+            for child in run:
+                if child.tag == T:
+                    pieces.append((child, len(child.text or '')))
+                elif child.tag == BR:
+                    pieces.append((child, 1 if child.get(BR_TYPE, 'textWrapping') == 'textWrapping' else 0))
+                elif child.tag in RUN_TEXT:
+                    pieces.append((child, 1))
+        return pieces
+
+    def _replace(self, paragraph, start: int, end: int, content: str):
+        """Replace characters start:end of the paragraph text, keeping the first run's formatting"""
+        first = None
+        position = 0
+        for element, length in self._pieces(paragraph):
+            piece_start, position = position, position + length
+            if position <= start or length == 0:
+                continue
+            if piece_start >= end:
+                break
+            if element.tag != T:
+                # A tab or line break inside the replaced text
+                self._remove(element)
+                continue
+
+            value = element.text or ''
+            before = value[:max(start - piece_start, 0)]
+            after = value[min(end, position) - piece_start:]
+            if first is None:
+                first = element
+                for new in reversed(_text_elements(before + content + after)):
+                    element.addnext(new)
+                element.getparent().remove(element)
+            elif after:
+                element.text = after
+            else:
+                self._remove(element)
+
+    @staticmethod
+    def _remove(element):
+        """Remove a run's child, and the run itself once only its properties are left"""
+        run = element.getparent()
+        run.remove(element)
+        if all(child.tag == R_PR for child in run):
+            run.getparent().remove(run)
+
+    @staticmethod
+    def _fill_cell(cell, content: str):
+        """Write content into an empty cell, in its first run or one formatted like the paragraph mark"""
+        paragraph = cell.find(P)
+        if paragraph is None:
+            paragraph = etree.SubElement(cell, P)
+        runs = paragraph.findall(R)
+        if runs:
+            run = runs[0]
+            for child in list(run):
+                if child.tag != R_PR:
+                    run.remove(child)
+            # The cell was blank; drop the whitespace runs
+            for other in runs[1:]:
+                paragraph.remove(other)
+        else:
+            run = etree.SubElement(paragraph, R)
+            mark = paragraph.find(f"{P_PR}/{R_PR}")
+            if mark is not None:
+                properties = copy.deepcopy(mark)
+                for child in [child for child in properties if child.tag in MARK_ONLY]:
+                    properties.remove(child)
+                run.append(properties)
+        run.extend(_text_elements(content))
+
+def _text_elements(text: str) -> List[Any]:
+    """w:t, w:br and w:tab elements for text, as python-docx writes \\n and \\t"""
+    elements = []
+    for token in re.split(r'(\n|\t)', text):
+        if token == '\n':
+            elements.append(etree.Element(BR))
+        elif token == '\t':
+            elements.append(etree.Element(TAB))
+        elif token:
+            element = etree.Element(T)
+            element.text = token
+            element.set(XML_SPACE, 'preserve')
+            elements.append(element)
+    return elements
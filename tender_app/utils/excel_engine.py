@@ -0,0 +1,141 @@
+# tender_app/utils/excel_engine.py
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_MARKERS = ('[enter', 'fill in', 'insert', 'add your')
+
+def _is_empty(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+def _is_placeholder(value: Any) -> bool:
+    return isinstance(value, str) and any(marker in value.lower() for marker in PLACEHOLDER_MARKERS)
+
+def _is_formula(value: Any) -> bool:
+    # read_only workbooks hold formulas as strings; their text is neither a label nor an input
+    return isinstance(value, str) and value.startswith('=')
+
+def _is_label(value: Any) -> bool:
+    return isinstance(value, str) and bool(value.strip()) and not _is_placeholder(value) and not _is_formula(value)
+
+def _label_text(value: str) -> str:
+    return value.strip().strip('[]{}').strip().rstrip(':').strip()
+
+def _is_header_candidate(row: tuple) -> bool:
+    """At least two cells, all of them text labels, none with an input cell after it
+
+    Form rows such as "Company Name: | _ | Phone: | _" are all labels too;
+    what sets them apart is the empty cell between a label and the next.
+    """
+    filled = [column for column, value in enumerate(row) if not _is_empty(value)]
+    if len(filled) < 2 or not all(_is_label(row[column]) for column in filled):
+        return False
+    return all(not _is_empty(row[column + 1]) for column in filled[:-1])
+
+def _has_data_under(row: tuple, headers: Dict[int, str]) -> bool:
+    """Whether row is a table row for these column headers: an input or a value under one of them"""
+    return any(column <= len(row) and not _is_label(row[column - 1]) for column in headers)
+
+def _row_inputs(row_number: int, row: tuple, column_headers: Dict[int, str]) -> Iterator[Tuple[int, int, str]]:
+    row_label = None
+    for column, value in enumerate(row, start=1):
+        is_placeholder = _is_placeholder(value)
+        if not (is_placeholder or _is_empty(value)):
+            if row_label is None and _is_label(value):
+                row_label = _label_text(value)
+            continue
+
+        left = row[column - 2] if column > 1 else None
+        header = column_headers.get(column)
+        if header:
+            label = f"{row_label} - {header}" if row_label else f"{header} (row {row_number})"
+        elif _is_label(left):
+            label = _label_text(left)
+        elif is_placeholder:
+            label = _label_text(value)
+        else:
+            continue
+        if label:
+            yield row_number, column, label
+
+def _input_cells(rows) -> Iterator[Tuple[int, int, str]]:
+    """Yield (row, column, label) for every nameable input cell in a sheet's rows
+
+    A header candidate only becomes the column headers once the next
+    non-empty row turns out to hold data under them; otherwise it is read
+    as an ordinary row of labels.
+    """
+    column_headers = {}
+    candidate = None  # (row number, row) waiting for the row after it
+
+    for row_number, row in enumerate(rows, start=1):
+        if all(_is_empty(value) for value in row):
+            continue
+        if candidate is not None:
+            candidate_number, candidate_row = candidate
+            candidate = None
+            headers = {column: _label_text(value) for column, value in enumerate(candidate_row, start=1)
+                       if _is_label(value)}
+            if _has_data_under(row, headers):
+                column_headers = headers
+            else:
+                yield from _row_inputs(candidate_number, candidate_row, column_headers)
+        if _is_header_candidate(row):
+            candidate = (row_number, row)
+            continue
+        yield from _row_inputs(row_number, row, column_headers)
+
+    if candidate is not None:
+        yield from _row_inputs(*candidate, column_headers)
+
+def extract_excel_fields(file_path: str, max_fields_per_sheet: Optional[int] = 200) -> List[Dict[str, Any]]:
+    """Find input cells in a workbook and name them after their labels
+
+    The workbook is streamed in read-only mode, so formatted but unused
+    cells cost nothing, and rows with no values are skipped, which keeps
+    fields inside the real data bounds. An empty or placeholder cell becomes
+    a field when it can be named:
+
+    - under a table header row (a row of adjacent text labels followed by
+      data): "<row label> - <column header>", or "<column header> (row N)"
+      when the row has no text label before it;
+    - to the right of a text label: the label ("Company Name:" -> "Company Name");
+    - a placeholder such as "[Enter ABN]": its own text.
+
+    Formulas are values, never labels or inputs. Anything else is left alone. At most max_fields_per_sheet fields are
+    taken from each sheet.
+    """
+    workbook = load_workbook(file_path, read_only=True)
+    fields = []
+    used_names = set()
+
+    try:
+        for sheet_name in workbook.sheetnames:
+            cells = _input_cells(workbook[sheet_name].iter_rows(values_only=True))
+            for count, (row, column, label) in enumerate(cells):
+                if max_fields_per_sheet and count >= max_fields_per_sheet:
+                    logger.warning(f"Sheet {sheet_name} has more than {max_fields_per_sheet} input cells; "
+                                   f"the rest are ignored")
+                    break
+
+                coordinate = f"{get_column_letter(column)}{row}"
+                field_name = label if label not in used_names else f"{label} ({sheet_name}!{coordinate})"
+                used_names.add(field_name)
+                fields.append({
+                    'field_name': field_name,
+                    'field_type': 'cell',
+                    'position_info': {
+                        'sheet': sheet_name,
+                        'coordinate': coordinate,
+                        'row': row,
+                        'column': column,
+                        'label': label,
+                    }
+                })
+    finally:
+        workbook.close()
+
+    return fields
@@ -0,0 +1,45 @@
+# tender_app/utils/field_groups.py
+from typing import Any, Dict, List, Optional
+import re
+
+# Names the extractors make up from a field's position; equal names here do not mean the same question.
+# Only the exact forms they emit, so a real label such as 'Project_v2' still groups.
+POSITIONAL_NAME_PATTERN = re.compile(
+    r'^(Field|Widget)_\d+$'                                        # Field_3, Widget_7
+    r'|^((Header|Footer)\d+_)?Table_\d+_Row_\d+_Cell_\d+(_Table_\d+_Row_\d+_Cell_\d+)*$'  # Table_0_Row_2_Cell_1, Header1_...
+    r'|^(underscore|dotted)_field_\d+$'                             # PDF blanks: underscore_field_4
+)
+
+PUNCTUATION_PATTERN = re.compile(r'[\[\]{}<>():;*#"\'`_.,?!]+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def normalize_field_name(field_name: str) -> str:
+    """'[Company Name:]' and 'company  name' both become 'company name'"""
+    name = PUNCTUATION_PATTERN.sub(' ', field_name or '')
+    return WHITESPACE_PATTERN.sub(' ', name).strip().lower()
+
+def is_positional_name(field_name: str, position_info: Optional[Dict[str, Any]] = None) -> bool:
+    field_name = (field_name or '').strip()
+    if POSITIONAL_NAME_PATTERN.match(field_name):
+        return True
+    # Spreadsheet cells were once named <sheet>_<cell>, e.g. 'Sheet1_B4'
+    position_info = position_info or {}
+    sheet, coordinate = position_info.get('sheet'), position_info.get('coordinate')
+    return bool(sheet and coordinate) and field_name == f"{sheet}_{coordinate}"
+
+def group_fields(fields: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Cluster equivalent fields across templates, keeping the order of first appearance
+
+    Fields with the same normalised name and type form one group; the first
+    member is the one sent for generation. Positionally named and unnamed
+    fields always stay in a group of their own.
+    """
+    groups = {}
+    for field in fields:
+        name = normalize_field_name(field.get('field_name', ''))
+        if not name or is_positional_name(field.get('field_name', ''), field.get('position_info')):
+            key = ('field', field.get('id'))
+        else:
+            key = ('name', name, field.get('field_type', 'text'))
+        groups.setdefault(key, []).append(field)
+    return list(groups.values())
@@ -0,0 +1,104 @@
+# tender_app/utils/field_store.py
+from django.conf import settings
+from django.db import connection, transaction
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+def write_batch_size() -> int:
+    return getattr(settings, 'FIELD_WRITE_BATCH_SIZE', 500)
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def create_fields(template, fields: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+    """Insert extracted fields for a template, one INSERT and one transaction per batch"""
+    from ..models import ExtractedField
+
+    objects = [
+        ExtractedField(
+            template=template,
+            field_name=field_data.get('field_name', 'Unknown Field'),
+            field_type=field_data.get('field_type', 'text'),
+            position_info=field_data.get('position_info', {})
+        )
+        for field_data in fields
+    ]
+    for chunk in _chunks(objects, batch_size or write_batch_size()):
+        with transaction.atomic():
+            ExtractedField.objects.bulk_create(chunk)
+    return len(objects)
+
+def _update_rows(field_names: List[str], rows: List[List[Any]], batch_size: int, only_unedited: bool = False):
+    """Run one parameterised UPDATE per row ([values..., pk]) with executemany, a transaction per chunk
+
+    Unlike bulk_update, which builds a CASE expression per column and row in
+    Python, this costs one prepared statement per chunk however large it is.
+    """
+    from ..models import ExtractedField
+
+    meta = ExtractedField._meta
+    quote = connection.ops.quote_name
+    assignments = ', '.join(f"{quote(meta.get_field(name).column)} = %s" for name in field_names)
+    sql = f"UPDATE {quote(meta.db_table)} SET {assignments} WHERE {quote(meta.pk.column)} = %s"
+    if only_unedited:
+        sql += f" AND {quote(meta.get_field('is_user_edited').column)} = %s"
+        rows = [row + [False] for row in rows]
+
+    updated = 0
+    for chunk in _chunks(rows, batch_size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, chunk)
+            updated += max(cursor.rowcount, 0)
+    return updated
+
+def update_fields(objects: List[Any], field_names: List[str], batch_size: Optional[int] = None) -> int:
+    """Save field_names of ExtractedField objects in chunked transactions"""
+    from ..models import ExtractedField
+
+    model_fields = [ExtractedField._meta.get_field(name) for name in field_names]
+    rows = [
+        [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in model_fields] + [obj.pk]
+        for obj in objects
+    ]
+    return _update_rows(field_names, rows, batch_size or write_batch_size())
+
+def write_generated_content(contents: Dict[int, str], batch_size: Optional[int] = None) -> int:
+    """Set generated_content for {field_id: content}, leaving fields the user has edited alone
+
+    The is_user_edited check is part of each UPDATE, so an edit made while
+    generation runs still wins.
+    """
+    rows = [[content, field_id] for field_id, content in contents.items()]
+    return _update_rows(['generated_content'], rows, batch_size or write_batch_size(), only_unedited=True)
+
+class GeneratedContentWriter:
+    """Buffers generated answers and writes them in batches
+
+    Generation calls add() from its worker threads as answers arrive;
+    nothing reaches the database until flush(), which runs when the buffer
+    holds batch_size fields and whenever the job's progress is flushed, so
+    fields recorded as completed are always already saved.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None):
+        self.batch_size = batch_size or write_batch_size()
+        self._pending: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def add(self, group: List[Dict[str, Any]], content: str):
+        with self._lock:
+            for field in group:
+                self._pending[field['id']] = content
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            write_generated_content(pending, self.batch_size)
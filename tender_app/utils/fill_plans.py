@@ -0,0 +1,371 @@
+# tender_app/utils/fill_plans.py
+from collections import OrderedDict
+from django.conf import settings
+from lxml import etree
+from openpyxl.utils.cell import column_index_from_string, coordinate_from_string, get_column_letter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from xml.sax.saxutils import escape
+import hashlib
+import io
+import json
+import logging
+import posixpath
+import re
+import threading
+import uuid
+import zipfile
+
+from .docx_engine import DOCUMENT_PART, NAMESPACES, SlotFiller
+from .text_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+PLAN_FILE_TYPES = ('docx', 'xlsx')
+
+# Parts may exceed lxml's default size limits; entities are never expanded
+PART_PARSER = etree.XMLParser(resolve_entities=False, huge_tree=True)
+
+# Characters XML 1.0 cannot carry; content containing them would make the part unreadable
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+SHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+RELATIONSHIP_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+PACKAGE_RELATIONSHIP = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+OFFICE_DOCUMENT_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+SHEET, SHEET_DATA, ROW, CELL, FORMULA = (f"{{{SHEET_NS}}}{name}" for name in ('sheet', 'sheetData', 'row', 'c', 'f'))
+
+PositionInfo = Dict[str, Any]
+
+def xml_text(content: str) -> bytes:
+    """Content escaped for use as XML character data"""
+    return escape(INVALID_XML_CHARS.sub('', content)).encode('utf-8')
+
+class Slot(NamedTuple):
+    field_name: str
+    render: Optional[Callable[[str], bytes]]  # Field content -> markup
+    default: Optional[bytes]  # Markup kept when the field has no content
+
+class CompiledPart(NamedTuple):
+    info: zipfile.ZipInfo
+    segments: List[bytes]  # Literal markup; segments[i + 1] follows slots[i]
+    slots: List[Slot]
+
+class _SlotMarkers:
+    """Hands out the unique text markers written where field content goes while compiling"""
+
+    def __init__(self):
+        self.token = uuid.uuid4().hex
+        self.pattern = re.compile(rf"{self.token}(\d{{6}})".encode())
+        self.slots: List[Slot] = []
+
+    def marker(self, field_name: str, render: Optional[Callable[[str], bytes]], default: Optional[bytes]) -> str:
+        self.slots.append(Slot(field_name, render, default))
+        return f"{self.token}{len(self.slots) - 1:06d}"
+
+    def span(self, field_name: str, render: Callable[[str], bytes]) -> Tuple[str, str]:
+        """Markers around existing markup, which becomes the slot's default"""
+        return self.marker(field_name, render, None), self.marker(field_name, None, None)
+
+    def split(self, data: bytes) -> Tuple[List[bytes], List[Slot]]:
+        pieces = self.pattern.split(data)
+        segments, slots = [pieces[0]], []
+        index = 1
+        while index < len(pieces):
+            slot = self.slots[int(pieces[index])]
+            if slot.default is None:
+                # Opening marker: then the default markup, the closing marker and what follows
+                slots.append(slot._replace(default=pieces[index + 1]))
+                segments.append(pieces[index + 3])
+                index += 4
+            else:
+                slots.append(slot)
+                segments.append(pieces[index + 1])
+                index += 2
+        return segments, slots
+
+class FillPlan:
+    """A DOCX or XLSX template parsed once for any number of fills
+
+    Parts without fields are compressed into a skeleton zip at compile
+    time and reused byte for byte. Parts with fields are kept as literal
+    markup between slots, so a fill only joins bytes, deflates those parts
+    and appends them to a copy of the skeleton.
+    """
+
+    def __init__(self, skeleton: bytes, parts: List[CompiledPart]):
+        self.skeleton = skeleton
+        self.parts = parts
+        self.size = len(skeleton) + sum(len(segment) for part in parts for segment in part.segments)
+
+    def render(self, field_content: Dict[str, str]) -> bytes:
+        """The filled document; fields missing from field_content keep their placeholder"""
+        buffer = io.BytesIO(self.skeleton)
+        with zipfile.ZipFile(buffer, 'a') as archive:
+            for part in self.parts:
+                # A new ZipInfo per fill: writestr records offsets and sizes on it
+                info = zipfile.ZipInfo(part.info.filename, part.info.date_time)
+                info.compress_type = part.info.compress_type
+                info.external_attr = part.info.external_attr
+                archive.writestr(info, self._render_part(part, field_content))
+        return buffer.getvalue()
+
+    def render_to(self, output_path: str, field_content: Dict[str, str]):
+        data = self.render(field_content)
+        with open(output_path, 'wb') as output:
+            output.write(data)
+
+    @staticmethod
+    def _render_part(part: CompiledPart, field_content: Dict[str, str]) -> bytes:
+        chunks = [part.segments[0]]
+        for slot, segment in zip(part.slots, part.segments[1:]):
+            content = field_content.get(slot.field_name)
+            chunks.append(slot.default if content is None else slot.render(content))
+            chunks.append(segment)
+        return b''.join(chunks)
+
+def compile_plan(template_path: str, file_type: str, field_positions: Dict[str, List[PositionInfo]]) -> FillPlan:
+    """Compile a template for the fields in field_positions ({field name: [position_info, ...]})
+
+    Names without positions are matched by their [Name] or {Name} markers
+    (DOCX) or a Sheet_Coordinate style name (XLSX).
+    """
+    markers = _SlotMarkers()
+    with zipfile.ZipFile(template_path) as archive:
+        if file_type == 'docx':
+            parts = _compile_docx(archive, field_positions, markers)
+        elif file_type == 'xlsx':
+            parts = _compile_xlsx(archive, field_positions, markers)
+        else:
+            raise ValueError(f"Cannot compile {file_type} templates")
+
+        skeleton = io.BytesIO()
+        with zipfile.ZipFile(skeleton, 'w') as target:
+            for info in archive.infolist():
+                if info.filename not in parts:
+                    target.writestr(info, archive.read(info))
+        compiled = [CompiledPart(archive.getinfo(name), *markers.split(data)) for name, data in parts.items()]
+
+    return FillPlan(skeleton.getvalue(), compiled)
+
+def _serialize(root) -> bytes:
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+def _prefix(root, namespace: str) -> str:
+    """'w:' for the prefix root declares for namespace, '' if it is the default namespace"""
+    for prefix, uri in root.nsmap.items():
+        if uri == namespace:
+            return f"{prefix}:" if prefix else ''
+    raise ValueError(f"Part does not declare {namespace} on its root element")
+
+def _compile_docx(archive: zipfile.ZipFile, field_positions: Dict[str, List[PositionInfo]],
+                  markers: _SlotMarkers) -> Dict[str, bytes]:
+    by_part = {}
+    unplaced = []
+    for field_name, positions in field_positions.items():
+        if not positions:
+            unplaced.append(field_name)
+        for position_info in positions:
+            by_part.setdefault(position_info.get('part', DOCUMENT_PART), []).append((field_name, position_info))
+    if unplaced:
+        by_part.setdefault(DOCUMENT_PART, [])
+
+    names = set(archive.namelist())
+    parts = {}
+    for part, slots in by_part.items():
+        if part not in names:
+            logger.warning(f"Template has no part {part}; {len(slots)} fields will not be filled")
+            continue
+        root = etree.fromstring(archive.read(part), PART_PARSER)
+        render = _run_text_renderer(_prefix(root, NAMESPACES['w']))
+        filler = SlotFiller(root, part)
+        filler.fill([
+            (position_info, markers.marker(field_name, render, xml_text(position_info.get('original_text', ''))))
+            for field_name, position_info in slots
+        ])
+        if unplaced and part == DOCUMENT_PART:
+            filler.fill_markers({name: markers.marker(name, render, xml_text(f"[{name}]")) for name in unplaced})
+        parts[part] = _serialize(root)
+    return parts
+
+def _run_text_renderer(prefix: str) -> Callable[[str], bytes]:
+    """Content as the text of a w:t element, with line breaks and tabs as w:br and w:tab"""
+    line_break = f'</{prefix}t><{prefix}br/><{prefix}t xml:space="preserve">'.encode()
+    tab = f'</{prefix}t><{prefix}tab/><{prefix}t xml:space="preserve">'.encode()
+    return lambda content: xml_text(content).replace(b'\n', line_break).replace(b'\t', tab)
+
+def _compile_xlsx(archive: zipfile.ZipFile, field_positions: Dict[str, List[PositionInfo]],
+                  markers: _SlotMarkers) -> Dict[str, bytes]:
+    sheets = _sheet_parts(archive)
+    by_part = {}
+    for field_name, positions in field_positions.items():
+        cells = [(position['sheet'], position['coordinate']) for position in positions
+                 if position.get('sheet') in sheets and position.get('coordinate')]
+        if not cells:
+            # Names such as 'Sheet1_B4', from before cells were named after their labels
+            cells = [(sheet, field_name.split('_')[-1]) for sheet in sheets
+                     if sheet in field_name and '_' in field_name]
+        for sheet, coordinate in cells:
+            # A cell claimed by two fields gets the later one, as sequential assignment would
+            by_part.setdefault(sheets[sheet], {})[coordinate] = field_name
+
+    parts = {}
+    for part, cells in by_part.items():
+        root = etree.fromstring(archive.read(part), PART_PARSER)
+        prefix = _prefix(root, SHEET_NS)
+        sheet_data = root.find(SHEET_DATA)
+        if sheet_data is None:
+            continue
+        grid = _SheetGrid(sheet_data)
+        for coordinate, field_name in cells.items():
+            try:
+                cell = grid.cell(coordinate)
+            except ValueError:
+                logger.warning(f"Field {field_name} has an invalid cell reference {coordinate}")
+                continue
+            if cell.find(FORMULA) is not None:
+                logger.warning(f"Field {field_name} is on formula cell {coordinate}; not filled")
+                continue
+            opening, closing = markers.span(field_name, _inline_string_renderer(prefix, cell.get('r'), cell.get('s')))
+            previous = cell.getprevious()
+            if previous is not None:
+                previous.tail = (previous.tail or '') + opening
+            else:
+                cell.getparent().text = (cell.getparent().text or '') + opening
+            cell.tail = closing + (cell.tail or '')
+        parts[part] = _serialize(root)
+    return parts
+
+def _inline_string_renderer(prefix: str, reference: str, style: Optional[str]) -> Callable[[str], bytes]:
+    """Content as an inline string cell, keeping the cell's style"""
+    style = f' s="{style}"' if style else ''
+    opening = f'<{prefix}c r="{reference}"{style} t="inlineStr"><{prefix}is><{prefix}t xml:space="preserve">'.encode()
+    closing = f'</{prefix}t></{prefix}is></{prefix}c>'.encode()
+    return lambda content: opening + xml_text(content) + closing
+
+def _sheet_parts(archive: zipfile.ZipFile) -> Dict[str, str]:
+    """{sheet name: worksheet part}, following the package relationships"""
+    def relationships(part: str) -> Dict[str, Tuple[str, str]]:
+        rels = posixpath.join(posixpath.dirname(part), '_rels', f"{posixpath.basename(part)}.rels")
+        root = etree.fromstring(archive.read(rels), PART_PARSER)
+        return {rel.get('Id'): (rel.get('Type'), rel.get('Target')) for rel in root.iter(PACKAGE_RELATIONSHIP)}
+
+    def resolve(source: str, target: str) -> str:
+        if target.startswith('/'):
+            return target[1:]
+        return posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
+
+    workbook = next(
+        (resolve('', target) for kind, target in relationships('').values() if kind == OFFICE_DOCUMENT_TYPE),
+        'xl/workbook.xml'
+    )
+    targets = relationships(workbook)
+    sheets = {}
+    for sheet in etree.fromstring(archive.read(workbook), PART_PARSER).iter(SHEET):
+        _, target = targets.get(sheet.get(RELATIONSHIP_ID), (None, None))
+        if target:
+            sheets[sheet.get('name')] = resolve(workbook, target)
+    return sheets
+
+class _SheetGrid:
+    """Finds or creates c elements in a sheetData, keeping rows and cells in order"""
+
+    def __init__(self, sheet_data):
+        self.sheet_data = sheet_data
+        self.rows = {}
+        number = 0
+        for row in sheet_data.findall(ROW):
+            # Rows (and cells) may leave their position implicit; inserting would shift them
+            number = int(row.get('r') or number + 1)
+            row.set('r', str(number))
+            self.rows[number] = row
+
+    def cell(self, coordinate: str):
+        column_letter, row_number = coordinate_from_string(coordinate)
+        column = column_index_from_string(column_letter)
+        reference = f"{column_letter}{row_number}"
+
+        row = self.rows.get(row_number)
+        if row is None:
+            row = etree.Element(ROW, r=str(row_number))
+            later = [number for number in self.rows if number > row_number]
+            if later:
+                self.rows[min(later)].addprevious(row)
+            else:
+                self.sheet_data.append(row)
+            self.rows[row_number] = row
+
+        number = 0
+        for cell in row.findall(CELL):
+            if cell.get('r'):
+                cell_letter, _ = coordinate_from_string(cell.get('r'))
+                number = column_index_from_string(cell_letter)
+            else:
+                number += 1
+                cell.set('r', f"{get_column_letter(number)}{row_number}")
+            if number == column:
+                return cell
+            if number > column:
+                new = etree.Element(CELL, r=reference)
+                cell.addprevious(new)
+                return new
+
+        return etree.SubElement(row, CELL, r=reference)
+
+def plan_cache_max_bytes() -> int:
+    return getattr(settings, 'FILL_PLAN_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+
+class FillPlanCache:
+    """Compiled plans in this process by template hash and field layout
+
+    Plans are evicted least recently used first once they hold more than
+    max_bytes, or FILL_PLAN_CACHE_MAX_BYTES when that is not given.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes  # Processes without Django settings must pass it
+        self._plans: 'OrderedDict[Tuple[str, str, str], FillPlan]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, template_path: str, file_type: str, field_positions: Dict[str, List[PositionInfo]],
+            template_sha256: Optional[str] = None) -> FillPlan:
+        layout = hashlib.sha256(json.dumps(field_positions, sort_keys=True, default=str).encode()).hexdigest()
+        key = (template_sha256 or file_sha256(template_path), file_type, layout)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self._hits += 1
+                return plan
+            self._misses += 1
+
+        plan = compile_plan(template_path, file_type, field_positions)
+        max_bytes = self.max_bytes or plan_cache_max_bytes()
+        with self._lock:
+            if key not in self._plans:
+                self._plans[key] = plan
+                self._bytes += plan.size
+            while self._bytes > max_bytes and len(self._plans) > 1:
+                _, evicted = self._plans.popitem(last=False)
+                self._bytes -= evicted.size
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'plans': len(self._plans),
+                'bytes': self._bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+            }
+
+fill_plans = FillPlanCache()
@@ -1,59 +1,77 @@
 # tender_app/utils/form_filler.py
-import docx
 import fitz  # PyMuPDF
-from openpyxl import load_workbook
-import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Union
+import hashlib
+import json
 import os
+import uuid
+
+from .fill_plans import PLAN_FILE_TYPES, FillPlanCache, PositionInfo, fill_plans
+
+FILLER_VERSION = 1  # Bump when the same template and values would fill differently, so earlier outputs re-render
+
+def fill_fingerprint(template_sha256: str, file_type: str, field_content: Dict[str, str],
+                     field_positions: Dict[str, Any]) -> str:
+    """Identifies a filled document: equal fingerprints mean equal output"""
+    payload = json.dumps([template_sha256, file_type, FILLER_VERSION, field_content, field_positions],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _positions(field_positions: Dict[str, Union[PositionInfo, List[PositionInfo]]], field_name: str) -> List[PositionInfo]:
+    """Every recorded position of a field name (one position_info or a list of them), skipping empty ones"""
+    positions = field_positions.get(field_name) or []
+    if isinstance(positions, dict):
+        positions = [positions]
+    return [position for position in positions if position]
 
 class FormFiller:
-    """Fills forms with generated content"""
-    
+    """Fills forms with generated content
+
+    Documents are written to a temporary file next to output_path and
+    renamed over it, so a reader never sees a half-written document.
+    """
+
+    def __init__(self, plans: Optional[FillPlanCache] = None):
+        self.plans = plans or fill_plans
+
     def fill_document(self, template_path: str, output_path: str, 
-                     field_content: Dict[str, str], file_type: str) -> bool:
-        """Fill document with generated content"""
+                     field_content: Dict[str, str], file_type: str,
+                     field_positions: Optional[Dict[str, Union[PositionInfo, List[PositionInfo]]]] = None,
+                     template_sha256: Optional[str] = None) -> bool:
+        """Fill document with generated content
+
+        field_positions maps field names to the position_info of each field
+        with that name (a single position_info is accepted too). Passing the
+        positions of every template field, not only those with content, lets
+        fills with different content share one compiled plan.
+        """
+        directory, name = os.path.split(output_path)
+        temp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:12]}.tmp")
         try:
-            if file_type == 'docx':
-                return self._fill_word_document(template_path, output_path, field_content)
+            if file_type in PLAN_FILE_TYPES:
+                filled = self._fill_from_plan(template_path, temp_path, field_content, file_type,
+                                              field_positions or {}, template_sha256)
             elif file_type == 'pdf':
-                return self._fill_pdf_document(template_path, output_path, field_content)
-            elif file_type == 'xlsx':
-                return self._fill_excel_document(template_path, output_path, field_content)
+                filled = self._fill_pdf_document(template_path, temp_path, field_content)
             else:
                 return False
+            if filled:
+                os.replace(temp_path, output_path)
+            return filled
         except Exception as e:
             print(f"Error filling document: {e}")
             return False
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
     
-    def _fill_word_document(self, template_path: str, output_path: str, 
-                          field_content: Dict[str, str]) -> bool:
-        """Fill Word document with content"""
-        doc = docx.Document(template_path)
-        
-        # Replace text patterns in paragraphs
-        for paragraph in doc.paragraphs:
-            for field_name, content in field_content.items():
-                # Replace various field patterns
-                patterns = [
-                    f'[{field_name}]',
-                    f'{{{field_name}}}',
-                    field_name
-                ]
-                
-                for pattern in patterns:
-                    if pattern in paragraph.text:
-                        paragraph.text = paragraph.text.replace(pattern, content)
-        
-        # Fill table cells
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for field_name, content in field_content.items():
-                        if field_name in cell.text or not cell.text.strip():
-                            cell.text = content
-                            break
-        
-        doc.save(output_path)
+    def _fill_from_plan(self, template_path: str, output_path: str, field_content: Dict[str, str], file_type: str,
+                        field_positions: Dict[str, Union[PositionInfo, List[PositionInfo]]],
+                        template_sha256: Optional[str]) -> bool:
+        """Fill a Word or Excel document from the template's compiled plan (compiled on first use)"""
+        layout = {name: _positions(field_positions, name) for name in {**field_positions, **field_content}}
+        plan = self.plans.get(template_path, file_type, layout, template_sha256)
+        plan.render_to(output_path, field_content)
         return True
     
     def _fill_pdf_document(self, template_path: str, output_path: str, 
@@ -82,26 +100,3 @@ class FormFiller:
         except Exception as e:
             print(f"Error filling PDF: {e}")
             return False
-    
-    def _fill_excel_document(self, template_path: str, output_path: str, 
-                           field_content: Dict[str, str]) -> bool:
-        """Fill Excel document with content"""
-        workbook = load_workbook(template_path)
-        
-        for sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            
-            for field_name, content in field_content.items():
-                # Parse field name to get sheet and cell info
-                if sheet_name in field_name:
-                    # Extract coordinate from field name
-                    parts = field_name.split('_')
-                    if len(parts) >= 2:
-                        coordinate = parts[-1]
-                        try:
-                            sheet[coordinate] = content
-                        except:
-                            continue
-        
-        workbook.save(output_path)
-        return True
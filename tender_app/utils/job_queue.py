@@ -0,0 +1,242 @@
+# tender_app/utils/job_queue.py
+from django.conf import settings
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+PROJECT_JOB_KINDS = ('generate', 'fill')  # Jobs that drive project.status; 'prepare' runs in the background
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested"""
+
+class ProgressReporter:
+    """Records per-stage progress on a ProcessingJob and watches for cancellation"""
+
+    def __init__(self, job=None, flush_interval: float = 1.0):
+        self.job = job
+        self.flush_interval = flush_interval
+        self.stage = job.stage if job else ''
+        self.progress = dict(job.progress) if job else {}
+        self.completed_field_ids = list(job.completed_field_ids) if job else []
+        self.before_flush: Optional[Callable[[], None]] = None  # Persist results before they are marked completed
+        self._last_flush = 0.0
+
+    def start_stage(self, stage: str, total: int, done: int = 0):
+        self.stage = stage
+        self.progress[stage] = {'done': done, 'total': total}
+        self.flush(force=True)
+
+    def advance(self, stage: str, done: Optional[int] = None, field_id: Optional[int] = None):
+        entry = self.progress.setdefault(stage, {'done': 0, 'total': 0})
+        entry['done'] = entry['done'] + 1 if done is None else done
+        if field_id is not None:
+            self.completed_field_ids.append(field_id)
+        self.flush()
+
+    def flush(self, force: bool = False, check_cancelled: bool = True):
+        """Persist progress and heartbeat (at most once per flush_interval unless forced)"""
+        from ..models import ProcessingJob
+
+        if self.job is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+
+        if self.before_flush:
+            self.before_flush()
+        ProcessingJob.objects.filter(pk=self.job.pk).update(
+            stage=self.stage,
+            progress=self.progress,
+            completed_field_ids=self.completed_field_ids,
+            heartbeat_at=timezone.now()
+        )
+        if check_cancelled and ProcessingJob.objects.filter(pk=self.job.pk, cancel_requested=True).exists():
+            raise JobCancelled()
+
+class Heartbeat:
+    """Keeps a running job's heartbeat fresh from a background thread, whatever the job is doing
+
+    Progress flushes heartbeat too, but one slow step (extracting a large
+    file, a completion waiting out rate limits and retries) can outlast
+    JOB_STALE_SECONDS without progress, and another worker would then
+    reclaim the job and repeat its work. Use as a context manager around
+    the job's run, or call start() and stop().
+    """
+
+    def __init__(self, job, interval: Optional[float] = None):
+        self.job = job
+        self.interval = interval or getattr(settings, 'JOB_HEARTBEAT_SECONDS', 30)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'Heartbeat':
+        self._thread = threading.Thread(target=self._run, name=f"job-{self.job.pk}-heartbeat", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> 'Heartbeat':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self):
+        from django.db import connection
+        from ..models import ProcessingJob
+
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    # Only while this worker still owns the job: a reclaimed job belongs to its new worker
+                    ProcessingJob.objects.filter(pk=self.job.pk, status='running', worker=self.job.worker).update(
+                        heartbeat_at=timezone.now()
+                    )
+                except Exception as e:
+                    logger.warning(f"Heartbeat for job {self.job.pk} failed: {e}")
+        finally:
+            connection.close()  # This thread's own connection
+
+def enqueue_job(project, kind: str, options: Optional[Dict[str, Any]] = None, reuse_running: bool = True):
+    """Queue a job for the project, reusing an active job of the same kind if there is one
+
+    With reuse_running=False only a queued job is reused: files uploaded
+    while a prepare job runs need a new one, which starts after it.
+    """
+    from ..models import ProcessingJob
+
+    reusable = ACTIVE_STATUSES if reuse_running else ('queued',)
+    job = ProcessingJob.objects.filter(project=project, kind=kind, status__in=reusable).first()
+    if job:
+        return job
+
+    job = ProcessingJob.objects.create(project=project, kind=kind, options=options or {})
+    if kind in PROJECT_JOB_KINDS:
+        project.status = 'processing'
+        project.save()
+
+    if not getattr(settings, 'BACKGROUND_JOBS', True):
+        # No worker configured: run in the current process
+        ProcessingJob.objects.filter(pk=job.pk).update(
+            status='running', worker='inline', attempts=1,
+            started_at=timezone.now(), heartbeat_at=timezone.now()
+        )
+        job.refresh_from_db()
+        run_job(job)
+        job.refresh_from_db()
+
+    return job
+
+def claim_next_job(worker_id: str):
+    """Atomically claim the oldest queued job, or a running job whose worker stopped heartbeating"""
+    from ..models import ProcessingJob
+
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=getattr(settings, 'JOB_STALE_SECONDS', 300))
+    max_attempts = getattr(settings, 'JOB_MAX_ATTEMPTS', 3)
+
+    # One job per project at a time, so a prepare job and a generate job never extract the same files
+    busy_projects = ProcessingJob.objects.filter(
+        status='running', heartbeat_at__gte=stale_before
+    ).values('project')
+    candidates = ProcessingJob.objects.filter(
+        Q(status='queued') | Q(status='running', heartbeat_at__lt=stale_before)
+    ).exclude(status='queued', project__in=busy_projects).order_by('created_at')
+
+    for job in candidates[:20]:
+        if job.status == 'running' and job.attempts >= max_attempts:
+            ProcessingJob.objects.filter(pk=job.pk, status='running', heartbeat_at=job.heartbeat_at).update(
+                status='failed', error='Worker stopped responding too many times', finished_at=now
+            )
+            continue
+
+        # The status/heartbeat guard makes the claim a compare-and-swap between workers
+        claimed = ProcessingJob.objects.filter(
+            pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at
+        ).update(
+            status='running',
+            worker=worker_id,
+            attempts=F('attempts') + 1,
+            started_at=Coalesce('started_at', Value(now)),
+            heartbeat_at=now
+        )
+        if claimed:
+            job.refresh_from_db()
+            if job.attempts > 1:
+                logger.info(f"Resuming job {job.pk} after {len(job.completed_field_ids)} completed fields")
+            return job
+
+    return None
+
+def request_cancel(job):
+    """Cancel a queued job immediately, or ask a running job to stop at its next checkpoint"""
+    from ..models import ProcessingJob
+
+    if ProcessingJob.objects.filter(pk=job.pk, status='queued').update(
+            status='cancelled', finished_at=timezone.now()):
+        if job.kind in PROJECT_JOB_KINDS:
+            job.project.status = 'pending'
+            job.project.save()
+        return
+    ProcessingJob.objects.filter(pk=job.pk, status='running').update(cancel_requested=True)
+
+def run_job(job):
+    """Run a claimed job through the pipeline and record its outcome"""
+    from ..models import ProcessingJob
+    from .pipeline import GenerationPipeline
+
+    project = job.project
+    reporter = ProgressReporter(job)
+    pipeline = GenerationPipeline(project, reporter)
+    status, error = 'completed', ''
+
+    try:
+        with Heartbeat(job):
+            if job.kind == 'generate':
+                pipeline.extract_fields()
+                reference_index = pipeline.build_reference_index()
+                pipeline.generate(
+                    reference_index,
+                    use_cache=job.options.get('use_cache', True),
+                    skip_field_ids=set(job.completed_field_ids)
+                )
+            elif job.kind == 'fill':
+                pipeline.fill_documents()
+            elif job.kind == 'prepare':
+                # Per-file outcomes are recorded on the files themselves
+                pipeline.extract_fields()
+                pipeline.build_reference_index()
+            else:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+        project_status = 'completed'
+    except JobCancelled:
+        status = 'cancelled'
+        project_status = 'pending'
+    except Exception as e:
+        logger.exception(f"Job {job.pk} failed")
+        status, error = 'failed', str(e)
+        project_status = 'error'
+
+    if job.kind == 'generate':
+        from .resilience import metrics
+        logger.info(f"Completion metrics after job {job.pk}: {metrics.snapshot()}")
+
+    reporter.flush(force=True, check_cancelled=False)
+    ProcessingJob.objects.filter(pk=job.pk).update(status=status, error=error, finished_at=timezone.now())
+    if job.kind in PROJECT_JOB_KINDS:
+        project.status = project_status
+        project.save()
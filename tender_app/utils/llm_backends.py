@@ -0,0 +1,191 @@
+# tender_app/utils/llm_backends.py
+from django.conf import settings
+from django.utils.module_loading import import_string
+from typing import Any, AsyncIterator, Dict, NamedTuple, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+class BackendError(Exception):
+    """A completion request failed; status_code and retry_after are set when the server provided them"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None,
+                 timed_out: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.timed_out = timed_out
+
+class Completion(NamedTuple):
+    """A completion, or one streamed piece of it (token counts are None until known)"""
+    content: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+class LLMBackend:
+    """Interface for chat completion providers
+
+    request is a dict of OpenAI chat completion arguments (model, messages,
+    max_tokens, temperature and optionally response_format).
+    """
+
+    def complete(self, request: Dict[str, Any]) -> Completion:
+        raise NotImplementedError
+
+    async def stream(self, request: Dict[str, Any]) -> AsyncIterator[Completion]:
+        """Yield content deltas; the last item may carry only the token counts"""
+        completion = await asyncio.to_thread(self.complete, request)
+        yield completion
+
+class OpenAIBackend(LLMBackend):
+    """The OpenAI API (or anything that speaks it exactly)"""
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: Optional[float] = None, stream_usage: bool = True):
+        api_key = api_key or settings.OPENAI_API_KEY
+        base_url = base_url or getattr(settings, 'OPENAI_BASE_URL', None)
+        timeout = timeout or getattr(settings, 'AI_REQUEST_TIMEOUT', None)
+        # Retries are handled by ResilientBackend, so the client's own are turned off
+        client_options = {'max_retries': 0}
+        if timeout:
+            client_options['timeout'] = timeout
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, **client_options)
+        self.async_client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, **client_options)
+        self.stream_usage = stream_usage
+
+    def complete(self, request: Dict[str, Any]) -> Completion:
+        try:
+            response = self.client.chat.completions.create(**self._prepare(request))
+        except openai.APIError as e:
+            raise self._backend_error(e) from e
+
+        usage = getattr(response, 'usage', None)
+        return Completion(
+            content=(response.choices[0].message.content or '').strip(),
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None
+        )
+
+    async def stream(self, request: Dict[str, Any]) -> AsyncIterator[Completion]:
+        options = {'stream_options': {'include_usage': True}} if self.stream_usage else {}
+        try:
+            stream = await self.async_client.chat.completions.create(**self._prepare(request), stream=True, **options)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield Completion(chunk.choices[0].delta.content)
+                usage = getattr(chunk, 'usage', None)
+                if usage:
+                    yield Completion('', usage.prompt_tokens, usage.completion_tokens)
+        except openai.APIError as e:
+            raise self._backend_error(e) from e
+
+    def _prepare(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return request
+
+    @staticmethod
+    def _backend_error(error: openai.APIError) -> BackendError:
+        """Keep the HTTP status and Retry-After header for the retry logic"""
+        status_code = getattr(error, 'status_code', None)
+        retry_after = None
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get('retry-after'))
+            except (TypeError, ValueError):
+                retry_after = None
+        return BackendError(str(error), status_code=status_code, retry_after=retry_after,
+                            timed_out=isinstance(error, openai.APITimeoutError))
+
+class OpenAICompatibleBackend(OpenAIBackend):
+    """A self-hosted OpenAI-compatible server (vLLM, llama.cpp, Ollama, LocalAI, ...)
+
+    Such servers often ignore or reject JSON mode and streamed usage, so both can be switched off.
+    """
+
+    def __init__(self, base_url: str, api_key: str = 'not-needed', timeout: Optional[float] = None,
+                 json_mode: bool = True, stream_usage: bool = False):
+        super().__init__(api_key=api_key, base_url=base_url, timeout=timeout, stream_usage=stream_usage)
+        self.json_mode = json_mode
+
+    def _prepare(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.json_mode and 'response_format' in request:
+            request = {key: value for key, value in request.items() if key != 'response_format'}
+        return request
+
+class FakeBackend(LLMBackend):
+    """Deterministic in-process stand-in for load tests and benchmarks (no network)
+
+    Answers depend only on the request, so caching behaves as it would with a
+    real provider. A seeded generator decides which calls fail with error_status.
+    """
+
+    FIELD_ID_PATTERN = re.compile(r'^\s*- "([^"]+)":', re.MULTILINE)
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 retry_after: Optional[float] = None, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def complete(self, request: Dict[str, Any]) -> Completion:
+        self._begin()
+        time.sleep(self.latency)
+        return self._answer(request)
+
+    async def stream(self, request: Dict[str, Any]) -> AsyncIterator[Completion]:
+        self._begin()
+        answer = self._answer(request)
+        words = answer.content.split(' ')
+        for index, word in enumerate(words):
+            await asyncio.sleep(self.latency / len(words))
+            yield Completion(word if index == 0 else ' ' + word)
+        yield Completion('', answer.prompt_tokens, answer.completion_tokens)
+
+    def _begin(self):
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise BackendError(f"Injected error ({self.error_status})",
+                               status_code=self.error_status, retry_after=self.retry_after)
+
+    def _answer(self, request: Dict[str, Any]) -> Completion:
+        prompt = request['messages'][-1]['content']
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+
+        if request.get('response_format', {}).get('type') == 'json_object':
+            field_ids = self.FIELD_ID_PATTERN.findall(prompt)
+            content = json.dumps({field_id: f"Generated response for {field_id} ({digest})" for field_id in field_ids})
+        else:
+            content = f"Generated response {digest} for a {len(prompt)} character prompt."
+
+        prompt_tokens = sum(len(message['content']) for message in request['messages']) // 4
+        return Completion(content, prompt_tokens, max(1, len(content) // 4))
+
+BACKENDS = {
+    'openai': OpenAIBackend,
+    'openai_compatible': OpenAICompatibleBackend,
+    'fake': FakeBackend,
+}
+
+def get_backend(name: Optional[str] = None, **options) -> LLMBackend:
+    """Build the backend named by AI_BACKEND (a BACKENDS key or a dotted class path)"""
+    name = name or getattr(settings, 'AI_BACKEND', 'openai')
+    if not options:
+        options = getattr(settings, 'AI_BACKEND_OPTIONS', {}) or {}
+
+    backend_class = BACKENDS.get(name) or import_string(name)
+    return backend_class(**options)
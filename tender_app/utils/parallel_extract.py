@@ -0,0 +1,184 @@
+# tender_app/utils/parallel_extract.py
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.conf import settings
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import logging
+import multiprocessing
+import os
+import time
+
+from .document_processor import DocumentProcessor
+from .pdf_engine import pdf_page_count
+
+logger = logging.getLogger(__name__)
+
+class ExtractionResult(NamedTuple):
+    value: Any  # Field list or reference chunks; None when extraction failed
+    error: Optional[str] = None
+
+# Worker entry points: module-level so they can be pickled into the pool
+
+def _extract_fields_task(file_path: str, file_type: str, page_range: Optional[Tuple[int, int]],
+                         options: Dict[str, Any]):
+    return DocumentProcessor(**options).extract_fields(file_path, file_type)
+
+def _extract_text_task(file_path: str, file_type: str, page_range: Optional[Tuple[int, int]],
+                       options: Dict[str, Any]):
+    return list(DocumentProcessor(**options).iter_reference_chunks(file_path, file_type, page_range=page_range))
+
+class ParallelExtractor:
+    """Runs document extraction on a bounded process pool
+
+    Reference PDFs longer than pages_per_task are split into page ranges so
+    one large file is spread over several cores. Each task has a timeout;
+    a worker that overruns it is killed together with its pool, the rest of
+    the in-flight tasks are resubmitted to a fresh pool, and the document
+    is reported as failed. Workers are replaced after max_tasks_per_child
+    tasks so parser memory leaks cannot accumulate.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: float = 120.0,
+                 max_tasks_per_child: Optional[int] = 20, pages_per_task: int = 50,
+                 processor_options: Optional[Dict[str, Any]] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_tasks_per_child = max_tasks_per_child
+        self.pages_per_task = pages_per_task
+        # Workers have no Django settings, so DocumentProcessor options travel with each task
+        self.processor_options = processor_options or {}
+
+    @classmethod
+    def from_settings(cls) -> 'ParallelExtractor':
+        return cls(
+            max_workers=getattr(settings, 'EXTRACTION_WORKERS', None),
+            timeout=getattr(settings, 'EXTRACTION_TIMEOUT', 120),
+            max_tasks_per_child=getattr(settings, 'EXTRACTION_MAX_TASKS_PER_CHILD', 20),
+            pages_per_task=getattr(settings, 'EXTRACTION_PDF_PAGES_PER_TASK', 50),
+            processor_options={
+                'excel_max_fields_per_sheet': getattr(settings, 'EXCEL_MAX_FIELDS_PER_SHEET', 200),
+            }
+        )
+
+    def extract_fields(self, documents: Iterable[Tuple[Any, str, str]],
+                       on_result: Optional[Callable[[Any, ExtractionResult], None]] = None) -> Dict[Any, ExtractionResult]:
+        """Extract template fields from (key, file_path, file_type) documents, one task per document"""
+        documents = list(documents)
+        tasks = [(key, 0, _extract_fields_task, path, file_type, None, self.processor_options)
+                 for key, path, file_type in documents]
+        return self._run(documents, tasks, lambda parts: parts[0], on_result)
+
+    def extract_text(self, documents: Iterable[Tuple[Any, str, str]],
+                     on_result: Optional[Callable[[Any, ExtractionResult], None]] = None) -> Dict[Any, ExtractionResult]:
+        """Extract reference chunks from (key, file_path, file_type) documents, splitting large PDFs by page
+
+        Each result is the document's iter_reference_chunks() output, in order.
+        """
+        documents = list(documents)
+        tasks = []
+        for key, path, file_type in documents:
+            for part, page_range in enumerate(self._page_ranges(path, file_type)):
+                tasks.append((key, part, _extract_text_task, path, file_type, page_range, self.processor_options))
+        return self._run(documents, tasks, lambda parts: [chunk for part in parts for chunk in part], on_result)
+
+    def _page_ranges(self, file_path: str, file_type: str) -> List[Optional[Tuple[int, int]]]:
+        if file_type != 'pdf' or self.max_workers <= 1:
+            return [None]
+        try:
+            page_count = pdf_page_count(file_path)
+        except Exception:
+            return [None]  # Let the worker report the real error
+        if page_count <= self.pages_per_task:
+            return [None]
+        return [(start, min(start + self.pages_per_task, page_count))
+                for start in range(0, page_count, self.pages_per_task)]
+
+    def _run(self, documents: List[Tuple[Any, str, str]], tasks: List[tuple],
+             merge: Callable[[List[Any]], Any],
+             on_result: Optional[Callable[[Any, ExtractionResult], None]]) -> Dict[Any, ExtractionResult]:
+        """Run tasks, merging each document's parts in order once all of them are done"""
+        expected = {}
+        for key, part, *_ in tasks:
+            expected[key] = expected.get(key, 0) + 1
+        parts = {key: {} for key in expected}
+        results = {}
+
+        def task_done(key, part, value, error=None):
+            if key in results:
+                return  # Another part of this document already failed
+            if error is not None:
+                results[key] = ExtractionResult(None, error)
+            else:
+                parts[key][part] = value
+                if len(parts[key]) < expected[key]:
+                    return
+                results[key] = ExtractionResult(merge([parts[key][index] for index in range(expected[key])]))
+            if on_result:
+                on_result(key, results[key])
+
+        if self.max_workers <= 1 or len(tasks) <= 1:
+            for key, part, function, *args in tasks:
+                try:
+                    task_done(key, part, function(*args))
+                except Exception as e:
+                    task_done(key, part, None, str(e))
+        else:
+            self._run_pool(tasks, task_done)
+
+        # Deterministic: input order, whatever order the workers finished in
+        return {key: results[key] for key, _, _ in documents}
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn: forking a process that holds database connections and threads is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            max_tasks_per_child=self.max_tasks_per_child
+        )
+
+    def _run_pool(self, tasks: List[tuple], task_done: Callable):
+        queue = list(reversed(tasks))
+        pool = self._new_pool()
+        in_flight = {}  # future -> (task, deadline)
+
+        try:
+            while queue or in_flight:
+                # At most max_workers tasks are submitted, so each starts (almost) immediately
+                # and its deadline can be measured from submission
+                while queue and len(in_flight) < self.max_workers:
+                    task = queue.pop()
+                    key, part, function, *args = task
+                    in_flight[pool.submit(function, *args)] = (task, time.monotonic() + self.timeout)
+
+                next_deadline = min(deadline for _, deadline in in_flight.values())
+                done, _ = wait(in_flight, timeout=max(0.0, next_deadline - time.monotonic()),
+                               return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    (key, part, *_), _ = in_flight.pop(future)
+                    try:
+                        task_done(key, part, future.result())
+                    except Exception as e:
+                        task_done(key, part, None, str(e))
+
+                now = time.monotonic()
+                expired = [future for future, (_, deadline) in in_flight.items() if deadline <= now and not future.done()]
+                if expired:
+                    for future in expired:
+                        (key, part, function, file_path, *_), _ = in_flight.pop(future)
+                        logger.error(f"Extraction of {file_path} timed out after {self.timeout}s")
+                        task_done(key, part, None, f"Timed out after {self.timeout} seconds")
+                    # A stuck parser cannot be interrupted, only killed: replace the pool
+                    # and resubmit whatever else was running in it
+                    queue.extend(task for task, _ in in_flight.values())
+                    in_flight = {}
+                    self._terminate(pool)
+                    pool = self._new_pool()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _terminate(pool: ProcessPoolExecutor):
+        processes = list((getattr(pool, '_processes', None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
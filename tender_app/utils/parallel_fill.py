@@ -0,0 +1,106 @@
+# tender_app/utils/parallel_fill.py
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.conf import settings
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+import logging
+import multiprocessing
+import os
+
+from .fill_plans import FillPlanCache, PositionInfo, plan_cache_max_bytes
+from .form_filler import FormFiller
+
+logger = logging.getLogger(__name__)
+
+class FillTask(NamedTuple):
+    key: Any
+    template_path: str
+    output_path: str
+    field_content: Dict[str, str]
+    file_type: str
+    field_positions: Dict[str, List[PositionInfo]]
+    template_sha256: Optional[str] = None
+
+# Worker entry point: module-level so it can be pickled into the pool
+
+_worker_plans: Optional[FillPlanCache] = None
+
+def _fill_task(template_path: str, output_path: str, field_content: Dict[str, str], file_type: str,
+               field_positions: Dict[str, List[PositionInfo]], template_sha256: Optional[str],
+               plan_cache_bytes: int) -> bool:
+    global _worker_plans
+    if _worker_plans is None:
+        _worker_plans = FillPlanCache(max_bytes=plan_cache_bytes)
+    return FormFiller(plans=_worker_plans).fill_document(
+        template_path, output_path, field_content, file_type, field_positions, template_sha256=template_sha256
+    )
+
+class ParallelFiller:
+    """Fills several templates at once, one process per template
+
+    Templates are independent, so a project's fill takes about as long as
+    its slowest template rather than the sum of all of them. With one
+    worker, or a single template, filling runs in-process (and uses this
+    process's plan cache) instead of paying for a pool.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, plan_cache_bytes: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # Workers have no Django settings, so the cache size travels with each task
+        self.plan_cache_bytes = plan_cache_bytes or 64 * 1024 * 1024
+
+    @classmethod
+    def from_settings(cls) -> 'ParallelFiller':
+        return cls(
+            max_workers=getattr(settings, 'FILL_WORKERS', None),
+            plan_cache_bytes=plan_cache_max_bytes()
+        )
+
+    def fill(self, tasks: Iterable[FillTask],
+             on_result: Optional[Callable[[Any, bool], None]] = None) -> Dict[Any, bool]:
+        """Fill every task's document; returns {key: filled} in task order"""
+        tasks = list(tasks)
+        results = {}
+
+        def task_done(task: FillTask, filled: bool, error: Optional[str] = None):
+            if error is not None:
+                logger.error(f"Filling {task.template_path} failed: {error}")
+            results[task.key] = filled
+            if on_result:
+                on_result(task.key, filled)
+
+        if self.max_workers <= 1 or len(tasks) <= 1:
+            filler = FormFiller()
+            for task in tasks:
+                task_done(task, filler.fill_document(
+                    task.template_path, task.output_path, task.field_content, task.file_type,
+                    task.field_positions, template_sha256=task.template_sha256
+                ))
+        else:
+            self._fill_pool(tasks, task_done)
+
+        return {task.key: results[task.key] for task in tasks}
+
+    def _fill_pool(self, tasks: List[FillTask], task_done: Callable):
+        # spawn: forking a process that holds database connections and threads is unsafe
+        pool = ProcessPoolExecutor(
+            max_workers=min(self.max_workers, len(tasks)),
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        try:
+            in_flight = {
+                pool.submit(_fill_task, task.template_path, task.output_path, task.field_content, task.file_type,
+                            task.field_positions, task.template_sha256, self.plan_cache_bytes): task
+                for task in tasks
+            }
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = in_flight.pop(future)
+                    error = future.exception()
+                    # Errors raised by on_result (a cancelled job) propagate rather than fail the task
+                    if error is not None:
+                        task_done(task, False, str(error))
+                    else:
+                        task_done(task, future.result())
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
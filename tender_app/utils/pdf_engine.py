@@ -0,0 +1,166 @@
+# tender_app/utils/pdf_engine.py
+import fitz  # PyMuPDF
+import logging
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Text patterns for PDFs without form fields, tried in this order on every page
+TEXT_FIELD_PATTERNS = [
+    (re.compile(r'Name:\s*([_\.\s]{3,})', re.IGNORECASE), 'name_field'),
+    (re.compile(r'Date:\s*([_\.\s]{3,})', re.IGNORECASE), 'date_field'),
+    (re.compile(r'Signature:\s*([_\.\s]{3,})', re.IGNORECASE), 'signature_field'),
+    (re.compile(r'Address:\s*([_\.\s]{3,})', re.IGNORECASE), 'address_field'),
+    (re.compile(r'\[([^\]]+)\]', re.IGNORECASE), 'bracketed_field'),
+    (re.compile(r'_{5,}', re.IGNORECASE), 'underscore_field'),
+    (re.compile(r'\.{5,}', re.IGNORECASE), 'dotted_field'),
+]
+
+ACROFORM_TYPES = {'/Tx': 'acroform_text', '/Btn': '/Btn', '/Ch': '/Ch', '/Sig': '/Sig'}
+
+def extract_pdf_fields(file_path: str) -> List[Dict[str, Any]]:
+    """Find the fillable fields of a PDF, opening it once
+
+    One pass over the pages collects widgets (or bare widget annotations
+    on pages without widgets) and, until the first widget turns up, the
+    page text. Then, in the same order of preference as before:
+    widgets; otherwise AcroForm entries read from the catalog; otherwise
+    text patterns such as "Name: ____" and "[Field]" in the collected text.
+    """
+    fields = []
+    page_texts = []
+
+    with fitz.open(file_path) as doc:
+        for page_num in range(doc.page_count):
+            page = doc.load_page(page_num)
+
+            widget_count = 0
+            for widget in page.widgets():
+                widget_count += 1
+                fields.append({
+                    'field_name': widget.field_name or f"Field_{len(fields)+1}",
+                    'field_type': widget.field_type_string,
+                    'field_value': widget.field_value,
+                    'position_info': {
+                        'page': page_num,
+                        'rect': list(widget.rect),
+                        'field_type': widget.field_type
+                    }
+                })
+
+            if widget_count == 0:
+                for annot in page.annots():
+                    if annot.type[1] == 'Widget':
+                        fields.append({
+                            'field_name': f"Widget_{len(fields)+1}",
+                            'field_type': 'widget_annotation',
+                            'position_info': {
+                                'page': page_num,
+                                'rect': list(annot.rect),
+                                'content': annot.info.get('content', '')
+                            }
+                        })
+
+            # Text is only needed if the document turns out to have no form fields at all
+            if not fields:
+                page_texts.append(page.get_text())
+
+        if not fields:
+            fields = _acroform_fields(doc)
+
+    if not fields:
+        fields = _text_pattern_fields(page_texts)
+
+    return fields
+
+def pdf_page_count(file_path: str) -> int:
+    with fitz.open(file_path) as doc:
+        return doc.page_count
+
+def iter_pdf_text(file_path: str, page_range: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[int, str]]:
+    """Yield (page_index, text) for each page, or for pages [start, end) of page_range"""
+    with fitz.open(file_path) as doc:
+        start, end = page_range or (0, doc.page_count)
+        for page_num in range(start, min(end, doc.page_count)):
+            yield page_num, doc.load_page(page_num).get_text()
+
+def _acroform_fields(doc) -> List[Dict[str, Any]]:
+    """Terminal AcroForm fields by fully qualified name, for forms whose fields have no widgets"""
+    fields = {}
+    try:
+        kind, value = doc.xref_get_key(doc.pdf_catalog(), 'AcroForm/Fields')
+    except Exception:
+        return []
+    if kind != 'array':
+        return []
+
+    stack = [(xref, '') for xref in reversed(_xrefs(value))]
+    while stack:
+        xref, parent_name = stack.pop()
+        partial_name = _string_value(doc.xref_get_key(xref, 'T'))
+        name = '.'.join(part for part in (parent_name, partial_name) if part)
+
+        kind, kids = doc.xref_get_key(xref, 'Kids')
+        if kind == 'array':
+            # Kids without their own name are widgets of this field, not sub-fields
+            named_kids = [kid for kid in _xrefs(kids) if doc.xref_get_key(kid, 'T')[0] != 'null']
+            if named_kids:
+                stack.extend((kid, name) for kid in reversed(named_kids))
+                continue
+
+        if not name or name in fields:
+            continue
+        field_type = _inherited(doc, xref, 'FT')
+        fields[name] = {
+            'field_name': name,
+            'field_type': ACROFORM_TYPES.get(field_type, field_type or 'unknown'),
+            'field_value': _string_value(doc.xref_get_key(xref, 'V')),
+            'position_info': {
+                'source': 'AcroForm'
+            }
+        }
+
+    return list(fields.values())
+
+def _text_pattern_fields(page_texts: List[str]) -> List[Dict[str, Any]]:
+    fields = []
+    for page_num, text in enumerate(page_texts):
+        for pattern, field_type in TEXT_FIELD_PATTERNS:
+            for match in pattern.finditer(text):
+                field_name = match.group(1) if pattern.groups else f"{field_type}_{len(fields)+1}"
+                fields.append({
+                    'field_name': field_name.strip(),
+                    'field_type': field_type,
+                    'position_info': {
+                        'page': page_num,
+                        'start': match.start(),
+                        'end': match.end(),
+                        'original_text': match.group(0)
+                    }
+                })
+    return fields
+
+def _xrefs(array: str) -> List[int]:
+    """'[12 0 R 15 0 R]' -> [12, 15]"""
+    return [int(xref) for xref in re.findall(r'(\d+)\s+\d+\s+R', array)]
+
+def _string_value(key: Tuple[str, str]) -> str:
+    kind, value = key
+    if kind == 'string':
+        return value
+    if kind == 'name':
+        return value.lstrip('/')
+    return ''
+
+def _inherited(doc, xref: int, key: str) -> str:
+    """Look a field attribute up on the field or its ancestors"""
+    for _ in range(32):  # Guard against malformed /Parent cycles
+        kind, value = doc.xref_get_key(xref, key)
+        if kind != 'null':
+            return value
+        kind, parent = doc.xref_get_key(xref, 'Parent')
+        if kind != 'xref':
+            return ''
+        xref = _xrefs(parent)[0]
+    return ''
@@ -0,0 +1,317 @@
+# tender_app/utils/pipeline.py
+from django.conf import settings
+from django.utils import timezone
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+import os
+import uuid
+
+from .ai_generator import AIContentGenerator
+from .blob_storage import blob_sha256
+from .field_groups import group_fields
+from .field_store import GeneratedContentWriter, create_fields
+from .form_filler import fill_fingerprint
+from .job_queue import ProgressReporter
+from .parallel_extract import ExtractionResult, ParallelExtractor
+from .parallel_fill import FillTask, ParallelFiller
+from .reference_index import ReferenceIndex
+from .template_library import TemplateLibrary
+from .text_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+def save_completion_logs(project, records: List[Dict[str, Any]]):
+    """Persist usage recorded by AIContentGenerator for the project"""
+    from ..models import CompletionLog
+
+    CompletionLog.objects.bulk_create([
+        CompletionLog(
+            project=project,
+            field_id=record['field_id'],
+            model=record['model'],
+            field_count=record['field_count'],
+            max_tokens=record['max_tokens'],
+            prompt_tokens=record['prompt_tokens'],
+            completion_tokens=record['completion_tokens'],
+            latency_ms=record['latency_ms']
+        )
+        for record in records
+    ])
+
+def set_extraction_status(document, status: str, error: str = ''):
+    """Record the readiness of a template or reference document shown on the upload page"""
+    document.extraction_status = status
+    document.extraction_error = error
+    document.save(update_fields=['extraction_status', 'extraction_error'])
+
+def save_group_content(group: List[Dict[str, Any]], content: str):
+    """Store one generated answer on every member of a field group, skipping fields edited since"""
+    from ..models import ExtractedField
+
+    ExtractedField.objects.filter(
+        id__in=[field['id'] for field in group], is_user_edited=False
+    ).update(generated_content=content)
+
+class GenerationPipeline:
+    """Runs the extract, retrieve, generate and fill stages for one project"""
+
+    def __init__(self, project, reporter: Optional[ProgressReporter] = None):
+        self.project = project
+        self.reporter = reporter or ProgressReporter()
+
+    def extract_fields(self):
+        """Extract fields from templates if not already done, in parallel across templates
+
+        Templates seen before (in any project) get their fields from the
+        template library instead of being parsed again.
+        """
+        templates = {template.pk: template for template in self.project.tendertemplate_set.all()}
+        self.reporter.start_stage('extract', len(templates))
+        extractor = ParallelExtractor.from_settings()
+        library = TemplateLibrary(options=extractor.processor_options)
+
+        pending = []
+        file_types = {}
+        for template in templates.values():
+            # Skip if fields already extracted (possibly by the prepare job started on upload)
+            if template.extraction_status == 'ready' or template.extractedfield_set.exists():
+                logger.info(f"Fields already extracted for {template.original_filename}")
+                if template.extraction_status != 'ready':
+                    set_extraction_status(template, 'ready')
+                self.reporter.advance('extract')
+                continue
+            set_extraction_status(template, 'processing')
+
+            # Determine file type
+            file_extension = os.path.splitext(template.file.name)[1].lower()
+            file_type = file_extension[1:]  # Remove the dot
+            file_types[template.pk] = file_type
+
+            if not template.sha256:
+                template.sha256 = blob_sha256(template.file.name) or file_sha256(template.file.path)
+                template.save(update_fields=['sha256'])
+            fields = library.get(template.sha256)
+            if fields is not None:
+                logger.info(f"Reusing {len(fields)} library fields for {template.original_filename}")
+                create_fields(template, fields)
+                set_extraction_status(template, 'ready')
+                self.reporter.advance('extract')
+                continue
+
+            pending.append((template.pk, template.file.path, file_type))
+
+        def save_extracted(template_id, result: ExtractionResult):
+            template = templates[template_id]
+            if result.error is not None:
+                logger.error(f"Error extracting fields from {template.original_filename}: {result.error}")
+                set_extraction_status(template, 'failed', result.error)
+            else:
+                fields = result.value
+                logger.info(f"Extracted {len(fields)} fields from {template.original_filename}")
+                create_fields(template, fields)
+                library.set(template.sha256, file_types[template_id], fields)
+                set_extraction_status(template, 'ready')
+            self.reporter.advance('extract')
+
+        extractor.extract_fields(pending, on_result=save_extracted)
+
+    def build_reference_index(self) -> ReferenceIndex:
+        """Build the retrieval index over reference documents (only newly added ones are parsed)"""
+        pending = self.project.referencedocument_set.filter(indexed_at__isnull=True).count()
+        self.reporter.start_stage('retrieve', pending)
+
+        return ReferenceIndex.for_project(
+            self.project,
+            chunk_tokens=getattr(settings, 'REFERENCE_CHUNK_TOKENS', 200),
+            on_progress=lambda done, total: self.reporter.advance('retrieve', done=done)
+        )
+
+    def load_fields(self, skip_field_ids: Iterable[int] = ()) -> List[Dict[str, Any]]:
+        """Fields still to generate, leaving out skip_field_ids and anything the user edited"""
+        from ..models import ExtractedField
+
+        skip_field_ids = set(skip_field_ids)
+        fields = ExtractedField.objects.filter(
+            template__project=self.project, is_user_edited=False
+        ).order_by('template_id', 'id')
+
+        return [
+            {
+                'id': field.id,
+                'field_name': field.field_name,
+                'field_type': field.field_type,
+                'template_id': field.template_id,
+                'position_info': field.position_info,
+            }
+            for field in fields
+            if field.id not in skip_field_ids
+        ]
+
+    def generate(self, reference_index: ReferenceIndex, use_cache: bool = True,
+                 skip_field_ids: Iterable[int] = ()) -> int:
+        """Generate content for every field not in skip_field_ids, saving each as it completes
+
+        Equivalent fields across templates are generated once and the answer is copied to every member.
+        Fields whose completion failed are left unsaved and pending, and the run then raises.
+        """
+        from ..models import ExtractedField
+
+        skip_field_ids = set(skip_field_ids)
+        all_fields = self.load_fields(skip_field_ids)
+
+        if not all_fields and not ExtractedField.objects.filter(template__project=self.project).exists():
+            raise ValueError('No fields found in templates. Please check your template files.')
+
+        groups = {str(group[0]['id']): group for group in group_fields(all_fields)}
+        representatives = [group[0] for group in groups.values()]
+        logger.info(f"Generating {len(representatives)} answers for {len(all_fields)} fields")
+
+        self.reporter.start_stage('generate', len(all_fields) + len(skip_field_ids), done=len(skip_field_ids))
+
+        # Answers are written in batches, always before the progress that marks them completed
+        writer = GeneratedContentWriter()
+        self.reporter.before_flush = writer.flush
+
+        saved = set()
+
+        def save_field(field_id: str, content: str):
+            saved.add(field_id)
+            writer.add(groups[field_id], content)
+            for member in groups[field_id]:
+                self.reporter.advance('generate', field_id=member['id'])
+
+        ai_generator = AIContentGenerator()
+        project_context = f"Project: {self.project.name}\nDescription: {self.project.description}"
+
+        try:
+            ai_generator.generate_bulk_content(
+                representatives, '', project_context, use_cache=use_cache,
+                reference_index=reference_index, on_result=save_field
+            )
+        finally:
+            writer.flush()
+            self.reporter.before_flush = None
+            # Requests already sent are billed even if the run was cancelled
+            save_completion_logs(self.project, ai_generator.drain_usage())
+
+        # Failed fields keep their previous content and stay pending, so a resumed or new run retries them
+        failed = sum(len(group) for field_id, group in groups.items() if field_id not in saved)
+        if failed:
+            raise RuntimeError(f"Content for {failed} of {len(all_fields)} fields could not be generated; "
+                               f"generate again to retry them")
+        return sum(len(groups[field_id]) for field_id in saved)
+
+    def fill_documents(self) -> int:
+        """Fill template documents with generated content, templates in parallel
+
+        Each output is fingerprinted by its template's hash, FILLER_VERSION
+        and its field values; a template whose fingerprint matches its
+        current document keeps that file and record, so only templates with
+        changed fields are rendered again. New documents go into this run's
+        own processed/<project id>/<run>/ directory, so runs never overwrite
+        each other's files, and replace the template's previous document.
+        Returns the number of documents now current.
+        """
+        from ..models import ExtractedField, ProcessedDocument
+
+        templates = list(self.project.tendertemplate_set.all())
+        self.reporter.start_stage('fill', len(templates))
+        run_dir = f"processed/{self.project.id}/{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        output_dir = os.path.join(settings.MEDIA_ROOT, *run_dir.split('/'))
+
+        # One query for every template's fields
+        fields_by_template = {}
+        for field in ExtractedField.objects.filter(template__project=self.project).order_by('id'):
+            fields_by_template.setdefault(field.template_id, []).append(field)
+
+        # Documents from earlier fills, newest first
+        previous_documents = {}
+        for document in ProcessedDocument.objects.filter(
+                project=self.project, template__isnull=False).exclude(fingerprint='').order_by('-id'):
+            previous_documents.setdefault(document.template_id, []).append(document)
+
+        tasks = []
+        outputs = {}  # template id -> (file name, fingerprint)
+        used_names = set()
+        reused = 0
+        for template in templates:
+            # Collect field content for this template
+            field_content = {}
+            field_positions = {}
+            for field in fields_by_template.get(template.pk, []):
+                # Every field's position, so each fill of this template reuses one compiled plan
+                field_positions.setdefault(field.field_name, []).append(field.position_info)
+                if field.generated_content:
+                    field_content[field.field_name] = field.generated_content
+
+            if not field_content:
+                self.reporter.advance('fill')
+                continue
+
+            file_type = template.file_type.lstrip('.')
+            template_sha256 = template.sha256 or file_sha256(template.file.path)
+            fingerprint = fill_fingerprint(template_sha256, file_type, field_content, field_positions)
+            current = previous_documents.get(template.pk, [None])[0]
+            if current is not None and current.fingerprint == fingerprint and current.file.storage.exists(current.file.name):
+                reused += 1
+                self.reporter.advance('fill')
+                continue
+
+            # Templates uploaded under the same name still get a file each
+            base_name = os.path.splitext(template.original_filename)[0]
+            output_filename = f"{base_name}_filled.{file_type}"
+            suffix = 1
+            while output_filename.lower() in used_names:
+                suffix += 1
+                output_filename = f"{base_name}_filled_{suffix}.{file_type}"
+            used_names.add(output_filename.lower())
+            outputs[template.pk] = (output_filename, fingerprint)
+
+            tasks.append(FillTask(
+                template.pk, template.file.path, os.path.join(output_dir, output_filename),
+                field_content, file_type, field_positions, template_sha256
+            ))
+
+        processed = []
+
+        def filled(template_id: int, success: bool):
+            if success:
+                output_filename, fingerprint = outputs[template_id]
+                processed.append(ProcessedDocument(
+                    project=self.project,
+                    template_id=template_id,
+                    file=f'{run_dir}/{output_filename}',
+                    fingerprint=fingerprint
+                ))
+            self.reporter.advance('fill')
+
+        if tasks:
+            os.makedirs(output_dir, exist_ok=True)
+            logger.info(f"Filling {len(tasks)} of {len(templates)} templates; {reused} documents unchanged")
+            ParallelFiller.from_settings().fill(tasks, on_result=filled)
+
+        # Save processed document records, then drop the documents they replace
+        ProcessedDocument.objects.bulk_create(processed)
+        self._delete_documents([
+            document
+            for new_document in processed
+            for document in previous_documents.get(new_document.template_id, [])
+        ])
+        return reused + len(processed)
+
+    @staticmethod
+    def _delete_documents(documents: List[Any]):
+        """Delete processed documents with their files, and run directories left empty"""
+        from ..models import ProcessedDocument
+
+        if not documents:
+            return
+        ProcessedDocument.objects.filter(pk__in=[document.pk for document in documents]).delete()
+        for document in documents:
+            storage = document.file.storage
+            if storage.exists(document.file.name):
+                storage.delete(document.file.name)
+            try:
+                os.rmdir(os.path.dirname(storage.path(document.file.name)))
+            except OSError:
+                pass  # Still holds documents of other templates
@@ -0,0 +1,77 @@
+# tender_app/utils/prompt_budget.py
+from typing import Any, Dict
+import re
+
+from .tokens import count_tokens, truncate_to_tokens
+
+# Output allowance for field types whose answers have a known shape
+FIELD_TYPE_MAX_TOKENS = {
+    'date_field': 20,
+    'signature_field': 20,
+    'name_field': 40,
+    'address_field': 60,
+    'CheckBox': 10,
+    'RadioButton': 10,
+    'ComboBox': 20,
+    'ListBox': 20,
+    'cell': 80,
+    'table_cell': 150,
+}
+
+# Field names that only ever need a short answer
+SHORT_ANSWER_PATTERN = re.compile(
+    r'\b(date|dob|abn|acn|phone|mobile|fax|e-?mail|postcode|name|title|position|number)\b',
+    re.IGNORECASE
+)
+SHORT_ANSWER_MAX_TOKENS = 60
+
+BLANK_PATTERN = re.compile(r'^[_.\s]+$')
+
+class PromptBudgeter:
+    """Fits prompts into an input token budget and sizes max_tokens per field"""
+
+    def __init__(self, model: str, input_budget: int = 3000,
+                 max_output_tokens: int = 800, min_output_tokens: int = 16):
+        self.model = model
+        self.input_budget = input_budget
+        self.max_output_tokens = max_output_tokens
+        self.min_output_tokens = min_output_tokens
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        return truncate_to_tokens(text, max_tokens, self.model)
+
+    def fit_context(self, project_context: str) -> str:
+        """Project context may use at most a quarter of the input budget"""
+        return self.truncate(project_context, self.input_budget // 4)
+
+    def reference_budget(self, fixed_tokens: int, reference_cap: int) -> int:
+        """Tokens left for reference content once the fixed parts of the prompt are counted"""
+        return max(0, min(reference_cap, self.input_budget - fixed_tokens))
+
+    def max_tokens_for(self, field_info: Dict[str, Any]) -> int:
+        """Pick an output allowance from the field type, its position metadata and its name"""
+        field_type = field_info.get('field_type', 'text')
+        field_name = field_info.get('field_name', '')
+        position = field_info.get('position_info') or {}
+
+        if field_type in FIELD_TYPE_MAX_TOKENS:
+            limit = FIELD_TYPE_MAX_TOKENS[field_type]
+        elif position.get('rect'):
+            # PDF widget: estimate how much text fits in the box (~6pt per character, 14pt lines)
+            x0, y0, x1, y1 = position['rect'][:4]
+            lines = max(1, int(abs(y1 - y0) // 14))
+            chars_per_line = max(1, int(abs(x1 - x0) // 6))
+            limit = lines * chars_per_line // 4 + 8
+        elif BLANK_PATTERN.match(position.get('original_text') or 'x'):
+            # A run of underscores or dots: the answer is about as long as the blank
+            limit = len(position['original_text']) // 2 + 8
+        else:
+            limit = self.max_output_tokens
+
+        if SHORT_ANSWER_PATTERN.search(field_name):
+            limit = min(limit, SHORT_ANSWER_MAX_TOKENS)
+
+        return max(self.min_output_tokens, min(self.max_output_tokens, limit))
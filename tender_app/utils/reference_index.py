@@ -0,0 +1,283 @@
+# tender_app/utils/reference_index.py
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from collections import Counter, defaultdict
+from typing import List, Dict, Any, Iterable, Optional, Callable, Tuple
+import logging
+import math
+import os
+import re
+
+from .blob_storage import blob_sha256
+from .parallel_extract import ExtractionResult, ParallelExtractor
+from .text_cache import ExtractedTextCache, file_sha256
+from .tokens import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+TERM_PATTERN = re.compile(r'[a-z0-9]+')
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;:])\s+')
+
+STOP_WORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word terms used for indexing and querying"""
+    return [term for term in TERM_PATTERN.findall(text.lower()) if term not in STOP_WORDS]
+
+def split_line(line: str, max_tokens: int) -> List[str]:
+    """Cut a line longer than max_tokens into pieces that fit: between sentences, else between words"""
+    if count_tokens(line) <= max_tokens:
+        return [line]
+
+    pieces = []
+    current = ''
+    for sentence in SENTENCE_BOUNDARY.split(line):
+        units = [sentence] if count_tokens(sentence) <= max_tokens else sentence.split()
+        for unit in units:
+            candidate = f"{current} {unit}" if current else unit
+            if count_tokens(candidate) <= max_tokens:
+                current = candidate
+                continue
+            if current:
+                pieces.append(current)
+            # A single word longer than a chunk (an encoded blob, a long URL) is cut where the tokens run out
+            while count_tokens(unit) > max_tokens:
+                head = truncate_to_tokens(unit, max_tokens)
+                if not head or not unit.startswith(head):
+                    head = unit[:max(1, max_tokens)]
+                pieces.append(head)
+                unit = unit[len(head):]
+            current = unit
+    if current:
+        pieces.append(current)
+    return pieces
+
+def chunk_text(text: str, chunk_tokens: int = 200) -> List[Tuple[int, int, str]]:
+    """Split text on line boundaries into chunks of roughly chunk_tokens tokens
+
+    Returns (first line, last line, text) for each chunk, with line numbers
+    counted from 0 over text.splitlines(). A line longer than chunk_tokens
+    (a paragraph without line breaks, a PDF page extracted as one line) is
+    split across chunks of its own.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    first = last = 0
+
+    for number, line in enumerate(text.splitlines()):
+        line = line.strip()
+        if not line:
+            continue
+        for piece in split_line(line, chunk_tokens):
+            piece_tokens = count_tokens(piece)
+            if current and current_tokens + piece_tokens > chunk_tokens:
+                chunks.append((first, last, '\n'.join(current)))
+                current, current_tokens = [], 0
+            if not current:
+                first = number
+            current.append(piece)
+            current_tokens += piece_tokens
+            last = number
+
+    if current:
+        chunks.append((first, last, '\n'.join(current)))
+    return chunks
+
+def chunk_source(source: Dict[str, Any], first_line: int, last_line: int) -> Dict[str, Any]:
+    """Narrow an extracted chunk's row or paragraph range to the lines an index chunk took from it"""
+    for key in ('rows', 'paragraphs'):
+        if key in source:
+            start = source[key][0]
+            return {**source, key: [start + first_line, start + last_line]}
+    return source
+
+def describe_source(source: Dict[str, Any]) -> str:
+    """Short human-readable location, e.g. 'page 3' or 'sheet Prices, rows 4-20'"""
+    parts = []
+    if 'page' in source:
+        parts.append(f"page {source['page']}")
+    if 'sheet' in source:
+        parts.append(f"sheet {source['sheet']}")
+    for key in ('rows', 'paragraphs'):
+        if key in source:
+            first, last = source[key]
+            parts.append(f"{key} {first}-{last}" if last != first else f"{key[:-1]} {first}")
+    return ', '.join(parts)
+
+class ReferenceIndex:
+    """In-memory BM25 index over a project's reference chunks"""
+
+    def __init__(self, chunks: List[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(chunk index, term frequency)]
+
+        for index, chunk in enumerate(chunks):
+            for term, count in chunk['term_counts'].items():
+                self.postings[term].append((index, count))
+
+        self.average_length = (sum(chunk['length'] for chunk in chunks) / len(chunks)) if chunks else 0
+
+    @classmethod
+    def for_project(cls, project, extractor: Optional[ParallelExtractor] = None,
+                    chunk_tokens: int = 200,
+                    on_progress: Optional[Callable[[int, int], None]] = None) -> 'ReferenceIndex':
+        """Index any new references for the project, then load all of its chunks"""
+        from ..models import ReferenceChunk
+
+        sync_project(project, extractor, chunk_tokens, on_progress)
+
+        chunks = [
+            {
+                'title': title,
+                'text': text,
+                'term_counts': term_counts,
+                'length': length,
+                'source': source,
+            }
+            for title, text, term_counts, length, source in ReferenceChunk.objects
+                .filter(reference__project=project)
+                .values_list('reference__title', 'text', 'term_counts', 'length', 'source')
+        ]
+        return cls(chunks)
+
+    def search(self, query: str, top_k: int = 4) -> List[int]:
+        """Return indices of the best matching chunks, best first"""
+        scores = defaultdict(float)
+        total = len(self.chunks)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, count in postings:
+                length_norm = 1 - self.b + self.b * self.chunks[index]['length'] / (self.average_length or 1)
+                scores[index] += idf * count * (self.k1 + 1) / (count + self.k1 * length_norm)
+
+        ranked = sorted(scores, key=lambda index: (-scores[index], index))
+        return ranked[:top_k]
+
+    def select(self, query: str, top_k: int = 4, token_budget: int = 600) -> str:
+        """Render the top-k chunks for a query that fit within the token budget
+
+        The best-ranked chunk is cut down to the budget rather than left out,
+        so a budget smaller than one chunk still gets the best match.
+        """
+        ranked = self.search(query, top_k)
+        if not ranked:
+            # Nothing matched (e.g. positional field names); fall back to document order
+            ranked = list(range(min(top_k, len(self.chunks))))
+
+        sections = []
+        used = 0
+        for index in ranked:
+            chunk = self.chunks[index]
+            location = describe_source(chunk['source'])
+            heading = f"{chunk['title']} ({location})" if location else chunk['title']
+            section = f"=== {heading} ===\n{chunk['text']}"
+            cost = count_tokens(section)
+            if used + cost > token_budget:
+                if sections:
+                    continue
+                section = truncate_to_tokens(section, token_budget)
+                cost = count_tokens(section)
+                if not section:
+                    break
+            sections.append(section)
+            used += cost
+
+        return '\n\n'.join(sections)
+
+def index_reference(reference, extracted: Iterable[Dict[str, Any]], chunk_tokens: int = 200) -> int:
+    """Chunk and store one reference document's extracted chunks; returns the number of index chunks
+
+    extracted is iter_reference_chunks() output, consumed one chunk at a
+    time. Index chunks never span two extracted chunks, so each keeps a
+    source (narrowed to the rows or paragraphs it holds).
+    """
+    from ..models import ReferenceChunk
+
+    chunks = []
+    for block in extracted:
+        for first_line, last_line, text in chunk_text(block['text'], chunk_tokens):
+            terms = tokenize(text)
+            chunks.append(ReferenceChunk(
+                reference=reference,
+                ordinal=len(chunks),
+                text=text,
+                term_counts=dict(Counter(terms)),
+                length=len(terms),
+                source=chunk_source(block['source'], first_line, last_line),
+            ))
+
+    with transaction.atomic():
+        ReferenceChunk.objects.filter(reference=reference).delete()
+        ReferenceChunk.objects.bulk_create(chunks)
+        reference.indexed_at = timezone.now()
+        reference.extraction_status, reference.extraction_error = 'ready', ''
+        reference.save(update_fields=['indexed_at', 'extraction_status', 'extraction_error'])
+
+    return len(chunks)
+
+def sync_project(project, extractor: Optional[ParallelExtractor] = None, chunk_tokens: int = 200,
+                 on_progress: Optional[Callable[[int, int], None]] = None):
+    """Index references that are not indexed yet (removed ones cascade away with their chunks)
+
+    Chunks come from the extracted text cache when the same file has been seen
+    before; everything else is extracted in parallel and indexed as it arrives.
+    """
+    extractor = extractor or ParallelExtractor.from_settings()
+    text_cache = ExtractedTextCache(max_bytes=getattr(settings, 'REFERENCE_TEXT_CACHE_MAX_BYTES', None))
+    unindexed = project.referencedocument_set.filter(indexed_at__isnull=True)
+    references = {reference.pk: reference for reference in unindexed}
+    unindexed.filter(pk__in=list(references)).update(extraction_status='processing', extraction_error='')
+    done = 0
+
+    def finished(reference, extracted: Optional[List[Dict[str, Any]]], error: Optional[str] = None):
+        nonlocal done
+        if error is None:
+            try:
+                count = index_reference(reference, extracted, chunk_tokens)
+                logger.info(f"Indexed reference {reference.title} into {count} chunks")
+            except Exception as e:
+                error = str(e)
+        if error is not None:
+            logger.error(f"Error indexing reference {reference.title}: {error}")
+            reference.extraction_status, reference.extraction_error = 'failed', error
+            reference.save(update_fields=['extraction_status', 'extraction_error'])
+        done += 1
+        if on_progress:
+            on_progress(done, len(references))
+
+    pending = []
+    hashes = {}
+    for reference in references.values():
+        file_extension = os.path.splitext(reference.file.name)[1].lower()
+        file_type = file_extension[1:]  # Remove the dot
+        try:
+            # Blob names already carry the hash
+            sha256 = blob_sha256(reference.file.name) or file_sha256(reference.file.path)
+        except OSError as e:
+            finished(reference, None, str(e))
+            continue
+
+        # The same file uploaded again (to any project) is not parsed twice
+        extracted = text_cache.get(sha256)
+        if extracted is not None:
+            finished(reference, extracted)
+        else:
+            hashes[reference.pk] = (sha256, file_type)
+            pending.append((reference.pk, reference.file.path, file_type))
+
+    def extracted(pk, result: ExtractionResult):
+        if result.error is None:
+            text_cache.set(*hashes[pk], result.value)
+        finished(references[pk], result.value, result.error)
+
+    extractor.extract_text(pending, on_result=extracted)
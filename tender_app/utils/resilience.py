@@ -0,0 +1,348 @@
+# tender_app/utils/resilience.py
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, ThreadPoolExecutor, wait
+from django.conf import settings
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from .llm_backends import BackendError, Completion, LLMBackend
+from .rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying; anything else (bad request, auth, ...) fails straight away
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(BackendError):
+    """Raised without calling the provider while its circuit breaker is open"""
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, or None for an empty sample"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+class ResilienceMetrics:
+    """Process-wide counters and a sliding window of completion latencies"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.counters = {
+            'requests': 0,
+            'successes': 0,
+            'failures': 0,
+            'retries': 0,
+            'timeouts': 0,
+            'rate_limited': 0,
+            'short_circuited': 0,
+            'hedges': 0,
+            'hedge_wins': 0,
+        }
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def observe(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def latencies(self) -> List[float]:
+        with self._lock:
+            return list(self._latencies)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = self.latencies()
+        with self._lock:
+            counters = dict(self.counters)
+        counters['latency_ms'] = {
+            name: round(value * 1000) if value is not None else None
+            for name, value in (
+                ('p50', percentile(latencies, 50)),
+                ('p95', percentile(latencies, 95)),
+                ('p99', percentile(latencies, 99)),
+            )
+        }
+        counters['breakers'] = {name: breaker.state for name, breaker in _breakers.items()}
+        return counters
+
+metrics = ResilienceMetrics()
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures; lets one trial call through after reset_timeout"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def acquire(self) -> Optional[str]:
+        """'call' or 'trial' when a call may go through, None while it must not
+
+        Whoever gets 'trial' must end it with record_success, record_failure
+        or, when the call ended without telling whether the provider works,
+        release_trial.
+        """
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return 'call'
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return 'trial'
+            return None
+
+    def release_trial(self):
+        """Let another call try the provider after a trial that proved nothing (cancelled, or a bug of ours)"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            # A failed trial call reopens the breaker; calls already in flight when it opened do not extend it
+            if self._trial_running or (self._opened_at is None and self._failures >= self.failure_threshold):
+                logger.warning(f"Circuit breaker opened after {self._failures} consecutive failures")
+                self._opened_at = self._clock()
+                self._trial_running = False
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    """One breaker per provider, shared by every generator in the process"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(failure_threshold, reset_timeout)
+        return _breakers[name]
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+def get_hedge_executor() -> ThreadPoolExecutor:
+    """One pool for hedged calls, shared by every backend in the process and never shut down"""
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            # Room for every caller's primary call plus its hedge
+            workers = getattr(settings, 'AI_HEDGE_WORKERS', None) or 2 * getattr(settings, 'AI_GENERATION_CONCURRENCY', 8)
+            _hedge_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm-hedge')
+        return _hedge_executor
+
+class ResilientBackend(LLMBackend):
+    """Wraps a backend with retries, a circuit breaker and optional hedged requests
+
+    Retries use full-jitter exponential backoff, or wait exactly as long as
+    the provider's Retry-After asks. Once hedge_percentile is set and enough
+    latencies have been seen, a call still running after that percentile is
+    duplicated and whichever finishes first wins.
+
+    Every request sent to the provider, first attempt, retry or hedge, waits
+    for rate_limiter capacity first; request_tokens sizes it for the
+    tokens-per-minute quota.
+    """
+
+    def __init__(self, backend: LLMBackend, breaker: CircuitBreaker,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 30.0,
+                 hedge_percentile: Optional[float] = None, hedge_min_samples: int = 20,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 request_tokens: Optional[Callable[[Dict[str, Any]], int]] = None,
+                 hedge_executor: Optional[Executor] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.backend = backend
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.rate_limiter = rate_limiter
+        self.request_tokens = request_tokens or (lambda request: 0)
+        self.hedge_executor = hedge_executor
+        self._sleep = sleep
+
+    @classmethod
+    def from_settings(cls, backend: LLMBackend, rate_limiter: Optional[RateLimiter] = None,
+                      request_tokens: Optional[Callable[[Dict[str, Any]], int]] = None) -> 'ResilientBackend':
+        breaker = get_breaker(
+            getattr(settings, 'AI_BACKEND', 'openai'),
+            failure_threshold=getattr(settings, 'AI_BREAKER_FAILURE_THRESHOLD', 5),
+            reset_timeout=getattr(settings, 'AI_BREAKER_RESET_SECONDS', 30)
+        )
+        return cls(
+            backend, breaker,
+            max_retries=getattr(settings, 'AI_MAX_RETRIES', 3),
+            base_delay=getattr(settings, 'AI_RETRY_BASE_DELAY', 0.5),
+            max_delay=getattr(settings, 'AI_RETRY_MAX_DELAY', 30),
+            hedge_percentile=getattr(settings, 'AI_HEDGE_PERCENTILE', None),
+            rate_limiter=rate_limiter,
+            request_tokens=request_tokens
+        )
+
+    def complete(self, request: Dict[str, Any]) -> Completion:
+        attempt = 0
+        while True:
+            trial = self._check_breaker()
+            try:
+                self._acquire(request)
+                start = time.perf_counter()
+                completion = self._call(request)
+            except BackendError as e:
+                self._record_failure(e)
+                if not self._should_retry(e, attempt):
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.info(f"Retrying completion in {delay:.2f}s after error: {e}")
+                metrics.incr('retries')
+                attempt += 1
+                self._sleep(delay)
+                continue
+            except BaseException:
+                if trial:
+                    self.breaker.release_trial()
+                raise
+
+            self.breaker.record_success()
+            metrics.incr('successes')
+            metrics.observe(time.perf_counter() - start)
+            return completion
+
+    async def stream(self, request: Dict[str, Any]) -> AsyncIterator[Completion]:
+        """Retries only happen before the first piece has been yielded"""
+        attempt = 0
+        while True:
+            trial = self._check_breaker()
+            started = False
+            try:
+                if self.rate_limiter:
+                    await asyncio.to_thread(self._acquire, request)
+                start = time.perf_counter()
+                async for chunk in self.backend.stream(request):
+                    started = True
+                    yield chunk
+            except BackendError as e:
+                self._record_failure(e)
+                if started or not self._should_retry(e, attempt):
+                    raise
+                metrics.incr('retries')
+                await asyncio.sleep(self._backoff(attempt, e))
+                attempt += 1
+                continue
+            except BaseException:
+                # Includes CancelledError and GeneratorExit when the client goes away mid-stream
+                if trial:
+                    self.breaker.release_trial()
+                raise
+
+            self.breaker.record_success()
+            metrics.incr('successes')
+            metrics.observe(time.perf_counter() - start)
+            return
+
+    def _check_breaker(self) -> bool:
+        """Whether this call is the breaker's half-open trial"""
+        metrics.incr('requests')
+        permit = self.breaker.acquire()
+        if permit is None:
+            metrics.incr('short_circuited')
+            raise CircuitOpenError('Circuit breaker open: the LLM provider is failing, not sending request')
+        return permit == 'trial'
+
+    def _acquire(self, request: Dict[str, Any]):
+        """Wait until the rate limiter has room for one more request"""
+        if self.rate_limiter:
+            self.rate_limiter.acquire(self.request_tokens(request))
+
+    def _limited_complete(self, request: Dict[str, Any]) -> Completion:
+        self._acquire(request)
+        return self.backend.complete(request)
+
+    def _record_failure(self, error: BackendError):
+        metrics.incr('failures')
+        if error.timed_out:
+            metrics.incr('timeouts')
+        if error.status_code == 429:
+            metrics.incr('rate_limited')
+        if error.status_code is None or error.status_code in RETRYABLE_STATUSES:
+            self.breaker.record_failure()
+        else:
+            # A client error still shows the provider is up
+            self.breaker.record_success()
+
+    def _should_retry(self, error: BackendError, attempt: int) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        return error.status_code is None or error.status_code in RETRYABLE_STATUSES
+
+    def _backoff(self, attempt: int, error: BackendError) -> float:
+        if error.retry_after is not None:
+            return min(error.retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge_percentile:
+            return None
+        latencies = metrics.latencies()
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        return percentile(latencies, self.hedge_percentile)
+
+    def _call(self, request: Dict[str, Any]) -> Completion:
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None:
+            return self.backend.complete(request)
+
+        executor = self.hedge_executor or get_hedge_executor()
+        primary = executor.submit(self.backend.complete, request)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        metrics.incr('hedges')
+        # The hedge is a request of its own; it waits for capacity in the pool, not here
+        hedge = executor.submit(self._limited_complete, request)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except BackendError as e:
+                    error = e
+                    continue
+                if future is hedge:
+                    metrics.incr('hedge_wins')
+                # The slower call cannot be aborted; its answer is simply dropped
+                return result
+        raise error
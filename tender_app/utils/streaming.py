@@ -0,0 +1,158 @@
+# tender_app/utils/streaming.py
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+from typing import Any, AsyncIterator, Dict
+import asyncio
+import json
+import logging
+
+from .ai_generator import AIContentGenerator
+from .field_groups import group_fields
+from .job_queue import ACTIVE_STATUSES, Heartbeat, JobCancelled, ProgressReporter
+from .pipeline import GenerationPipeline, save_completion_logs, save_group_content
+
+logger = logging.getLogger(__name__)
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def start_stream_job(project, use_cache: bool = True):
+    """Record a streamed run as a running generate job, or return None if the project already has an active job
+
+    The job makes the stream visible to the status polling and holds the
+    queue's per-project lock, so no queued job runs alongside it.
+    """
+    from ..models import ProcessingJob
+
+    with transaction.atomic():
+        if ProcessingJob.objects.filter(project=project, status__in=ACTIVE_STATUSES).exists():
+            return None
+        now = timezone.now()
+        job = ProcessingJob.objects.create(
+            project=project, kind='generate', status='running', worker='stream', attempts=1,
+            options={'use_cache': use_cache}, started_at=now, heartbeat_at=now
+        )
+        project.status = 'processing'
+        project.save()
+    return job
+
+def _finish_job(job, reporter: ProgressReporter, status: str, error: str = ''):
+    from ..models import ProcessingJob
+
+    reporter.flush(force=True, check_cancelled=False)
+    ProcessingJob.objects.filter(pk=job.pk).update(status=status, error=error, finished_at=timezone.now())
+    job.project.status = {'completed': 'completed', 'cancelled': 'pending'}.get(status, 'error')
+    job.project.save()
+
+async def stream_generation(job, use_cache: bool = True) -> AsyncIterator[str]:
+    """Generate every field of a job's project, yielding SSE events as tokens arrive
+
+    job comes from start_stream_job. Each field is saved as soon as it
+    finishes, so a client disconnect (which cancels the job) only loses the
+    fields still in flight. A field whose completion fails is reported with
+    a field_error event and left unsaved.
+    """
+    project = job.project
+    reporter = ProgressReporter(job)
+    pipeline = GenerationPipeline(project, reporter)
+    failed = 0
+    ended = False  # Stays False when the client disconnects
+
+    async def generate_group(group):
+        nonlocal failed
+        # Tokens stream into the first member; the others receive the finished answer
+        field = group[0]
+        async with semaphore:
+            parts = []
+            await events.put(sse_event('field_start', {'field_id': field['id']}))
+            try:
+                async for delta in ai_generator.stream_field_content(
+                        field, '', project_context, use_cache, reference_index):
+                    parts.append(delta)
+                    await events.put(sse_event('token', {'field_id': field['id'], 'delta': delta}))
+            except Exception as e:
+                failed += len(group)
+                for member in group:
+                    await events.put(sse_event('field_error', {'field_id': member['id'], 'error': str(e)}))
+                return
+            finally:
+                await sync_to_async(save_completion_logs)(project, ai_generator.drain_usage())
+
+            content = ''.join(parts).strip()
+            await sync_to_async(save_group_content)(group, content)
+            for member in group:
+                await sync_to_async(reporter.advance)('generate', field_id=member['id'])
+                await events.put(sse_event('field_done', {'field_id': member['id'], 'content': content}))
+
+    group_tasks = []
+
+    async def generate_all():
+        try:
+            await asyncio.gather(*group_tasks)
+        finally:
+            await events.put(None)
+
+    async def stop():
+        # gather leaves the other groups running when one raises (a cancelled job),
+        # so cancel and await them all before the job is finished: none may write afterwards
+        tasks = [task for task in group_tasks + [runner] if task is not None and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    runner = None
+    heartbeat = Heartbeat(job).start()
+    try:
+        yield sse_event('stage', {'stage': 'extract'})
+        await sync_to_async(pipeline.extract_fields)()
+        yield sse_event('stage', {'stage': 'retrieve'})
+        reference_index = await sync_to_async(pipeline.build_reference_index)()
+        fields = await sync_to_async(pipeline.load_fields)()
+        groups = group_fields(fields)
+        yield sse_event('stage', {'stage': 'generate', 'total': len(fields)})
+        await sync_to_async(reporter.start_stage)('generate', len(fields))
+
+        ai_generator = AIContentGenerator()
+        project_context = f"Project: {project.name}\nDescription: {project.description}"
+        semaphore = asyncio.Semaphore(ai_generator.concurrency)
+        events = asyncio.Queue()
+
+        group_tasks.extend(asyncio.create_task(generate_group(group)) for group in groups)
+        runner = asyncio.create_task(generate_all())
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        await runner
+        ended = True
+    except JobCancelled:
+        ended = True
+        await stop()
+        await sync_to_async(_finish_job)(job, reporter, 'cancelled')
+        yield sse_event('generation_error', {'error': 'Generation was cancelled'})
+        return
+    except Exception as e:
+        logger.error(f"Streaming generation failed for project {project.id}: {e}")
+        ended = True
+        await stop()
+        await sync_to_async(_finish_job)(job, reporter, 'failed', str(e))
+        yield sse_event('generation_error', {'error': str(e)})
+        return
+    finally:
+        await stop()
+        await asyncio.to_thread(heartbeat.stop)
+        if not ended:
+            # The client went away mid-run
+            await sync_to_async(_finish_job)(job, reporter, 'cancelled')
+
+    if failed:
+        # Failed fields stay pending, as in a queued run
+        error = f"Content for {failed} of {len(fields)} fields could not be generated; generate again to retry them"
+        await sync_to_async(_finish_job)(job, reporter, 'failed', error)
+        yield sse_event('generation_error', {'error': error})
+        return
+    await sync_to_async(_finish_job)(job, reporter, 'completed')
+    yield sse_event('done', {'count': len(fields)})
@@ -0,0 +1,113 @@
+# tender_app/utils/template_library.py
+from django.db.models import F, Sum
+from django.utils import timezone
+from typing import Any, Dict, List, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Bump when DocumentProcessor.extract_fields output changes so stored schemas are re-extracted
+FIELD_EXTRACTOR_VERSION = 2
+
+class TemplateLibrary:
+    """Field schemas of previously seen templates, keyed by the file's SHA-256
+
+    The same form uploaded to another project gets its fields from here
+    instead of being parsed again. A schema is only used when it was
+    extracted by the current FIELD_EXTRACTOR_VERSION with the same options.
+    """
+
+    _stats_lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+
+    def __init__(self, options: Optional[Dict[str, Any]] = None):
+        self.options = options or {}
+
+    def get(self, sha256: str) -> Optional[List[Dict[str, Any]]]:
+        from ..models import TemplateSchema
+
+        try:
+            fields = TemplateSchema.objects.filter(
+                sha256=sha256, extractor_version=FIELD_EXTRACTOR_VERSION, options=self.options
+            ).values_list('fields', flat=True).first()
+            if fields is not None:
+                TemplateSchema.objects.filter(sha256=sha256).update(
+                    hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+                )
+        except Exception as e:
+            # The library is an optimisation; a failure means extracting as usual
+            logger.error(f"Template library lookup failed: {e}")
+            fields = None
+        self._record(hit=fields is not None)
+        return fields
+
+    def set(self, sha256: str, file_type: str, fields: List[Dict[str, Any]]):
+        from ..models import TemplateSchema
+
+        now = timezone.now()
+        try:
+            TemplateSchema.objects.update_or_create(
+                sha256=sha256,
+                defaults={
+                    'file_type': file_type,
+                    'extractor_version': FIELD_EXTRACTOR_VERSION,
+                    'options': self.options,
+                    'fields': fields,
+                    'field_count': len(fields),
+                    'hit_count': 0,
+                    'created_at': now,
+                    'last_used_at': now,
+                }
+            )
+        except Exception as e:
+            logger.error(f"Template library store failed: {e}")
+
+    @staticmethod
+    def invalidate(sha256: Optional[str] = None, stale_only: bool = False) -> int:
+        """Delete one schema, those from older extractor versions, or (by default) all of them"""
+        from ..models import TemplateSchema
+
+        schemas = TemplateSchema.objects.all()
+        if sha256:
+            schemas = schemas.filter(sha256=sha256)
+        if stale_only:
+            schemas = schemas.exclude(extractor_version=FIELD_EXTRACTOR_VERSION)
+        deleted, _ = schemas.delete()
+        return deleted
+
+    @classmethod
+    def _record(cls, hit: bool):
+        with cls._stats_lock:
+            if hit:
+                cls._hits += 1
+            else:
+                cls._misses += 1
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Stored hit rate (every schema was one miss) plus this process's lookups"""
+        from ..models import TemplateSchema
+
+        totals = TemplateSchema.objects.aggregate(hits=Sum('hit_count'), fields=Sum('field_count'))
+        schemas = TemplateSchema.objects.count()
+        stale = TemplateSchema.objects.exclude(extractor_version=FIELD_EXTRACTOR_VERSION).count()
+        hits = totals['hits'] or 0
+        with cls._stats_lock:
+            process_hits, process_misses = cls._hits, cls._misses
+        process_lookups = process_hits + process_misses
+
+        return {
+            'schemas': schemas,
+            'stale_schemas': stale,
+            'fields': totals['fields'] or 0,
+            'hits': hits,
+            'hit_rate': hits / (hits + schemas) if hits + schemas else 0.0,
+            'extractor_version': FIELD_EXTRACTOR_VERSION,
+            'process': {
+                'hits': process_hits,
+                'misses': process_misses,
+                'hit_rate': process_hits / process_lookups if process_lookups else 0.0,
+            },
+        }
@@ -0,0 +1,122 @@
+# tender_app/utils/text_cache.py
+from django.utils import timezone
+from django.db.models import F, Sum
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Bump when iter_reference_chunks output changes so stale chunks are re-extracted
+TEXT_EXTRACTOR_VERSION = 4
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """Hash a file without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ExtractedTextCache:
+    """Database-backed cache of extracted reference chunks, keyed by the file's SHA-256
+
+    reference_index.sync_project looks chunks up with get() before queueing
+    extraction and stores the pool's results with set().
+    """
+
+    _stats_lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+
+    def get(self, sha256: str) -> Optional[List[Dict[str, Any]]]:
+        from ..models import ExtractedTextEntry
+
+        try:
+            chunks = ExtractedTextEntry.objects.filter(
+                sha256=sha256, extractor_version=TEXT_EXTRACTOR_VERSION
+            ).values_list('chunks', flat=True).first()
+            if chunks is not None:
+                ExtractedTextEntry.objects.filter(sha256=sha256).update(
+                    hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+                )
+        except Exception as e:
+            # A broken cache must never block indexing; treat it as a miss
+            logger.error(f"Extracted text cache lookup failed: {e}")
+            chunks = None
+        self._record(hit=chunks is not None)
+        return chunks
+
+    def set(self, sha256: str, file_type: str, chunks: List[Dict[str, Any]]):
+        from ..models import ExtractedTextEntry
+
+        now = timezone.now()
+        try:
+            ExtractedTextEntry.objects.update_or_create(
+                sha256=sha256,
+                defaults={
+                    'file_type': file_type,
+                    'extractor_version': TEXT_EXTRACTOR_VERSION,
+                    'chunks': chunks,
+                    'size': len(json.dumps(chunks).encode('utf-8')),
+                    'created_at': now,
+                    'last_used_at': now,
+                }
+            )
+            self.evict()
+        except Exception as e:
+            logger.error(f"Extracted text cache store failed: {e}")
+
+    def evict(self):
+        """Drop least recently used entries until the stored chunks fit in max_bytes"""
+        from ..models import ExtractedTextEntry
+
+        if not self.max_bytes:
+            return
+        excess = (ExtractedTextEntry.objects.aggregate(total=Sum('size'))['total'] or 0) - self.max_bytes
+        if excess <= 0:
+            return
+
+        stale = []
+        for sha256, size in ExtractedTextEntry.objects.order_by('last_used_at', 'sha256').values_list('sha256', 'size').iterator():
+            stale.append(sha256)
+            excess -= size
+            if excess <= 0:
+                break
+        ExtractedTextEntry.objects.filter(sha256__in=stale).delete()
+
+    @classmethod
+    def _record(cls, hit: bool):
+        with cls._stats_lock:
+            if hit:
+                cls._hits += 1
+            else:
+                cls._misses += 1
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Stored hit counts (every entry was one miss) and size, plus this process's lookups"""
+        from ..models import ExtractedTextEntry
+
+        totals = ExtractedTextEntry.objects.aggregate(hits=Sum('hit_count'), size=Sum('size'))
+        entries = ExtractedTextEntry.objects.count()
+        hits = totals['hits'] or 0
+        with cls._stats_lock:
+            process_hits, process_misses = cls._hits, cls._misses
+        process_lookups = process_hits + process_misses
+        return {
+            'entries': entries,
+            'hits': hits,
+            'hit_rate': hits / (hits + entries) if hits + entries else 0.0,
+            'bytes': totals['size'] or 0,
+            'process': {
+                'hits': process_hits,
+                'misses': process_misses,
+                'hit_rate': process_hits / process_lookups if process_lookups else 0.0,
+            },
+        }
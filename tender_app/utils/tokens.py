@@ -0,0 +1,61 @@
+# tender_app/utils/tokens.py
+from functools import lru_cache
+import logging
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to the character heuristic
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = 'o200k_base'
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token)"""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """Local tiktoken encoding for a model, or None when tiktoken or its data is unavailable"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable for {model}, estimating token counts: {e}")
+        return None
+    try:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = 'gpt-4o-mini') -> int:
+    """Count tokens with the model's tokenizer when available"""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = 'gpt-4o-mini') -> str:
+    """Cut text down to at most max_tokens tokens"""
+    if not text or max_tokens <= 0:
+        return ''
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -1,20 +1,25 @@
 # tender_app/views.py
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-from django.http import JsonResponse, FileResponse, Http404
+from django.http import JsonResponse, FileResponse, Http404, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views.generic import View
 from django.conf import settings
+from django.db.models import Avg, Count, Sum
 import os
 import json
-from .models import TenderProject, TenderTemplate, ReferenceDocument, ExtractedField, ProcessedDocument
+from .models import TenderProject, TenderTemplate, ReferenceDocument, ExtractedField, ProcessedDocument, ProcessingJob, CompletionLog
 from .forms import TenderProjectForm, TenderTemplateForm, ReferenceDocumentForm, FieldContentForm
-from .utils.document_processor import DocumentProcessor
-from .utils.ai_generator import AIContentGenerator
-from .utils.form_filler import FormFiller
+from .utils.field_store import update_fields
+from .utils.completion_cache import CompletionCache
+from .utils.job_queue import enqueue_job, request_cancel
+from .utils.resilience import metrics, percentile
+from .utils.template_library import TemplateLibrary
+from .utils.text_cache import ExtractedTextCache
+from .utils.streaming import start_stream_job, stream_generation
+from asgiref.sync import sync_to_async
 import zipfile
 import tempfile
 import mimetypes
@@ -97,6 +102,9 @@ class DocumentUploadView(View):
                 
                 uploaded_files.append(saved_file)
             
+            # Extract fields and index references now, so they are ready before generation
+            enqueue_job(project, 'prepare', reuse_running=False)
+            
             return JsonResponse({
                 'success': True,
                 'message': f'Successfully uploaded {len(uploaded_files)} file(s)',
@@ -110,14 +118,8 @@ class DocumentUploadView(View):
             })
     
     def save_template(self, project, uploaded_file, post_data):
-        """Save uploaded template file"""
-        # Generate unique filename
-        filename = self.generate_unique_filename(uploaded_file.name, 'templates')
-        
-        # Save file to storage
-        file_path = default_storage.save(f'templates/{filename}', uploaded_file)
-        
-        file_type = os.path.splitext(uploaded_file.name)[1].lower()
+        """Save uploaded template file (stored once per distinct content)"""
+        file_type = os.path.splitext(uploaded_file.name)[1].lower().lstrip('.')
         # Create database record
         template = TenderTemplate.objects.create(
             project=project,
@@ -130,13 +132,7 @@ class DocumentUploadView(View):
         return template
     
     def save_reference(self, project, uploaded_file, post_data):
-        """Save uploaded reference file"""
-        # Generate unique filename
-        filename = self.generate_unique_filename(uploaded_file.name, 'references')
-        
-        # Save file to storage
-        file_path = default_storage.save(f'references/{filename}', uploaded_file)
-        
+        """Save uploaded reference file (stored once per distinct content)"""
         # Create database record
         reference = ReferenceDocument.objects.create(
             project=project,
@@ -153,13 +149,6 @@ class DocumentUploadView(View):
         file_extension = os.path.splitext(filename)[1].lower()
         return file_extension in allowed_extensions
     
-    def generate_unique_filename(self, original_filename, folder):
-        """Generate unique filename to prevent conflicts"""
-        import uuid
-        name, ext = os.path.splitext(original_filename)
-        unique_id = str(uuid.uuid4())[:8]
-        return f"{name}_{unique_id}{ext}"
-
 class ProcessDocumentView(View):
     def get(self, request, project_id):
         project = get_object_or_404(TenderProject, id=project_id)
@@ -185,7 +174,9 @@ class ProcessDocumentView(View):
         context = {
             'project': project,
             'fields': all_fields,
-            'templates': templates
+            'templates': templates,
+            'active_job': project.processingjob_set.filter(status__in=['queued', 'running']).last(),
+            'streaming': getattr(settings, 'AI_STREAMING', False),
         }
         return render(request, 'process_document.html', context)
     
@@ -201,169 +192,72 @@ class ProcessDocumentView(View):
         return redirect('process_document', project_id=project_id)
     
     def _generate_ai_content(self, request, project):
-      """Generate AI content for all fields"""
-      try:
-          project.status = 'processing'
-          project.save()
-          
-          # First extract fields if not already done
-          self._extract_fields_from_templates(project)
-          
-          # Collect reference content
-          reference_content = self._collect_reference_content(project)
-          
-          # Get all fields
-          all_fields = []
-          for template in project.tendertemplate_set.all():
-              print(f"Template: {template.extractedfield_set.all()}")
-              for field in template.extractedfield_set.all():
-                  print(f"Field: {field}")
-                  all_fields.append({
-                      'id': field.id,
-                      'field_name': field.field_name,
-                      'field_type': field.field_type,
-                  })
-          
-          print(f"All fields: {all_fields}")
-          if not all_fields:
-              messages.warning(request, 'No fields found in templates. Please check your template files.')
-              return redirect('process_document', project_id=project.id)
-          
-          # Generate content using AI
-          ai_generator = AIContentGenerator()
-          project_context = f"Project: {project.name}\nDescription: {project.description}"
-          
-          generated_content = ai_generator.generate_bulk_content(
-              all_fields, reference_content, project_context
-          )
-          
-          # Save generated content
-          for field_data in all_fields:
-              field_id = str(field_data['id'])
-              if field_id in generated_content:
-                  field = ExtractedField.objects.get(id=field_data['id'])
-                  field.generated_content = generated_content[field_id]
-                  field.save()
-          
-          project.status = 'completed'
-          project.save()
-          
-          messages.success(request, f'AI content generated for {len(generated_content)} fields!')
-          
-      except Exception as e:
-          project.status = 'error'
-          project.save()
-          messages.error(request, f'Error generating content: {str(e)}')
-      
-      return redirect('process_document', project_id=project.id)
-
-    def _extract_fields_from_templates(self, project):
-      """Extract fields from templates if not already done"""
-      from .utils.document_processor import DocumentProcessor
-      
-      processor = DocumentProcessor()
-      
-      for template in project.tendertemplate_set.all():
-          # Skip if fields already extracted
-          if template.extractedfield_set.exists():
-              print(f"Fields already extracted for {template.original_filename}")
-              continue
-              
-          try:
-              # Determine file type
-              file_extension = os.path.splitext(template.file.name)[1].lower()
-              file_type = file_extension[1:]  # Remove the dot
-              
-              # Extract fields
-              fields = processor.extract_fields(template.file.path, file_type)
-              print(f"Fields: {fields}")
-              # Save extracted fields
-              for field_data in fields:
-                  ExtractedField.objects.create(
-                      template=template,
-                      field_name=field_data.get('field_name', 'Unknown Field'),
-                      field_type=field_data.get('field_type', 'text'),
-                      position_info=field_data.get('position_info', {})
-                  )
-          except Exception as e:
-              print(f"Error extracting fields from {template.original_filename}: {e}")
-    
-    def _collect_reference_content(self, project):
-        """Collect content from all reference documents"""
-        processor = DocumentProcessor()
-        all_content = []
-        
-        for reference in project.referencedocument_set.all():
-            try:
-                file_extension = os.path.splitext(reference.file.name)[1].lower()
-                file_type = file_extension[1:]  # Remove the dot
-                
-                content = processor.extract_reference_content(reference.file.path, file_type)
-                all_content.append(f"=== {reference.title} ===\n{content}\n")
-            except Exception as e:
-                print(f"Error processing reference {reference.title}: {e}")
-        
-        return '\n'.join(all_content)
+        """Queue AI content generation for all fields"""
+        job = enqueue_job(project, 'generate', {
+            'use_cache': request.POST.get('bypass_cache') != '1'
+        })
+        
+        if job.status == 'completed':
+            messages.success(request, 'AI content generated!')
+        elif job.status == 'failed':
+            messages.error(request, f'Error generating content: {job.error}')
+        else:
+            messages.info(request, 'AI content generation started. Fields fill in as they are generated.')
+        
+        return redirect('process_document', project_id=project.id)
     
     def _save_and_fill_documents(self, request, project):
-        """Save manual edits and fill documents"""
+        """Save manual edits and queue document filling"""
         try:
             # Update fields with manual edits
+            posted = {}
             for key, value in request.POST.items():
-                if key.startswith('field_'):
-                    field_id = key.replace('field_', '')
-                    try:
-                        field = ExtractedField.objects.get(id=field_id)
-                        field.generated_content = value
-                        field.is_filled = True
-                        field.save()
-                    except ExtractedField.DoesNotExist:
-                        continue
+                if key.startswith('field_') and key[len('field_'):].isdigit():
+                    posted[int(key[len('field_'):])] = value
+
+            fields = list(ExtractedField.objects.filter(id__in=posted, template__project=project))
+            for field in fields:
+                value = posted[field.id]
+                if field.generated_content.replace('\r\n', '\n') != value.replace('\r\n', '\n'):
+                    # Overriding one member of a deduplicated group
+                    field.is_user_edited = True
+                    # Unchanged text is kept as is (browsers post CRLF), so its document is not re-rendered
+                    field.generated_content = value
+                field.is_filled = True
+            update_fields(fields, ['generated_content', 'is_filled', 'is_user_edited'])
             
             # Fill documents
-            self._fill_all_documents(project)
+            job = enqueue_job(project, 'fill')
             
-            messages.success(request, 'Documents filled successfully!')
-            return redirect('download_documents', project_id=project.id)
+            if job.status == 'completed':
+                messages.success(request, 'Documents filled successfully!')
+                return redirect('download_documents', project_id=project.id)
+            if job.status == 'failed':
+                messages.error(request, f'Error filling documents: {job.error}')
+            else:
+                messages.info(request, 'Filling documents. You will be taken to the downloads when they are ready.')
+            return redirect('process_document', project_id=project.id)
             
         except Exception as e:
             messages.error(request, f'Error filling documents: {str(e)}')
             return redirect('process_document', project_id=project.id)
-    
-    def _fill_all_documents(self, project):
-        """Fill all template documents with generated content"""
-        form_filler = FormFiller()
-        
-        for template in project.tendertemplate_set.all():
-            # Collect field content for this template
-            field_content = {}
-            for field in template.extractedfield_set.all():
-                if field.generated_content:
-                    field_content[field.field_name] = field.generated_content
-            
-            if field_content:
-                # Generate output filename
-                base_name = os.path.splitext(template.original_filename)[0]
-                output_filename = f"{base_name}_filled.{template.file_type}"
-                output_path = os.path.join(settings.MEDIA_ROOT, 'processed', output_filename)
-                
-                # Ensure directory exists
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                
-                # Fill the document
-                success = form_filler.fill_document(
-                    template.file.path,
-                    output_path,
-                    field_content,
-                    template.file_type
-                )
-                
-                if success:
-                    # Save processed document record
-                    ProcessedDocument.objects.create(
-                        project=project,
-                        file=f'processed/{output_filename}'
-                    )
+
+class GenerationStreamView(View):
+    async def get(self, request, project_id):
+        """Stream AI generation as Server-Sent Events (token by token when served over ASGI)"""
+        project = await sync_to_async(get_object_or_404)(TenderProject, id=project_id)
+        use_cache = request.GET.get('bypass_cache') != '1'
+        job = await sync_to_async(start_stream_job)(project, use_cache)
+        if job is None:
+            return JsonResponse({'error': 'A job is already running for this project.'}, status=409)
+        
+        response = StreamingHttpResponse(
+            stream_generation(job, use_cache=use_cache),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+        return response
 
 class DownloadDocumentsView(View):
     def get(self, request, project_id):
@@ -467,6 +361,7 @@ class AjaxFieldUpdateView(View):
             
             field = get_object_or_404(ExtractedField, id=field_id)
             field.generated_content = content
+            field.is_user_edited = True
             field.save()
             
             return JsonResponse({'success': True})
@@ -524,3 +419,121 @@ class ProjectDetailView(View):
         }
         
         return render(request, 'project_detail.html', context)
+
+class ProjectStatusView(View):
+    def get(self, request, project_id):
+        """Project status plus progress of its most recent job"""
+        project = get_object_or_404(TenderProject, id=project_id)
+        job = project.processingjob_set.order_by('-created_at').first()
+        
+        job_info = None
+        if job:
+            job_info = {
+                'id': job.id,
+                'kind': job.kind,
+                'status': job.status,
+                'stage': job.stage,
+                'progress': job.progress,
+                'error': job.error,
+                'cancel_requested': job.cancel_requested,
+            }
+        
+        return JsonResponse({'status': project.status, 'job': job_info})
+
+class ProjectFilesStatusView(View):
+    def get(self, request, project_id):
+        """Extraction readiness of each uploaded template and reference"""
+        project = get_object_or_404(TenderProject, id=project_id)
+        templates = project.tendertemplate_set.annotate(field_count=Count('extractedfield'))
+        references = project.referencedocument_set.annotate(chunk_count=Count('chunks'))
+        
+        files = {
+            'templates': [
+                {
+                    'id': template.id,
+                    'status': template.extraction_status,
+                    'error': template.extraction_error,
+                    'fields': template.field_count,
+                }
+                for template in templates
+            ],
+            'references': [
+                {
+                    'id': reference.id,
+                    'status': reference.extraction_status,
+                    'error': reference.extraction_error,
+                    'chunks': reference.chunk_count,
+                }
+                for reference in references
+            ],
+        }
+        files['ready'] = all(
+            entry['status'] in ('ready', 'failed') for entry in files['templates'] + files['references']
+        )
+        return JsonResponse(files)
+
+class ProjectUsageView(View):
+    def get(self, request, project_id):
+        """Token usage and latency of the completions sent for a project"""
+        project = get_object_or_404(TenderProject, id=project_id)
+        logs = CompletionLog.objects.filter(project=project)
+        
+        totals = logs.aggregate(
+            requests=Count('id'),
+            prompt_tokens=Sum('prompt_tokens'),
+            completion_tokens=Sum('completion_tokens'),
+            avg_latency_ms=Avg('latency_ms')
+        )
+        
+        top_fields = logs.filter(field__isnull=False).values('field_id', 'field__field_name').annotate(
+            prompt_tokens=Sum('prompt_tokens'),
+            completion_tokens=Sum('completion_tokens')
+        ).order_by('-prompt_tokens')[:10]
+        
+        return JsonResponse({
+            'requests': totals['requests'],
+            'prompt_tokens': totals['prompt_tokens'] or 0,
+            'completion_tokens': totals['completion_tokens'] or 0,
+            'avg_latency_ms': round(totals['avg_latency_ms'] or 0),
+            'top_fields': [
+                {
+                    'field_id': row['field_id'],
+                    'field_name': row['field__field_name'],
+                    'prompt_tokens': row['prompt_tokens'],
+                    'completion_tokens': row['completion_tokens'],
+                }
+                for row in top_fields
+            ],
+        })
+
+class AIMetricsView(View):
+    def get(self, request):
+        """Retry, timeout, breaker and latency metrics for completions, and cache hit rates
+        
+        Every 'process' entry counts this web process only (streamed generation),
+        not run_worker; 'recent' is computed from CompletionLog and the caches'
+        totals from their stored hit counts, so both include work done by workers.
+        """
+        recent = list(CompletionLog.objects.order_by('-created_at').values_list('latency_ms', flat=True)[:1000])
+        
+        return JsonResponse({
+            'process': metrics.snapshot(),
+            'recent': {
+                'requests': len(recent),
+                'latency_ms': {
+                    'p50': percentile(recent, 50),
+                    'p95': percentile(recent, 95),
+                    'p99': percentile(recent, 99),
+                },
+            },
+            'cache': CompletionCache.stats(),
+            'reference_text_cache': ExtractedTextCache.stats(),
+            'template_library': TemplateLibrary.stats(),
+        })
+
+@method_decorator(csrf_exempt, name='dispatch')
+class CancelJobView(View):
+    def post(self, request, job_id):
+        job = get_object_or_404(ProcessingJob, id=job_id)
+        request_cancel(job)
+        return JsonResponse({'success': True})